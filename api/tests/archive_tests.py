@@ -0,0 +1,152 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import shutil
+import string
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from flask import Flask
+from sqlalchemy import delete
+
+from api.weather_data_flaskapi.business.archive import ReadingArchive, set_reading_archive, split_range, \
+    tiered_reading_bounds, tiered_reading_rows
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str):
+    '''Generate a humidity data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+def get_reading_fields(rows) -> list:
+    '''Return the fields of reading rows read from the database or the archive, comparable between both'''
+    return [(row.id, row.timestamp, float(row.value), row.value_units, row.city) for row in rows]
+
+
+class TestCaseArchive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        set_reading_archive(None)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_step_00_split_range(self):
+        '''Split a date range into the parts read from the database and from the archive.'''
+        log = logging.getLogger('TestCase.test_step_00_split_range')
+        log.info('Start')
+
+        window = (datetime(2017, 3, 1), datetime(2017, 4, 1))
+
+        self.assertEqual(split_range(None, datetime(2017, 1, 1), datetime(2017, 6, 1)),
+                         [(False, datetime(2017, 1, 1), datetime(2017, 6, 1), True)]), \
+            'Expected the whole range from the database without an archive'
+        self.assertEqual(split_range(window, datetime(2017, 1, 1), datetime(2017, 6, 1)),
+                         [(False, datetime(2017, 1, 1), datetime(2017, 3, 1), False),
+                          (True, datetime(2017, 3, 1), datetime(2017, 4, 1), False),
+                          (False, datetime(2017, 4, 1), datetime(2017, 6, 1), True)]), \
+            'Expected the archived months from the archive'
+        self.assertEqual(split_range(window, datetime(2017, 3, 10), datetime(2017, 3, 20)),
+                         [(True, datetime(2017, 3, 10), datetime(2017, 3, 20), True)]), \
+            'Expected a range within the archive from the archive only'
+
+        log.info('End')
+
+    def test_step_01_read_archived_month(self):
+        '''Read the readings of an archived month from the archive, as they were read from the database.'''
+        log = logging.getLogger('TestCase.test_step_01_read_archived_month')
+        log.info('Start')
+
+        city = get_random_string(16)
+        start, end = datetime(2017, 2, 1), datetime(2017, 4, 30)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-03-{day:02d}T12:00:00'.format(day=day))
+                                       for day in range(1, 29, 3)] +
+                            [get_record_data(city, '2017-04-02T12:00:00')])
+
+            expected = get_reading_fields(tiered_reading_rows(Humidity, start, end, city, 'AB', 'CA'))
+
+            archive = ReadingArchive(self.directory)
+
+            self.assertGreaterEqual(archive.export_month(Humidity, date(2017, 3, 1)), 10), \
+                'Expected the readings of March to be archived'
+
+            archive.set_window('humidity', datetime(2017, 3, 1), datetime(2017, 4, 1))
+            set_reading_archive(archive)
+
+            # Read from the archive, the readings of March are no longer needed in the database
+            db.session.execute(delete(Humidity).where(Humidity.location_id.in_(find_location_ids(city, 'AB', 'CA')),
+                                                      Humidity.timestamp < datetime(2017, 4, 1)))
+            db.session.commit()
+
+            self.assertEqual(get_reading_fields(tiered_reading_rows(Humidity, start, end, city, 'AB', 'CA')),
+                             expected), 'Expected the same readings from the archive and the database'
+            self.assertEqual(get_reading_fields(tiered_reading_rows(Humidity, start, end, city, 'AB', 'CA',
+                                                                    limit=3, yield_per=2)),
+                             expected[:3]), 'Expected a limited read to stop in the archive'
+            self.assertEqual(tiered_reading_bounds(Humidity, start, end, city, 'AB', 'CA'),
+                             (datetime(2017, 3, 1, 12, 0, 0), datetime(2017, 4, 2, 12, 0, 0))), \
+                'Expected the bounds of the readings across the archive and the database'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_split_range').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_read_archived_month').setLevel(logging.DEBUG)
+    unittest.main()
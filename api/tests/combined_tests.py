@@ -0,0 +1,112 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+from api.weather_data_flaskapi.business.combined import combined_readings, find_locations, parse_locations
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, Temperature
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str, value_units: str = '%'):
+    '''Generate a data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': value_units,
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+class TestCaseCombined(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def test_step_00_parse_locations(self):
+        '''Parse the distinct locations of a combined query, regardless of case.'''
+        log = logging.getLogger('TestCase.test_step_00_parse_locations')
+        log.info('Start')
+
+        self.assertEqual(parse_locations(['Edmonton, AB, CA', 'edmonton,ab,ca', 'St. Albert, AB,CA']),
+                         [('Edmonton', 'AB', 'CA'), ('St. Albert', 'AB', 'CA')]), \
+            'Expected the distinct locations in request order'
+
+        log.info('End')
+
+    def test_step_01_read_location_in_other_case(self):
+        '''Read the series of a location requested in another case than it is stored.'''
+        log = logging.getLogger('TestCase.test_step_01_read_location_in_other_case')
+        log.info('Start')
+
+        city = get_random_string(16)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-06-01T12:00:00'),
+                                       get_record_data(city, '2017-06-02T12:00:00')])
+            create_readings(Temperature, [get_record_data(city, '2017-06-01T12:00:00', value_units='C')])
+
+            locations = parse_locations(['{city},ab,ca '.format(city=city.lower())])
+
+            # The database of the service matches the location regardless of case, as MySQL does
+            stations = find_locations([(city, 'AB', 'CA')])
+
+            series = combined_readings([Humidity, Temperature], locations, stations,
+                                       datetime(2017, 6, 1), datetime(2017, 6, 30))
+
+        self.assertEqual([(item['city'], item['province'], item['metric'], len(item['items'])) for item in series],
+                         [(city.lower(), 'ab', 'humidity', 2), (city.lower(), 'ab', 'temperature', 1)]), \
+            'Expected the series of the requested location'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_parse_locations').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_read_location_in_other_case').setLevel(logging.DEBUG)
+    unittest.main()
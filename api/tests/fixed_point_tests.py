@@ -0,0 +1,135 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import sys
+import unittest
+
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, func, select
+
+from database.types import FixedPoint, decoded, fixed_point_storage, set_fixed_point_storage
+
+
+def round_trip(rows: list) -> list:
+    '''Write rows of (latitude, longitude, total) values to a new database and read them back.
+
+    Each call compiles its statements on a new engine, so they are compiled for the current storage.
+    '''
+    metadata = MetaData()
+    table = Table('fixed_point',
+                  metadata,
+                  Column('id', Integer(), primary_key=True),
+                  Column('latitude', FixedPoint(precision=8, scale=6)),
+                  Column('longitude', FixedPoint(precision=9, scale=6)),
+                  Column('total', FixedPoint(precision=12, scale=4)))
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [{'latitude': latitude, 'longitude': longitude, 'total': total}
+                                            for latitude, longitude, total in rows])
+
+        stored = [tuple(row) for row in connection.execute(
+            select(table.c.latitude, table.c.longitude, table.c.total).order_by(table.c.id))]
+        summed = connection.execute(select(func.sum(decoded(table.c.latitude)))).scalar()
+
+    engine.dispose()
+
+    return stored, summed
+
+
+class TestCaseFixedPoint(unittest.TestCase):
+    def setUp(self):
+        self.scaled = fixed_point_storage()
+
+    def tearDown(self):
+        set_fixed_point_storage(self.scaled)
+
+    def test_step_00_bind_scaled_integers(self):
+        '''Bind values as integer counts of the scale in fixed point storage, and as they are otherwise.'''
+        log = logging.getLogger('TestCase.test_step_00_bind_scaled_integers')
+        log.info('Start')
+
+        latitude = FixedPoint(precision=8, scale=6)
+
+        set_fixed_point_storage(True)
+
+        self.assertEqual(latitude.process_bind_param(53.546123, None), 53546123), 'Expected micro-degrees'
+        self.assertEqual(latitude.process_bind_param(-113.493812, None), -113493812), \
+            'Expected negative micro-degrees'
+        self.assertEqual(latitude.process_bind_param(53.5461236, None), 53546124), \
+            'Expected the value rounded up at the scale'
+        self.assertEqual(latitude.process_bind_param(-53.5461236, None), -53546124), \
+            'Expected a negative value rounded away from zero at the scale'
+        self.assertEqual(latitude.process_bind_param(53.5461234, None), 53546123), \
+            'Expected the value rounded down at the scale'
+        self.assertEqual(latitude.process_bind_param(1.0000005, None), 1000001), \
+            'Expected a value halfway rounded up, as DECIMAL rounds it'
+        self.assertEqual(latitude.process_bind_param(-1.0000005, None), -1000001), \
+            'Expected a negative value halfway rounded away from zero'
+        self.assertIsNone(latitude.process_bind_param(None, None)), 'Expected None bound as NULL'
+        self.assertEqual(latitude.process_result_value(-113493812, None), -113.493812), 'Expected degrees'
+        self.assertIsNone(latitude.process_result_value(None, None)), 'Expected NULL read as None'
+
+        set_fixed_point_storage(False)
+
+        self.assertEqual(latitude.process_bind_param(53.5461236, None), 53.5461236), \
+            'Expected the value left to the DECIMAL column'
+        self.assertIsNone(latitude.process_bind_param(None, None)), 'Expected None bound as NULL'
+        self.assertIsNone(latitude.process_result_value(None, None)), 'Expected NULL read as None'
+
+        log.info('End')
+
+    def test_step_01_round_trip(self):
+        '''Store and read back negative values, values beyond the scale and None in both storages.'''
+        log = logging.getLogger('TestCase.test_step_01_round_trip')
+        log.info('Start')
+
+        rows = [(53.546123, -113.493812, 12345678.1234),
+                (-89.999999, 179.999999, -0.0001),
+                (53.5461236, -113.4938124, 0.00005),
+                (1.0000005, -1.0000005, -0.00005),
+                (None, None, None)]
+
+        set_fixed_point_storage(True)
+
+        stored, summed = round_trip(rows)
+
+        self.assertEqual(stored, [(53.546123, -113.493812, 12345678.1234),
+                                  (-89.999999, 179.999999, -0.0001),
+                                  (53.546124, -113.493812, 0.0001),
+                                  (1.000001, -1.000001, -0.0001),
+                                  (None, None, None)]), 'Expected the values rounded half away from zero'
+        self.assertAlmostEqual(summed, 53.546123 - 89.999999 + 53.546124 + 1.000001), \
+            'Expected the sum decoded to degrees'
+
+        set_fixed_point_storage(False)
+
+        stored, summed = round_trip(rows)
+
+        for row, expected in zip(stored, rows):
+            for value, expected_value in zip(row, expected):
+                if expected_value is None:
+                    self.assertIsNone(value), 'Expected None read back'
+                else:
+                    self.assertIsInstance(value, float), 'Expected a float'
+                    self.assertAlmostEqual(value, expected_value, places=4), 'Expected the value read back'
+
+        self.assertAlmostEqual(summed, 53.546123 - 89.999999 + 53.5461236 + 1.0000005, places=6), 'Expected the sum'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_bind_scaled_integers').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_round_trip').setLevel(logging.DEBUG)
+    unittest.main()
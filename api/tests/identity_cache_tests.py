@@ -0,0 +1,84 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import sys
+import time
+import unittest
+
+from api.weather_data_flaskapi.business.cache import TTLCache
+
+
+class TestCaseIdentityCache(unittest.TestCase):
+    def test_step_00_get_cached_user(self):
+        '''Get the user of a token from the cache until it is removed.'''
+        log = logging.getLogger('TestCase.test_step_00_get_cached_user')
+        log.info('Start')
+
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        user = object()
+
+        self.assertIsNone(cache.get(1)), 'Expected no user before it is cached'
+
+        cache.set(1, user)
+
+        self.assertIs(cache.get(1), user), 'Expected the cached user'
+
+        cache.delete(1)
+
+        self.assertIsNone(cache.get(1)), 'Expected no user once it is removed'
+
+        log.info('End')
+
+    def test_step_01_expire_cached_user(self):
+        '''Look a user up again once the TTL has passed.'''
+        log = logging.getLogger('TestCase.test_step_01_expire_cached_user')
+        log.info('Start')
+
+        cache = TTLCache(max_entries=2, ttl_seconds=0)
+        cache.set(1, object())
+
+        time.sleep(0.01)
+
+        self.assertIsNone(cache.get(1)), 'Expected the user to expire'
+
+        log.info('End')
+
+    def test_step_02_evict_least_recently_used_user(self):
+        '''Evict the least recently used user beyond the most entries.'''
+        log = logging.getLogger('TestCase.test_step_02_evict_least_recently_used_user')
+        log.info('Start')
+
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        cache.set(1, 'first')
+        cache.set(2, 'second')
+
+        # Using the first user makes the second the least recently used
+        cache.get(1)
+        cache.set(3, 'third')
+
+        self.assertEqual(cache.get(1), 'first'), 'Expected the recently used user to be kept'
+        self.assertIsNone(cache.get(2)), 'Expected the least recently used user to be evicted'
+        self.assertEqual(cache.get(3), 'third'), 'Expected the new user to be cached'
+
+        cache.clear()
+
+        self.assertIsNone(cache.get(1)), 'Expected no user once the cache is cleared'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_get_cached_user').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_expire_cached_user').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_evict_least_recently_used_user').setLevel(logging.DEBUG)
+    unittest.main()
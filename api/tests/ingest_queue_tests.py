@@ -0,0 +1,196 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import glob
+import json
+import logging
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from api.weather_data_flaskapi.business import weather_data
+from api.weather_data_flaskapi.business.ingest import IngestQueue, IngestQueueFullError
+from database import db
+from database.models import Humidity, Location
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_random_record_data(city: str):
+    '''Generate a random humidity data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': float('{:.6f}'.format(random.uniform(0.0, 1.0))),
+        'latitude': float('{:.6f}'.format(random.uniform(-90.0, 90.0))),
+        'longitude': float('{:.6f}'.format(random.uniform(-180.0, 180.0))),
+        'elevation': float('{:.4f}'.format(random.uniform(-90.0, 999.0))),
+        'elevation_units': 'm',
+        'timestamp': '2017-06-{day:02d}T12:00:00'.format(day=random.randint(1, 28)),
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+class TestCaseIngestQueue(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.city = get_random_string(16)
+        self.journal_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.journal_directory, ignore_errors=True)
+
+    def stored_readings(self) -> int:
+        with self.app.app_context():
+            return db.session.execute(select(func.count(Humidity.id)).join(
+                Location, Humidity.location_id == Location.id).where(Location.city == self.city)).scalar()
+
+    def test_step_00_write_queued_readings(self):
+        '''Write the queued readings in one group when the queue stops.'''
+        log = logging.getLogger('TestCase.test_step_00_write_queued_readings')
+        log.info('Start')
+
+        queue = IngestQueue(self.app, max_readings=100, group_size=100, flush_seconds=3600)
+
+        queue.put('humidity', [get_random_record_data(self.city)])
+        queue.put('humidity', [get_random_record_data(self.city), get_random_record_data(self.city)])
+
+        self.assertEqual(self.stored_readings(), 0), 'Expected no reading written before the group is full'
+
+        queue.stop()
+
+        self.assertEqual(self.stored_readings(), 3), 'Expected the queued readings to be written'
+
+        log.info('End')
+
+    def test_step_01_refuse_when_full(self):
+        '''Refuse the readings beyond the most queued.'''
+        log = logging.getLogger('TestCase.test_step_01_refuse_when_full')
+        log.info('Start')
+
+        queue = IngestQueue(self.app, max_readings=2, group_size=100, flush_seconds=3600)
+
+        try:
+            queue.put('humidity', [get_random_record_data(self.city), get_random_record_data(self.city)])
+
+            with self.assertRaises(IngestQueueFullError):
+                queue.put('humidity', [get_random_record_data(self.city)])
+        finally:
+            queue.stop()
+
+        self.assertEqual(self.stored_readings(), 2), 'Expected only the accepted readings to be written'
+
+        log.info('End')
+
+    def test_step_02_replay_journal(self):
+        '''Replay the journal left by a process that died, skipping its partial last entry.'''
+        log = logging.getLogger('TestCase.test_step_02_replay_journal')
+        log.info('Start')
+
+        readings = [get_random_record_data(self.city), get_random_record_data(self.city)]
+
+        with open(os.path.join(self.journal_directory, 'ingest-1-1.journal'), 'wb') as journal:
+            journal.write(json.dumps({'metric': 'humidity', 'readings': readings}).encode('utf-8') + b'\n')
+            journal.write(b'{"metric": "humidity", "readings": [{"val')
+
+        queue = IngestQueue(self.app, max_readings=100, group_size=100, flush_seconds=3600,
+                            journal_directory=self.journal_directory)
+
+        # The first request starts the writer, which replays the journal
+        queue.put('humidity', [get_random_record_data(self.city)])
+        queue.stop()
+
+        self.assertEqual(self.stored_readings(), 3), 'Expected the journaled and the new readings to be written'
+        self.assertEqual(glob.glob(os.path.join(self.journal_directory, '*.journal')), []), \
+            'Expected the journals to be removed once written'
+
+        log.info('End')
+
+    def test_step_03_keep_readings_the_database_failed_to_write(self):
+        '''Write again the readings of a chunk the database failed to write, keeping their journal meanwhile.'''
+        log = logging.getLogger('TestCase.test_step_03_keep_readings_the_database_failed_to_write')
+        log.info('Start')
+
+        insert_chunk = weather_data._insert_chunk
+        journals = []
+
+        def insert_chunk_failing_once(model, rows):
+            if not journals:
+                paths = glob.glob(os.path.join(self.journal_directory, '*.journal'))
+                journals.append(sum(os.path.getsize(path) for path in paths))
+                raise OperationalError('INSERT', {}, Exception('Lock wait timeout exceeded'))
+
+            return insert_chunk(model, rows)
+
+        queue = IngestQueue(self.app, max_readings=100, group_size=100, flush_seconds=0.1,
+                            journal_directory=self.journal_directory)
+
+        with mock.patch.object(weather_data, '_insert_chunk', insert_chunk_failing_once):
+            try:
+                queue.put('humidity', [get_random_record_data(self.city), get_random_record_data(self.city)])
+
+                deadline = time.monotonic() + 10
+
+                while self.stored_readings() < 2 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                queue.stop()
+
+        self.assertEqual(len(journals), 1), 'Expected the first write to fail'
+        self.assertGreater(journals[0], 0), 'Expected the readings to be journaled'
+        self.assertEqual(self.stored_readings(), 2), 'Expected the readings to be written once the database recovers'
+        self.assertEqual(glob.glob(os.path.join(self.journal_directory, '*.journal')), []), \
+            'Expected the journals to be removed once written'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_write_queued_readings').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_refuse_when_full').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_replay_journal').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_keep_readings_the_database_failed_to_write').setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,128 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+from api.weather_data_flaskapi.business.logins import LoginRecorder
+from database import db
+from database.models import User
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+class TestCaseLastLogin(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def setUp(self):
+        with self.app.app_context():
+            user = User(username=get_random_string(16),
+                        password=get_random_string(16),
+                        salt=get_random_string(16),
+                        enabled=True,
+                        created_date=datetime.utcnow())
+            db.session.add(user)
+            db.session.commit()
+
+            self.user_id = user.id
+
+        self.recorder = LoginRecorder(self.app, flush_seconds=3600)
+
+    def tearDown(self):
+        self.recorder.stop()
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.commit()
+
+    def last_login_date(self):
+        with self.app.app_context():
+            return db.session.get(User, self.user_id).last_login_date
+
+    def test_step_00_buffer_logins_until_flush(self):
+        '''Write the last login date of a user only when the logins are flushed.'''
+        log = logging.getLogger('TestCase.test_step_00_buffer_logins_until_flush')
+        log.info('Start')
+
+        self.recorder.record(self.user_id, datetime(2017, 6, 14, 8, 0, 0))
+        self.recorder.record(self.user_id, datetime(2017, 6, 14, 9, 0, 0))
+
+        self.assertIsNone(self.last_login_date()), 'Expected no last login date before the flush'
+
+        self.assertEqual(self.recorder.flush(), 1), 'Expected one user written'
+        self.assertEqual(self.last_login_date(), datetime(2017, 6, 14, 9, 0, 0)), \
+            'Expected the date of the latest login'
+
+        self.assertEqual(self.recorder.flush(), 0), 'Expected nothing left to write'
+
+        log.info('End')
+
+    def test_step_01_write_logins_on_stop(self):
+        '''Write the buffered last login dates when the recorder stops.'''
+        log = logging.getLogger('TestCase.test_step_01_write_logins_on_stop')
+        log.info('Start')
+
+        self.recorder.record(self.user_id, datetime(2017, 6, 14, 10, 0, 0))
+        self.recorder.stop()
+
+        self.assertEqual(self.last_login_date(), datetime(2017, 6, 14, 10, 0, 0)), \
+            'Expected the date to be written on stop'
+
+        log.info('End')
+
+    def test_step_02_skip_deleted_user(self):
+        '''Skip the login of a user deleted before the flush.'''
+        log = logging.getLogger('TestCase.test_step_02_skip_deleted_user')
+        log.info('Start')
+
+        self.recorder.record(self.user_id + 1000000, datetime(2017, 6, 14, 11, 0, 0))
+        self.recorder.record(self.user_id, datetime(2017, 6, 14, 11, 0, 0))
+
+        self.assertEqual(self.recorder.flush(), 2), 'Expected both logins flushed'
+        self.assertEqual(self.last_login_date(), datetime(2017, 6, 14, 11, 0, 0)), \
+            'Expected the date of the existing user to be written'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_buffer_logins_until_flush').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_write_logins_on_stop').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_skip_deleted_user').setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,178 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from flask import Flask
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from api.weather_data_flaskapi.business import locations
+from api.weather_data_flaskapi.business.locations import find_location_ids, get_or_create_location, location_key, \
+    location_versions, reading_version, touch_locations
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, Location
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+class TestCaseLocations(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.city = get_random_string(16)
+
+    def test_step_00_build_location_key(self):
+        '''Build the key of a location with the elevation as it is stored.'''
+        log = logging.getLogger('TestCase.test_step_00_build_location_key')
+        log.info('Start')
+
+        self.assertEqual(location_key('Edmonton', 'AB', 'CA', 645.12346, 'm'),
+                         ('Edmonton', 'AB', 'CA', Decimal('645.1235'), 'm')), 'Expected the elevation rounded'
+        self.assertEqual(location_key('Edmonton', 'AB', 'CA', 645, 'm'),
+                         location_key('Edmonton', 'AB', 'CA', '645.0', 'm')), \
+            'Expected the same key for the same elevation'
+
+        log.info('End')
+
+    def test_step_01_get_or_create_location(self):
+        '''Create a location the first time it is seen and find it after.'''
+        log = logging.getLogger('TestCase.test_step_01_get_or_create_location')
+        log.info('Start')
+
+        with self.app.app_context():
+            location_id = get_or_create_location(self.city, 'AB', 'CA', 645.0, 'm').id
+            db.session.commit()
+
+            self.assertEqual(get_or_create_location(self.city, 'AB', 'CA', 645.00001, 'm').id, location_id), \
+                'Expected the stored location'
+
+            # A second station in the city, at another elevation
+            other_id = get_or_create_location(self.city, 'AB', 'CA', 700.0, 'm').id
+            db.session.commit()
+
+            self.assertNotEqual(other_id, location_id), 'Expected a location per station'
+            self.assertEqual(sorted(find_location_ids(self.city, 'AB', 'CA')), sorted([location_id, other_id])), \
+                'Expected the stations of the city'
+            self.assertEqual(find_location_ids(self.city, 'BC', 'CA'), []), 'Expected no station in another province'
+
+        log.info('End')
+
+    def test_step_02_create_location_concurrently(self):
+        '''Find the location another writer added between the lookup and the INSERT.'''
+        log = logging.getLogger('TestCase.test_step_02_create_location_concurrently')
+        log.info('Start')
+
+        with self.app.app_context():
+            db.session.add(Location(*location_key(self.city, 'AB', 'CA', 645.0, 'm')))
+            db.session.commit()
+
+            with self.assertRaises(IntegrityError):
+                with db.session.begin_nested():
+                    db.session.add(Location(*location_key(self.city, 'AB', 'CA', 645.0, 'm')))
+
+            find_location = locations._find_location
+            lookups = []
+
+            def find_location_late(key):
+                # The first lookup runs before the other writer commits
+                lookups.append(key)
+                return None if len(lookups) == 1 else find_location(key)
+
+            with mock.patch.object(locations, '_find_location', find_location_late):
+                location = get_or_create_location(self.city, 'AB', 'CA', 645.0, 'm')
+
+            db.session.commit()
+
+            self.assertEqual(len(lookups), 2), 'Expected the location to be looked up again'
+            self.assertEqual(find_location_ids(self.city, 'AB', 'CA'), [location.id]), \
+                'Expected the location stored once'
+
+        log.info('End')
+
+    def test_step_03_count_location_versions(self):
+        '''Bump the version of a location each time its readings change.'''
+        log = logging.getLogger('TestCase.test_step_03_count_location_versions')
+        log.info('Start')
+
+        with self.app.app_context():
+            location_id = get_or_create_location(self.city, 'AB', 'CA', 645.0, 'm').id
+            db.session.commit()
+
+            self.assertEqual(location_versions(self.city, 'AB', 'CA'), [(location_id, 0, None)]), \
+                'Expected a new location at version 0'
+
+            touch_locations([location_id, location_id])
+            db.session.commit()
+
+            (touched_id, version, modified_date), = location_versions(self.city, 'AB', 'CA')
+
+            self.assertEqual((touched_id, version), (location_id, 1)), 'Expected the version bumped once'
+            self.assertIsNotNone(modified_date), 'Expected the modified date to be set'
+
+            create_readings(Humidity, [{
+                'value': 50.0,
+                'value_units': '%',
+                'value_error_range': 0.1,
+                'latitude': 53.5461,
+                'longitude': -113.4938,
+                'elevation': 645.0,
+                'elevation_units': 'm',
+                'timestamp': '2017-06-14T12:00:00',
+                'city': self.city,
+                'province': 'AB',
+                'country': 'CA'
+            }])
+
+            reading_id = db.session.execute(select(Humidity.id).where(Humidity.location_id == location_id)).scalar()
+
+            self.assertEqual(reading_version(Humidity, reading_id)[:2], (location_id, 2)), \
+                'Expected the version of the location of the reading'
+            self.assertIsNone(reading_version(Humidity, reading_id + 1000000)), 'Expected no version without a reading'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_build_location_key').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_get_or_create_location').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_create_location_concurrently').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_count_location_versions').setLevel(logging.DEBUG)
+    unittest.main()
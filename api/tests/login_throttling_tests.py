@@ -0,0 +1,135 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import sys
+import time
+import unittest
+
+from api.weather_data_flaskapi.business.hashing import HashingBusyError, HashingPool
+from api.weather_data_flaskapi.business.throttling import TokenBucket, allow_login, set_login_throttles
+
+
+class TestCaseLoginThrottling(unittest.TestCase):
+    def tearDown(self):
+        set_login_throttles(username=None, address=None)
+
+    def test_step_00_refuse_beyond_burst(self):
+        '''Refuse the attempts of a key beyond its burst, without charging the other keys.'''
+        log = logging.getLogger('TestCase.test_step_00_refuse_beyond_burst')
+        log.info('Start')
+
+        bucket = TokenBucket(rate=0.001, burst=3, max_keys=10)
+
+        self.assertEqual([bucket.allow('admin') for _ in range(4)], [True, True, True, False]), \
+            'Expected the attempts beyond the burst to be refused'
+        self.assertTrue(bucket.allow('other')), 'Expected another key to have its own bucket'
+
+        log.info('End')
+
+    def test_step_01_refill_at_rate(self):
+        '''Allow attempts again once the bucket has refilled.'''
+        log = logging.getLogger('TestCase.test_step_01_refill_at_rate')
+        log.info('Start')
+
+        bucket = TokenBucket(rate=50.0, burst=1, max_keys=10)
+
+        self.assertTrue(bucket.allow('admin')), 'Expected the first attempt to be allowed'
+        self.assertFalse(bucket.allow('admin')), 'Expected the second attempt to be refused'
+
+        time.sleep(0.05)
+
+        self.assertTrue(bucket.allow('admin')), 'Expected an attempt once the bucket refilled'
+
+        log.info('End')
+
+    def test_step_02_forget_least_recently_used_key(self):
+        '''Start a forgotten key with a full bucket.'''
+        log = logging.getLogger('TestCase.test_step_02_forget_least_recently_used_key')
+        log.info('Start')
+
+        bucket = TokenBucket(rate=0.001, burst=1, max_keys=1)
+
+        self.assertTrue(bucket.allow('admin')), 'Expected the first attempt to be allowed'
+        self.assertTrue(bucket.allow('other')), 'Expected the first attempt of another key to be allowed'
+        self.assertTrue(bucket.allow('admin')), 'Expected the forgotten key to start with a full bucket'
+
+        log.info('End')
+
+    def test_step_03_throttle_login_by_username_and_address(self):
+        '''Charge both the username and the address of a login.'''
+        log = logging.getLogger('TestCase.test_step_03_throttle_login_by_username_and_address')
+        log.info('Start')
+
+        set_login_throttles(username=TokenBucket(rate=0.001, burst=2, max_keys=10),
+                            address=TokenBucket(rate=0.001, burst=2, max_keys=10))
+
+        self.assertTrue(allow_login('admin', '10.0.0.1')), 'Expected the first login to be allowed'
+        self.assertTrue(allow_login('admin', '10.0.0.1')), 'Expected the second login to be allowed'
+        self.assertFalse(allow_login('admin', '10.0.0.2')), 'Expected the username to be throttled'
+
+        # The first address spent its attempts on the first two logins
+        self.assertTrue(allow_login('other', '10.0.0.2')), 'Expected another username and address to be allowed'
+        self.assertFalse(allow_login('another', '10.0.0.1')), 'Expected the address to be throttled'
+
+        set_login_throttles(username=None, address=None)
+
+        self.assertTrue(allow_login('admin', '10.0.0.1')), 'Expected every login to be allowed without throttles'
+
+        log.info('End')
+
+
+class TestCaseHashingPool(unittest.TestCase):
+    def test_step_00_hash_and_verify(self):
+        '''Hash a password in a worker process and verify it.'''
+        log = logging.getLogger('TestCase.test_step_00_hash_and_verify')
+        log.info('Start')
+
+        pool = HashingPool(workers=1, max_pending=2, timeout_seconds=30)
+
+        try:
+            hashed = pool.hash('secret-salt')
+
+            self.assertTrue(pool.verify('secret-salt', hashed)), 'Expected the password to match its hash'
+            self.assertFalse(pool.verify('wrong-salt', hashed)), 'Expected another password not to match'
+        finally:
+            pool.shutdown()
+
+        log.info('End')
+
+    def test_step_01_refuse_when_busy(self):
+        '''Refuse a password at once when too many are waiting.'''
+        log = logging.getLogger('TestCase.test_step_01_refuse_when_busy')
+        log.info('Start')
+
+        pool = HashingPool(workers=1, max_pending=1, timeout_seconds=30)
+
+        try:
+            # Hold the only slot, as a password waiting for a worker would
+            pool._pending.acquire()
+
+            with self.assertRaises(HashingBusyError):
+                pool.hash('secret-salt')
+        finally:
+            pool.shutdown()
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_refuse_beyond_burst').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_refill_at_rate').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_forget_least_recently_used_key').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_throttle_login_by_username_and_address').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_00_hash_and_verify').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_refuse_when_busy').setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,135 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import date, datetime
+
+from flask import Flask
+from sqlalchemy import select
+
+from api.weather_data_flaskapi.business.locations import find_location_ids, location_versions
+from api.weather_data_flaskapi.business.partitions import PartitionError, add_months, add_partitions, \
+    delete_readings_before, drop_partitions_before, month_start, partition_months, partition_name
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str):
+    '''Generate a humidity data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+class TestCasePartitions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def test_step_00_name_monthly_partitions(self):
+        '''Find the months and names of monthly partitions.'''
+        log = logging.getLogger('TestCase.test_step_00_name_monthly_partitions')
+        log.info('Start')
+
+        self.assertEqual(month_start(datetime(2017, 6, 14, 8, 30)), date(2017, 6, 1)), 'Expected the first day'
+        self.assertEqual(add_months(date(2017, 11, 1), 3), date(2018, 2, 1)), 'Expected the months to wrap the year'
+        self.assertEqual(add_months(date(2017, 1, 1), -1), date(2016, 12, 1)), 'Expected a month back'
+        self.assertEqual(partition_name(date(2017, 6, 1)), 'p201706'), 'Expected the partition name'
+
+        log.info('End')
+
+    def test_step_01_delete_readings_before(self):
+        '''Delete the readings of a table that is not partitioned older than a date, a chunk at a time.'''
+        log = logging.getLogger('TestCase.test_step_01_delete_readings_before')
+        log.info('Start')
+
+        city = get_random_string(16)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-05-{day:02d}T12:00:00'.format(day=day))
+                                       for day in range(1, 6)] +
+                            [get_record_data(city, '2017-06-01T12:00:00')])
+
+            location_ids = find_location_ids(city, 'AB', 'CA')
+            before = location_versions(city, 'AB', 'CA')
+
+            deleted = delete_readings_before(Humidity, datetime(2017, 6, 1), chunk_size=2, location_ids=location_ids)
+
+            self.assertEqual(deleted, 5), 'Expected the readings of May to be deleted'
+
+            timestamps = db.session.execute(select(Humidity.timestamp).where(
+                Humidity.location_id.in_(location_ids))).scalars().all()
+
+            self.assertEqual(timestamps, [datetime(2017, 6, 1, 12, 0, 0)]), 'Expected the reading of June to be kept'
+            self.assertNotEqual(location_versions(city, 'AB', 'CA'), before), \
+                'Expected the location version to change'
+
+        log.info('End')
+
+    def test_step_02_refuse_partitions_of_table_not_partitioned(self):
+        '''Leave a table that is not partitioned to the DELETE fallback.'''
+        log = logging.getLogger('TestCase.test_step_02_refuse_partitions_of_table_not_partitioned')
+        log.info('Start')
+
+        with self.app.app_context():
+            if partition_months(Humidity):
+                self.skipTest('the humidity table is partitioned')
+
+            self.assertEqual(drop_partitions_before(Humidity, date(2017, 6, 1)), 0), 'Expected no partition dropped'
+
+            with self.assertRaises(PartitionError):
+                add_partitions(Humidity, months_ahead=3)
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_name_monthly_partitions').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_delete_readings_before').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_refuse_partitions_of_table_not_partitioned').setLevel(logging.DEBUG)
+    unittest.main()
@@ -15,11 +15,15 @@ import random
 import sys
 import string
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
+import cbor2
+import msgpack
 import pytz
 import requests
 
+from api.weather_data_flaskapi.columnar import COLUMNS_MAGIC, COLUMNS_MIMETYPE, read_columns
+
 
 def get_random_datetime():
     '''Return a random datetime from 0001-01-01 00:00:00.0 to 9999-12-28 23:59:59.999999'''
@@ -655,6 +659,195 @@ class TestCaseProtectedPressure(unittest.TestCase):
 
         log.info('End')
 
+    def test_step_03_5_create_batch_with_auth(self):
+        '''Create a batch of pressure records with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_03_5_create_batch_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/batch'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        readings = []
+
+        for _ in range(3):
+            record_data = get_random_record_data()
+            record_data['timestamp'] = record_data['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+            readings.append(record_data)
+
+        readings[1]['latitude'] = 90.1
+
+        payload = json.dumps(readings)
+
+        log.debug('payload= {payload}'.format(payload=payload))
+
+        headers = {
+            'content-type': 'application/json',
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        response = requests.request('POST', app_url, data=payload, headers=headers)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=207)
+        )
+
+        assert response.status_code == 207, 'Expected a HTTP status code 207'
+
+        json_data = json.loads(response.text)
+
+        self.assertEqual(json_data['created'], 2), 'Expected two created records'
+        self.assertEqual(json_data['rejected'], 1), 'Expected one rejected record'
+        self.assertEqual(
+            [result['status'] for result in json_data['results']],
+            [201, 400, 201]), 'Expected the status of each record in request order'
+
+        log.info('End')
+
+    def test_step_03_6_create_records_with_auth_msgpack_and_cbor(self):
+        '''Create pressure records sent as MessagePack and CBOR with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_03_6_create_records_with_auth_msgpack_and_cbor')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        encodings = (
+            ('application/msgpack', lambda data: msgpack.packb(data, datetime=True)),
+            ('application/cbor', cbor2.dumps)
+        )
+
+        for content_type, encode in encodings:
+            headers = {
+                'content-type': content_type,
+                'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+                'cache-control': 'no-cache'
+            }
+
+            # Timestamps are sent as native dates of the encoding
+            readings = []
+
+            for _ in range(3):
+                record_data = get_random_record_data()
+                record_data['latitude_public'] = float(int(record_data['latitude'] * 1000)) / 1000
+                record_data['longitude_public'] = float(int(record_data['longitude'] * 1000)) / 1000
+                readings.append(record_data)
+
+            response = requests.request('POST', app_url, data=encode(readings[0]), headers=headers)
+
+            log.debug('Got {response_code} - expected {expected_code}'.format(
+                response_code=response.status_code,
+                expected_code=201)
+            )
+
+            assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+            json_data = json.loads(response.text)
+
+            self.assertEqual(json_data['value'], readings[0]['value']), 'Returned value is the same'
+            self.assertEqual(json_data['city'], readings[0]['city']), 'Returned city is the same'
+
+            response = requests.request('POST', app_url + 'batch', data=encode(readings[1:]), headers=headers)
+
+            assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+            json_data = json.loads(response.text)
+
+            self.assertEqual(json_data['created'], 2), 'Expected two created records'
+
+            # The decoded body is validated against the model
+            del readings[0]['value']
+
+            response = requests.request('POST', app_url, data=encode(readings[0]), headers=headers)
+
+            assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+            response = requests.request('POST', app_url, data=b'\xc1', headers=headers)
+
+            assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_03_7_create_batch_with_auth_reading_keys(self):
+        '''Create a batch of pressure records with reading keys twice with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_03_7_create_batch_with_auth_reading_keys')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/batch'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        readings = []
+
+        for _ in range(2):
+            record_data = get_random_record_data()
+            record_data['latitude_public'] = float(int(record_data['latitude'] * 1000)) / 1000
+            record_data['longitude_public'] = float(int(record_data['longitude'] * 1000)) / 1000
+            record_data['timestamp'] = record_data['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+            record_data['reading_key'] = get_random_string(32)
+            readings.append(record_data)
+
+        # A reading repeated within the batch is stored once
+        readings.append(dict(readings[0]))
+
+        payload = json.dumps(readings)
+
+        log.debug('payload= {payload}'.format(payload=payload))
+
+        headers = {
+            'content-type': 'application/json',
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        response = requests.request('POST', app_url, data=payload, headers=headers)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=201)
+        )
+
+        assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+        json_data = json.loads(response.text)
+
+        self.assertEqual(json_data['created'], 2), 'Expected two created records'
+        self.assertEqual(
+            [result['status'] for result in json_data['results']],
+            [201, 201, 200]), 'Expected the repeated reading to be skipped'
+
+        # Sending the batch again stores nothing
+        response = requests.request('POST', app_url, data=payload, headers=headers)
+
+        assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+        json_data = json.loads(response.text)
+
+        self.assertEqual(json_data['created'], 0), 'Expected no created record'
+        self.assertEqual(
+            [result['status'] for result in json_data['results']],
+            [200, 200, 200]), 'Expected every reading to be skipped'
+
+        log.info('End')
+
     def test_step_04_get_record_without_auth(self):
         '''Get a pressure record without JWT token.'''
         log = logging.getLogger('TestCase.test_step_04_get_record_without_auth')
@@ -982,11 +1175,354 @@ class TestCaseProtectedPressure(unittest.TestCase):
 
         json_data = json.loads(response.text)
 
-        for item in json_data:
+        for item in json_data['items']:
             log.debug(str(item))
 
         log.info('End')
 
+    def test_step_09_1_get_records_page_with_auth(self):
+        '''Get pressure records one page at a time with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_09_1_get_records_page_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            "start": "0001-01-01",
+            "end": "9999-12-31",
+            "city": "Edmonton",
+            "province": "AB",
+            "country": "CA",
+            "limit": 1
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        json_data = json.loads(response.text)
+
+        self.assertLessEqual(len(json_data['items']), 1), 'Expected at most one record on the page'
+
+        if json_data['next'] is not None:
+            querystring['cursor'] = json_data['next']
+
+            response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+            assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+            next_json_data = json.loads(response.text)
+
+            self.assertLessEqual(len(next_json_data['items']), 1), 'Expected at most one record on the page'
+
+            if len(next_json_data['items']) > 0:
+                self.assertNotEqual(
+                    next_json_data['items'][0]['id'],
+                    json_data['items'][0]['id']), 'Expected the next page to start after the first page'
+
+        querystring['cursor'] = 'not a cursor'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_09_2_get_records_streamed_with_auth(self):
+        '''Get all pressure records streamed as ndjson and csv with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_09_2_get_records_streamed_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            "start": "0001-01-01",
+            "end": "9999-12-31",
+            "city": "Edmonton",
+            "province": "AB",
+            "country": "CA",
+            "format": "ndjson"
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring, stream=True)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+        assert response.headers['content-type'].startswith('application/x-ndjson'), 'Expected ndjson content'
+
+        for line in response.iter_lines():
+            if line:
+                item = json.loads(line)
+                self.assertEqual(item['city'], 'Edmonton'), 'Returned city is the same'
+
+        querystring['format'] = 'csv'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+        assert response.headers['content-type'].startswith('text/csv'), 'Expected csv content'
+        assert response.text.splitlines()[0].startswith('id,value,'), 'Expected a csv header row'
+
+        log.info('End')
+
+    def test_step_09_3_get_records_decimated_with_auth(self):
+        '''Get the pressure records of a wide date range thinned to max_points with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_09_3_get_records_decimated_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'content-type': 'application/json',
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        # A city of its own, with a reading an hour through part of 2017
+        city = get_random_string(16)
+        readings = []
+
+        for hour in range(200):
+            record_data = get_random_record_data()
+            record_data['city'] = city
+            record_data['timestamp'] = datetime(2017, 1, 1, tzinfo=pytz.UTC) + timedelta(hours=hour)
+            record_data['timestamp'] = record_data['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+            readings.append(record_data)
+
+        response = requests.request('POST', app_url + 'batch', data=json.dumps(readings), headers=headers)
+
+        assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+        querystring = {
+            "start": "0001-01-01",
+            "end": "9999-12-31",
+            "city": city,
+            "province": "AB",
+            "country": "CA",
+            "max_points": 20
+        }
+
+        for decimation in ('lttb', 'minmax'):
+            querystring['decimation'] = decimation
+
+            response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+            log.debug('Got {response_code} - expected {expected_code}'.format(
+                response_code=response.status_code,
+                expected_code=200)
+            )
+
+            assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+            json_data = json.loads(response.text)
+
+            # The buckets span the readings, not the ten thousand years asked for
+            self.assertGreaterEqual(len(json_data['items']), 18), 'Expected about max_points records'
+            self.assertLessEqual(len(json_data['items']), 20), 'Expected at most max_points records'
+
+        log.info('End')
+
+    def test_step_09_4_get_records_in_area_with_auth(self):
+        '''Get the pressure records inside a box and near a point with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_09_4_get_records_in_area_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'content-type': 'application/json',
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        record_data = get_random_record_data()
+        record_data['latitude'] = float('{:.6f}'.format(random.uniform(-60.0, 60.0)))
+        record_data['longitude'] = float('{:.6f}'.format(random.uniform(-170.0, 170.0)))
+        record_data['latitude_public'] = float(int(record_data['latitude'] * 1000)) / 1000
+        record_data['longitude_public'] = float(int(record_data['longitude'] * 1000)) / 1000
+        record_data['timestamp'] = record_data['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+
+        response = requests.request('POST', app_url, data=json.dumps(record_data), headers=headers)
+
+        assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+        record_id = json.loads(response.text)['id']
+        min_latitude, max_latitude = record_data['latitude'] - 0.5, record_data['latitude'] + 0.5
+        min_longitude, max_longitude = record_data['longitude'] - 0.5, record_data['longitude'] + 0.5
+
+        querystring = {
+            "start": "0001-01-01",
+            "end": "9999-12-31",
+            "bbox": '{0},{1},{2},{3}'.format(min_latitude, min_longitude, max_latitude, max_longitude),
+            "format": "ndjson"
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        items = [json.loads(line) for line in response.text.splitlines() if line]
+
+        self.assertIn(record_id, [item['id'] for item in items]), 'Expected the record inside the box'
+
+        for item in items:
+            self.assertTrue(min_latitude <= item['latitude_public'] <= max_latitude), 'Expected records inside the box'
+            self.assertTrue(min_longitude <= item['longitude_public'] <= max_longitude), \
+                'Expected records inside the box'
+
+        querystring.pop('bbox')
+        querystring['near'] = '{0},{1}'.format(record_data['latitude'], record_data['longitude'])
+        querystring['radius_km'] = 10
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        items = [json.loads(line) for line in response.text.splitlines() if line]
+
+        self.assertIn(record_id, [item['id'] for item in items]), 'Expected the record near the point'
+
+        querystring.pop('near')
+        querystring['bbox'] = '1,2,3'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_09_5_get_records_as_columns_with_auth(self):
+        '''Get the pressure records of a location in the column format with JWT token.'''
+        log = logging.getLogger('TestCase.test_step_09_5_get_records_as_columns_with_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'content-type': 'application/json',
+            'authorization': 'JWT {token}'.format(token=TestCaseProtectedPressure.token),
+            'cache-control': 'no-cache'
+        }
+
+        city = get_random_string(16)
+        records = []
+
+        for _ in range(3):
+            record_data = get_random_record_data()
+            record_data['city'] = city
+            record_data['latitude_public'] = float(int(record_data['latitude'] * 1000)) / 1000
+            record_data['longitude_public'] = float(int(record_data['longitude'] * 1000)) / 1000
+            record_data['timestamp'] = record_data['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+
+            response = requests.request('POST', app_url, data=json.dumps(record_data), headers=headers)
+
+            assert response.status_code == 201, 'Expected a HTTP status code 201'
+
+            records.append(json.loads(response.text))
+
+        records.sort(key=lambda record: (record['timestamp'], record['id']))
+
+        querystring = {
+            "start": "0001-01-01",
+            "end": "9999-12-31",
+            "city": city,
+            "province": "AB",
+            "country": "CA",
+            "format": "columns"
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        self.assertTrue(response.headers['content-type'].startswith(COLUMNS_MIMETYPE)), \
+            'Expected the column format'
+        self.assertEqual(response.content[:len(COLUMNS_MAGIC)], COLUMNS_MAGIC), 'Expected the column format magic'
+
+        columns = read_columns(response.content)
+
+        self.assertEqual(columns['id'].tolist(), [record['id'] for record in records]), \
+            'Expected the records ordered by timestamp'
+        self.assertEqual(columns['value'].tolist(), [record['value'] for record in records]), \
+            'Returned values are the same'
+        self.assertEqual(columns['city'], [city] * len(records)), 'Returned cities are the same'
+
+        querystring.pop('format')
+        headers['accept'] = COLUMNS_MIMETYPE
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        self.assertEqual(read_columns(response.content)['id'].tolist(), [record['id'] for record in records]), \
+            'Expected the column format from the Accept header'
+
+        log.info('End')
+
     def test_step_10_delete_record_without_auth(self):
         '''Delete a pressure record without JWT token.'''
         log = logging.getLogger('TestCase.test_step_10_delete_record_without_auth')
@@ -1098,12 +1634,20 @@ if __name__ == '__main__':
     logging.getLogger('TestCase.test_step_03_2_create_record_with_auth_out_of_range_latitude').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_03_3_create_record_with_auth_out_of_range_longitude').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_03_4_create_record_with_auth_out_of_range_longitude').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_5_create_batch_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_6_create_records_with_auth_msgpack_and_cbor').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_7_create_batch_with_auth_reading_keys').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_04_get_record_without_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_05_get_record_with_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_06_update_record_without_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_07_update_record_with_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_08_get_all_records_without_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_09_get_all_records_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_09_1_get_records_page_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_09_2_get_records_streamed_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_09_3_get_records_decimated_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_09_4_get_records_in_area_with_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_09_5_get_records_as_columns_with_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_10_delete_record_without_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_11_delete_record_with_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_12_get_deleted_record_with_auth').setLevel(logging.DEBUG)
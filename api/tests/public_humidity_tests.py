@@ -92,8 +92,8 @@ class TestCasePublicHumidity(unittest.TestCase):
 
         TestCasePublicHumidity.last_id = None
 
-        if len(json_data) > 0:
-            TestCasePublicHumidity.last_id = json_data[0]['id']
+        if len(json_data['items']) > 0:
+            TestCasePublicHumidity.last_id = json_data['items'][0]['id']
 
         log.info('End')
 
@@ -129,8 +129,315 @@ class TestCasePublicHumidity(unittest.TestCase):
         log.info('End')
 
 
+    def test_step_01_1_get_record_not_modified_without_auth(self):
+        '''Get a public record again with its ETag without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_01_1_get_record_not_modified_without_auth')
+        log.info('Start')
+
+        if TestCasePublicHumidity.last_id is not None:
+            app_url = '{base_url}/{context}/{resource}/{last_id}'.format(
+                base_url=self.base_url,
+                context=self.context,
+                resource=self.resource,
+                last_id=TestCasePublicHumidity.last_id
+            )
+
+            log.debug('app_url= {url}'.format(url=app_url))
+
+            response = requests.request('GET', app_url)
+
+            assert response.status_code == 200, 'Expected a HTTP status code 200'
+            assert 'ETag' in response.headers, 'Expected an ETag header'
+
+            headers = {
+                'If-None-Match': response.headers['ETag']
+            }
+
+            response = requests.request('GET', app_url, headers=headers)
+
+            log.debug('Got {response_code} - expected {expected_code}'.format(
+                response_code=response.status_code,
+                expected_code=304)
+            )
+
+            assert response.status_code == 304, 'Expected a HTTP status code 304'
+            self.assertEqual(response.text, ''), 'Expected an empty body'
+
+        log.info('End')
+
+    def test_step_02_get_aggregate_without_auth(self):
+        '''Get daily humidity statistics without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_02_get_aggregate_without_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/aggregate'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            'start': '0001-01-01',
+            'end': '9999-12-31',
+            'city': 'Edmonton',
+            'province': 'AB',
+            'country': 'CA',
+            'bucket': '1d',
+            'stats': 'min,max,count'
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        json_data = json.loads(response.text)
+
+        self.assertEqual(json_data['bucket'], '1d'), 'Returned bucket is the same'
+
+        for item in json_data['items']:
+            self.assertLessEqual(item['min'], item['max']), 'Expected min to be at most max'
+            self.assertGreater(item['count'], 0), 'Expected only buckets holding readings'
+            self.assertNotIn('avg', item), 'Expected only the requested statistics'
+
+        querystring['stats'] = 'median'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_03_get_cached_aggregate_without_auth(self):
+        '''Get the same humidity statistics twice without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_03_get_cached_aggregate_without_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/aggregate'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        querystring = {
+            'start': '0001-01-01',
+            'end': '9999-12-31',
+            'city': 'Edmonton',
+            'province': 'AB',
+            'country': 'CA',
+            'bucket': '1w',
+            'stats': 'avg,count'
+        }
+
+        first = requests.request('GET', app_url, data='', params=querystring)
+        second = requests.request('GET', app_url, data='', params=querystring)
+
+        assert first.status_code == 200, 'Expected a HTTP status code 200'
+        assert second.status_code == 200, 'Expected a HTTP status code 200'
+
+        self.assertEqual(json.loads(first.text), json.loads(second.text)), 'Expected the same statistics'
+
+        log.info('End')
+
+    def test_step_04_get_nearest_record_without_auth(self):
+        '''Get the humidity record of the station nearest to a point without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_04_get_nearest_record_without_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/{resource}/nearest'.format(
+            base_url=self.base_url,
+            context=self.context,
+            resource=self.resource
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            'lat': 53.5461,
+            'lon': -113.4938,
+            'at': '2017-06-14T12:00:00'
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        if TestCasePublicHumidity.last_id is not None:
+            assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+            json_data = json.loads(response.text)
+
+            self.assertGreaterEqual(json_data['distance_km'], 0.0), 'Expected a distance to the station'
+            self.assertNotIn('latitude', json_data), 'Expected only the public position of the station'
+        else:
+            assert response.status_code in (200, 404), 'Expected a HTTP status code 200 or 404'
+
+        querystring['lat'] = 91.0
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        querystring.pop('lat')
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_05_get_combined_records_without_auth(self):
+        '''Get the humidity records of several locations in one request without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_05_get_combined_records_without_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/public/readings'.format(
+            base_url=self.base_url,
+            context=self.context
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            'location': ['Edmonton,AB,CA', 'Calgary,AB,CA'],
+            'metric': 'humidity',
+            'start': '0001-01-01',
+            'end': '9999-12-31'
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        json_data = json.loads(response.text)
+
+        self.assertEqual(
+            [(series['city'], series['metric']) for series in json_data['series']],
+            [('Edmonton', 'humidity'), ('Calgary', 'humidity')]), 'Expected a series per location in request order'
+
+        for series in json_data['series']:
+            timestamps = [item['timestamp'] for item in series['items']]
+
+            self.assertEqual(timestamps, sorted(timestamps)), 'Expected the records ordered by timestamp'
+
+        querystring['location'] = 'edmonton,ab,ca'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        self.assertEqual(
+            [(series['city'], series['metric']) for series in json.loads(response.text)['series']],
+            [('edmonton', 'humidity')]), 'Expected the series of a location requested in another case'
+
+        querystring['location'] = 'Edmonton,AB'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+    def test_step_06_get_joined_records_without_auth(self):
+        '''Get the humidity records of a location aligned onto a time grid without JWT token.'''
+        log = logging.getLogger('TestCase.test_step_06_get_joined_records_without_auth')
+        log.info('Start')
+
+        app_url = '{base_url}/{context}/public/joined'.format(
+            base_url=self.base_url,
+            context=self.context
+        )
+
+        log.debug('base_url= {url}'.format(url=self.base_url))
+        log.debug('app_url= {url}'.format(url=app_url))
+
+        headers = {
+            'cache-control': 'no-cache'
+        }
+
+        querystring = {
+            'start': '2017-06-01',
+            'end': '2017-06-02',
+            'city': 'Edmonton',
+            'province': 'AB',
+            'country': 'CA',
+            'step': 3600,
+            'align': 'previous',
+            'tolerance': 1800,
+            'derived': 'dew_point'
+        }
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        log.debug('Got {response_code} - expected {expected_code}'.format(
+            response_code=response.status_code,
+            expected_code=200)
+        )
+
+        assert response.status_code == 200, 'Expected a HTTP status code 200'
+
+        json_data = json.loads(response.text)
+
+        # Both dates are included, an hour apart: 25 points
+        self.assertEqual(len(json_data['timestamp']), 25), 'Expected a point per step'
+        self.assertEqual(len(json_data['humidity']), 25), 'Expected a humidity reading or null per point'
+        self.assertEqual(len(json_data['dew_point']), 25), 'Expected a dew point or null per point'
+
+        querystring['tolerance'] = 7200
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        querystring['tolerance'] = 1800
+        querystring['derived'] = 'wind_chill'
+
+        response = requests.request('GET', app_url, headers=headers, data='', params=querystring)
+
+        assert response.status_code == 400, 'Expected a HTTP status code 400'
+
+        log.info('End')
+
+
 if __name__ == '__main__':
     logging.basicConfig(stream=sys.stderr)
     logging.getLogger('TestCase.test_step_00_get_all_records_without_auth').setLevel(logging.DEBUG)
     logging.getLogger('TestCase.test_step_01_get_record_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_1_get_record_not_modified_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_get_aggregate_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_03_get_cached_aggregate_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_04_get_nearest_record_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_05_get_combined_records_without_auth').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_06_get_joined_records_without_auth').setLevel(logging.DEBUG)
     unittest.main()
@@ -0,0 +1,142 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from flask import Flask
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from api.weather_data_flaskapi.business import weather_data
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, HumidityHourlyRollup
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(reading_key: str, city: str = 'Edmonton', timestamp: str = '2017-06-14T12:00:00'):
+    '''Generate a humidity data record of a city with a reading key'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA',
+        'reading_key': reading_key
+    }
+
+
+class TestCaseReadingKey(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def stored_readings(self, reading_key: str) -> int:
+        with self.app.app_context():
+            return db.session.execute(select(func.count(Humidity.id)).where(
+                Humidity.reading_key == reading_key)).scalar()
+
+    def test_step_00_refuse_stored_reading_key(self):
+        '''Refuse a second row with a stored reading key in the database itself.'''
+        log = logging.getLogger('TestCase.test_step_00_refuse_stored_reading_key')
+        log.info('Start')
+
+        reading_key = get_random_string(32)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(reading_key)])
+
+            row = db.session.execute(select(Humidity.__table__).where(
+                Humidity.reading_key == reading_key)).mappings().one()
+
+            with self.assertRaises(IntegrityError):
+                db.session.execute(Humidity.__table__.insert().values(dict(row, id=None)))
+
+            db.session.rollback()
+
+        self.assertEqual(self.stored_readings(reading_key), 1), 'Expected the reading key to be stored once'
+
+        log.info('End')
+
+    def test_step_01_report_keys_stored_meanwhile(self):
+        '''Report the readings whose keys another request stored after they were looked up as already created.'''
+        log = logging.getLogger('TestCase.test_step_01_report_keys_stored_meanwhile')
+        log.info('Start')
+
+        city = get_random_string(16)
+        stored_key, new_key = get_random_string(32), get_random_string(32)
+        stored_reading_keys = weather_data._stored_reading_keys
+
+        def stored_reading_keys_missed(model, rows, lock=False):
+            # The keys are stored by another request between the lookup and the INSERT
+            return stored_reading_keys(model, rows, lock=lock) if lock else set()
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(stored_key, city)])
+
+            with mock.patch.object(weather_data, '_stored_reading_keys', stored_reading_keys_missed):
+                result = create_readings(Humidity, [get_record_data(stored_key, city),
+                                                    get_record_data(new_key, city)])
+
+            self.assertEqual([item['status'] for item in result['results']], [200, 201]), \
+                'Expected the stored reading to be reported as already created'
+            self.assertEqual(result['created'], 1), 'Expected one reading created'
+
+            count = db.session.execute(select(HumidityHourlyRollup.count).where(
+                HumidityHourlyRollup.location_id.in_(find_location_ids(city, 'AB', 'CA')),
+                HumidityHourlyRollup.bucket == datetime(2017, 6, 14, 12, 0, 0))).scalar()
+
+            self.assertEqual(count, 2), 'Expected the rollup to count each stored reading once'
+
+        self.assertEqual(self.stored_readings(stored_key), 1), 'Expected the stored reading key to be stored once'
+        self.assertEqual(self.stored_readings(new_key), 1), 'Expected the new reading key to be stored'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_refuse_stored_reading_key').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_report_keys_stored_meanwhile').setLevel(logging.DEBUG)
+    unittest.main()
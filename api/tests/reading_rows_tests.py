@@ -0,0 +1,152 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.queries import _reading_rows_statement, location_reading_rows, \
+    query_readings, reading_rows
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, Pressure
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str):
+    '''Generate a humidity data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+class TestCaseReadingRows(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+        cls.city = get_random_string(16)
+
+        # Readings sharing a timestamp are ordered by id
+        with cls.app.app_context():
+            create_readings(Humidity, [get_record_data(cls.city, '2017-06-{day:02d}T12:00:00'.format(day=day))
+                                       for day in (1, 2, 2, 2, 3, 4, 5, 6, 7, 8)])
+
+    def test_step_00_build_statement_once_per_shape(self):
+        '''Build the statement of a shape of read once and reuse it.'''
+        log = logging.getLogger('TestCase.test_step_00_build_statement_once_per_shape')
+        log.info('Start')
+
+        self.assertIs(_reading_rows_statement(Humidity, True, True, True),
+                      _reading_rows_statement(Humidity, True, True, True)), 'Expected the same statement'
+        self.assertIsNot(_reading_rows_statement(Humidity, True, True, True),
+                         _reading_rows_statement(Humidity, True, False, True)), \
+            'Expected a statement per shape'
+        self.assertIsNot(_reading_rows_statement(Humidity, True, True, True),
+                         _reading_rows_statement(Pressure, True, True, True)), \
+            'Expected a statement per reading table'
+
+        log.info('End')
+
+    def test_step_01_read_rows_as_the_orm(self):
+        '''Read the same readings as rows as through the ORM, with their location.'''
+        log = logging.getLogger('TestCase.test_step_01_read_rows_as_the_orm')
+        log.info('Start')
+
+        start, end = datetime(2017, 6, 1), datetime(2017, 6, 30)
+
+        with self.app.app_context():
+            expected = [(reading.id, reading.timestamp, float(reading.value))
+                        for reading in query_readings(Humidity, start, end, self.city, 'AB', 'CA').order_by(
+                            Humidity.timestamp, Humidity.id)]
+
+            rows = reading_rows(Humidity, start, end, self.city, 'AB', 'CA')
+
+            self.assertEqual([(row.id, row.timestamp, float(row.value)) for row in rows], expected), \
+                'Expected the readings in (timestamp, id) order'
+            self.assertEqual(set((row.city, row.province, row.country) for row in rows),
+                             {(self.city, 'AB', 'CA')}), 'Expected the location of the readings'
+            self.assertEqual(reading_rows(Humidity, start, end, get_random_string(16), 'AB', 'CA'), []), \
+                'Expected no rows without a location'
+
+        log.info('End')
+
+    def test_step_02_read_pages_of_rows(self):
+        '''Read rows after a keyset position, limited, up to an excluded end and in batches.'''
+        log = logging.getLogger('TestCase.test_step_02_read_pages_of_rows')
+        log.info('Start')
+
+        start, end = datetime(2017, 6, 1), datetime(2017, 6, 30)
+
+        with self.app.app_context():
+            location_ids = find_location_ids(self.city, 'AB', 'CA')
+            everything = [row.id for row in location_reading_rows(Humidity, location_ids, start, end)]
+
+            first = location_reading_rows(Humidity, location_ids, start, end, limit=3)
+            second = location_reading_rows(Humidity, location_ids, start, end, limit=3,
+                                           position=(first[-1].timestamp, first[-1].id))
+
+            self.assertEqual([row.id for row in first + second], everything[:6]), \
+                'Expected the second page to start after the first, within a timestamp'
+
+            excluded = location_reading_rows(Humidity, location_ids, start, datetime(2017, 6, 8, 12, 0, 0),
+                                             end_inclusive=False)
+
+            self.assertEqual(excluded[-1].timestamp, datetime(2017, 6, 7, 12, 0, 0)), 'Expected the end to be excluded'
+
+            self.assertEqual([row.id for row in location_reading_rows(Humidity, location_ids, start, end,
+                                                                      yield_per=4)], everything), \
+                'Expected the same rows read in batches'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_build_statement_once_per_shape').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_read_rows_as_the_orm').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_read_pages_of_rows').setLevel(logging.DEBUG)
+    unittest.main()
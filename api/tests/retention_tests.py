@@ -0,0 +1,140 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import select
+
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.retention import RetentionPolicyError, apply_retention, retention_days, \
+    validate_policies
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, HumidityDailyRollup
+
+# A country of its own, so the policy of the test expires no other reading
+COUNTRY = 'XR'
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str):
+    '''Generate a humidity data record of a city'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': COUNTRY
+    }
+
+
+class TestCaseRetention(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def test_step_00_validate_policies(self):
+        '''Refuse retention policies that are not days by country by metric.'''
+        log = logging.getLogger('TestCase.test_step_00_validate_policies')
+        log.info('Start')
+
+        validate_policies({'*': {'*': 90}, 'humidity': {'CA': None}})
+
+        for policies in ([90], {'*': 90}, {'*': {'*': 0}}, {'*': {'*': '90'}}):
+            with self.assertRaises(RetentionPolicyError):
+                validate_policies(policies)
+
+        log.info('End')
+
+    def test_step_01_find_retention_days(self):
+        '''Prefer the policy of the metric, and within it of the country.'''
+        log = logging.getLogger('TestCase.test_step_01_find_retention_days')
+        log.info('Start')
+
+        policies = {'*': {'*': 90, 'US': 30}, 'humidity': {'CA': None, '*': 60}}
+
+        self.assertIsNone(retention_days(policies, 'humidity', 'CA')), 'Expected the readings to be kept forever'
+        self.assertEqual(retention_days(policies, 'humidity', 'US'), 60), 'Expected the policy of the metric'
+        self.assertEqual(retention_days(policies, 'pressure', 'US'), 30), 'Expected the policy of the country'
+        self.assertEqual(retention_days(policies, 'pressure', 'CA'), 90), 'Expected the default policy'
+        self.assertIsNone(retention_days({}, 'pressure', 'CA')), 'Expected no policy to keep the readings'
+
+        log.info('End')
+
+    def test_step_02_apply_retention(self):
+        '''Delete the expired readings of a country and keep their daily rollups.'''
+        log = logging.getLogger('TestCase.test_step_02_apply_retention')
+        log.info('Start')
+
+        city = get_random_string(16)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-05-01T12:00:00'),
+                                       get_record_data(city, '2017-06-30T12:00:00')])
+
+            location_ids = find_location_ids(city, 'AB', COUNTRY)
+
+            result = apply_retention({'humidity': {COUNTRY: 30}}, Humidity, now=datetime(2017, 7, 1), chunk_size=1)
+
+            self.assertEqual(result['deleted'], 1), 'Expected the reading of May to be deleted'
+
+            timestamps = db.session.execute(select(Humidity.timestamp).where(
+                Humidity.location_id.in_(location_ids))).scalars().all()
+
+            self.assertEqual(timestamps, [datetime(2017, 6, 30, 12, 0, 0)]), 'Expected the reading of June to be kept'
+
+            buckets = db.session.execute(select(HumidityDailyRollup.bucket).where(
+                HumidityDailyRollup.location_id.in_(location_ids)).order_by(HumidityDailyRollup.bucket)).scalars().all()
+
+            self.assertEqual(buckets, [datetime(2017, 5, 1), datetime(2017, 6, 30)]), \
+                'Expected the daily rollups to be kept'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_validate_policies').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_find_retention_days').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_apply_retention').setLevel(logging.DEBUG)
+    unittest.main()
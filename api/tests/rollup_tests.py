@@ -0,0 +1,195 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import delete, select, update
+
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.rollups import rebuild_rollups, recompute_rollups
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity, HumidityDailyRollup, HumidityHourlyRollup
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str, value: float):
+    '''Generate a humidity data record of a city'''
+    return {
+        'value': value,
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': 53.5461,
+        'longitude': -113.4938,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+def get_buckets(rollup_model, location_ids: list) -> list:
+    '''Read the (bucket, count, total, minimum, maximum) of the rollups of locations'''
+    return [tuple(row) for row in db.session.execute(select(rollup_model.bucket,
+                                                            rollup_model.count,
+                                                            rollup_model.total,
+                                                            rollup_model.minimum,
+                                                            rollup_model.maximum).where(
+        rollup_model.location_id.in_(location_ids)).order_by(rollup_model.bucket))]
+
+
+class TestCaseRollups(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def setUp(self):
+        self.city = get_random_string(16)
+
+    def test_step_00_add_readings_to_rollups(self):
+        '''Add new readings to their hourly and daily buckets as they are created.'''
+        log = logging.getLogger('TestCase.test_step_00_add_readings_to_rollups')
+        log.info('Start')
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(self.city, '2017-06-14T08:10:00', 40.0),
+                                       get_record_data(self.city, '2017-06-14T08:50:00', 60.0),
+                                       get_record_data(self.city, '2017-06-14T09:30:00', 20.0)])
+
+            location_ids = find_location_ids(self.city, 'AB', 'CA')
+
+            self.assertEqual(get_buckets(HumidityHourlyRollup, location_ids),
+                             [(datetime(2017, 6, 14, 8), 2, 100.0, 40.0, 60.0),
+                              (datetime(2017, 6, 14, 9), 1, 20.0, 20.0, 20.0)]), 'Expected a bucket per hour'
+
+            # A later batch is added to the buckets already written
+            create_readings(Humidity, [get_record_data(self.city, '2017-06-14T08:20:00', 70.5),
+                                       get_record_data(self.city, '2017-06-15T00:00:00', 10.0)])
+
+            self.assertEqual(get_buckets(HumidityHourlyRollup, location_ids),
+                             [(datetime(2017, 6, 14, 8), 3, 170.5, 40.0, 70.5),
+                              (datetime(2017, 6, 14, 9), 1, 20.0, 20.0, 20.0),
+                              (datetime(2017, 6, 15, 0), 1, 10.0, 10.0, 10.0)]), \
+                'Expected the new readings added to their buckets'
+            self.assertEqual(get_buckets(HumidityDailyRollup, location_ids),
+                             [(datetime(2017, 6, 14), 4, 190.5, 20.0, 70.5),
+                              (datetime(2017, 6, 15), 1, 10.0, 10.0, 10.0)]), 'Expected a bucket per day'
+
+            total_of_squares = db.session.execute(select(HumidityDailyRollup.total_of_squares).where(
+                HumidityDailyRollup.location_id.in_(location_ids),
+                HumidityDailyRollup.bucket == datetime(2017, 6, 14))).scalar()
+
+            self.assertAlmostEqual(total_of_squares, 40.0 ** 2 + 60.0 ** 2 + 20.0 ** 2 + 70.5 ** 2), \
+                'Expected the sum of squares of the day'
+
+        log.info('End')
+
+    def test_step_01_recompute_rollups(self):
+        '''Recompute the buckets of changed and deleted readings from the readings.'''
+        log = logging.getLogger('TestCase.test_step_01_recompute_rollups')
+        log.info('Start')
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(self.city, '2017-06-14T08:10:00', 40.0),
+                                       get_record_data(self.city, '2017-06-14T08:50:00', 60.0),
+                                       get_record_data(self.city, '2017-06-14T09:30:00', 20.0)])
+
+            location_ids = find_location_ids(self.city, 'AB', 'CA')
+            expected = get_buckets(HumidityHourlyRollup, location_ids)
+            locations = [(location_ids[0], datetime(2017, 6, 14, 8, 10)), (location_ids[0], datetime(2017, 6, 14, 9))]
+
+            db.session.execute(update(HumidityHourlyRollup).where(
+                HumidityHourlyRollup.location_id.in_(location_ids)).values(count=999, minimum=-1.0))
+            recompute_rollups(Humidity, locations)
+
+            self.assertEqual(get_buckets(HumidityHourlyRollup, location_ids), expected), \
+                'Expected the buckets summed again from the readings'
+
+            # The maximum of the hour and the only reading of the next hour are deleted
+            db.session.execute(delete(Humidity).where(Humidity.location_id.in_(location_ids),
+                                                      Humidity.value != 40.0))
+            recompute_rollups(Humidity, locations)
+            db.session.commit()
+
+            self.assertEqual(get_buckets(HumidityHourlyRollup, location_ids),
+                             [(datetime(2017, 6, 14, 8), 1, 40.0, 40.0, 40.0)]), \
+                'Expected the deleted readings taken out of their buckets'
+            self.assertEqual(get_buckets(HumidityDailyRollup, location_ids),
+                             [(datetime(2017, 6, 14), 1, 40.0, 40.0, 40.0)]), 'Expected the day recomputed'
+
+        log.info('End')
+
+    def test_step_02_rebuild_rollups(self):
+        '''Rebuild the rollups of a range as they were maintained.'''
+        log = logging.getLogger('TestCase.test_step_02_rebuild_rollups')
+        log.info('Start')
+
+        with self.app.app_context():
+            timestamps = ['2017-07-{day:02d}T{hour:02d}:30:00'.format(day=day, hour=hour)
+                          for day in (1, 2) for hour in (0, 6, 6, 23)]
+
+            create_readings(Humidity, [get_record_data(self.city, timestamp,
+                                                       float('{:.4f}'.format(random.uniform(0, 100.0))))
+                                       for timestamp in timestamps])
+
+            location_ids = find_location_ids(self.city, 'AB', 'CA')
+            hourly = get_buckets(HumidityHourlyRollup, location_ids)
+            daily = get_buckets(HumidityDailyRollup, location_ids)
+
+            rebuild_rollups(Humidity, start=datetime(2017, 7, 1), end=datetime(2017, 7, 2, 23, 59))
+
+            for rollup_model, expected in ((HumidityHourlyRollup, hourly), (HumidityDailyRollup, daily)):
+                rebuilt = get_buckets(rollup_model, location_ids)
+
+                self.assertEqual([bucket[:2] for bucket in rebuilt], [bucket[:2] for bucket in expected]), \
+                    'Expected the same buckets and counts'
+
+                for bucket, rebuilt_bucket in zip(expected, rebuilt):
+                    for value, rebuilt_value in zip(bucket[2:], rebuilt_bucket[2:]):
+                        self.assertAlmostEqual(value, rebuilt_value), 'Expected the same sums, minimum and maximum'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_add_readings_to_rollups').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_recompute_rollups').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_02_rebuild_rollups').setLevel(logging.DEBUG)
+    unittest.main()
@@ -0,0 +1,120 @@
+'''
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+'''
+
+import logging
+import random
+import string
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from flask import Flask
+
+from api.weather_data_flaskapi.business.stations import nearest_reading, set_station_indexes, station_index
+from api.weather_data_flaskapi.business.weather_data import create_readings
+from database import db
+from database.models import Humidity
+
+
+def create_test_app():
+    '''Create an application on the database of config.TestingConfig'''
+    test_app = Flask(__name__)
+    test_app.config.from_object('config.TestingConfig')
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.create_all()
+
+    return test_app
+
+
+def get_random_string(length: int) -> str:
+    '''Generate a random string of length.
+
+    :arg length: The length of the string
+    :rtype str
+    '''
+    return ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(length))
+
+
+def get_record_data(city: str, timestamp: str, latitude: float, longitude: float):
+    '''Generate a data record of a city at a position'''
+    return {
+        'value': float('{:.4f}'.format(random.uniform(0, 100.0))),
+        'value_units': '%',
+        'value_error_range': 0.1,
+        'latitude': latitude,
+        'longitude': longitude,
+        'elevation': 645.0,
+        'elevation_units': 'm',
+        'timestamp': timestamp,
+        'city': city,
+        'province': 'AB',
+        'country': 'CA'
+    }
+
+
+class TestCaseStations(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_test_app()
+
+    def test_step_00_build_index_at_startup(self):
+        '''Read the station positions when the indexes are set up, not on the first lookup.'''
+        log = logging.getLogger('TestCase.test_step_00_build_index_at_startup')
+        log.info('Start')
+
+        city = get_random_string(16)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-06-01T12:00:00', -45.1234, 170.5678),
+                                       get_record_data(city, '2017-06-02T12:00:00', -45.1234, 170.5678)])
+
+        set_station_indexes(self.app, [Humidity], refresh_seconds=3600)
+        index = station_index(Humidity)
+
+        with mock.patch.object(index, 'refresh') as refresh:
+            stations = index.nearest(-45.1, 170.5, count=1)
+
+        refresh.assert_not_called(), 'Expected the lookup to use the positions read at startup'
+        self.assertEqual(len(stations), 1), 'Expected the station of the readings'
+        self.assertAlmostEqual(stations[0][1], -45.1234, places=2), 'Expected the latitude of the station'
+        self.assertAlmostEqual(stations[0][2], 170.5678, places=2), 'Expected the longitude of the station'
+
+        log.info('End')
+
+    def test_step_01_nearest_reading(self):
+        '''Find the reading of the nearest station closest in time, including one created after startup.'''
+        log = logging.getLogger('TestCase.test_step_01_nearest_reading')
+        log.info('Start')
+
+        city = get_random_string(16)
+        set_station_indexes(self.app, [Humidity], refresh_seconds=3600)
+
+        with self.app.app_context():
+            create_readings(Humidity, [get_record_data(city, '2017-06-01T12:00:00', 45.4321, -70.8765),
+                                       get_record_data(city, '2017-06-03T12:00:00', 45.4321, -70.8765)])
+
+            row, distance = nearest_reading(Humidity, 45.43, -70.87, datetime(2017, 6, 2, 18))
+
+        self.assertEqual(row.city, city), 'Expected the reading of the nearest station'
+        self.assertEqual(row.timestamp, datetime(2017, 6, 3, 12)), 'Expected the reading closest in time'
+        self.assertLess(distance, 1.0), 'Expected the distance to the station'
+
+        log.info('End')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(stream=sys.stderr)
+    logging.getLogger('TestCase.test_step_00_build_index_at_startup').setLevel(logging.DEBUG)
+    logging.getLogger('TestCase.test_step_01_nearest_reading').setLevel(logging.DEBUG)
+    unittest.main()
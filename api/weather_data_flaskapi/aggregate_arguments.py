@@ -0,0 +1,55 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from flask_restplus import reqparse
+
+from api.weather_data_flaskapi.business.aggregation import BUCKET_SECONDS, STATISTICS
+
+aggregate_arguments = reqparse.RequestParser(bundle_errors=True)
+
+aggregate_arguments.add_argument('start',
+                                 type=str,
+                                 required=True,
+                                 help='Start date (e.g. 2017-01-30)')
+
+aggregate_arguments.add_argument('end',
+                                 type=str,
+                                 required=True,
+                                 help='End date (e.g. 2017-01-30)')
+
+aggregate_arguments.add_argument('city',
+                                 type=str,
+                                 required=True,
+                                 help='City')
+
+aggregate_arguments.add_argument('province',
+                                 type=str,
+                                 required=True,
+                                 help='Province')
+
+aggregate_arguments.add_argument('country',
+                                 type=str,
+                                 required=True,
+                                 help='Country')
+
+aggregate_arguments.add_argument('bucket',
+                                 type=str,
+                                 required=False,
+                                 choices=tuple(BUCKET_SECONDS),
+                                 default='1h',
+                                 help='Bucket size {error_msg}')
+
+aggregate_arguments.add_argument('stats',
+                                 type=str,
+                                 required=False,
+                                 default='min,max,avg,count',
+                                 help='Comma separated statistics ({statistics})'.format(
+                                     statistics=', '.join(STATISTICS)))
@@ -0,0 +1,219 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import math
+
+from sqlalchemy import Float, and_, func
+
+from api.weather_data_flaskapi.business.archive import reading_archive, split_range
+from api.weather_data_flaskapi.business.buckets import bucket_start_seconds, bucket_seconds_to_datetime, \
+    ceil_bucket, floor_bucket
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.queries import location_filter
+from api.weather_data_flaskapi.business.rollups import coarsest_rollup, query_rollup_buckets
+from database.models import utc_timestamp
+from database.types import decoded
+
+BUCKET_SECONDS = {
+    '1h': 3600,
+    '1d': 86400,
+    '1w': 604800,
+}
+
+STATISTICS = ('min', 'max', 'avg', 'count', 'stddev')
+
+
+class AggregateValueError(ValueError):
+    """
+    Exception on an unknown statistic or a date that cannot be parsed.
+    """
+    pass
+
+
+def parse_statistics(stats: str) -> list:
+    """
+    Parse a comma separated list of statistics.
+
+    :param stats: The statistics requested (e.g. min,max,avg).
+    :type stats: str
+    :return: The list of statistics.
+    """
+    statistics = [statistic.strip() for statistic in stats.split(',') if statistic.strip()]
+
+    unknown = [statistic for statistic in statistics if statistic not in STATISTICS]
+
+    if unknown or not statistics:
+        raise AggregateValueError('stats must be a comma separated list of {statistics}'.format(
+            statistics=', '.join(STATISTICS)))
+
+    return statistics
+
+
+def parse_date_range(start, end) -> tuple:
+    """
+    Parse the start and end of a date range.
+
+    :param start: The start date (e.g. 2017-01-30).
+    :param end: The end date (e.g. 2017-01-30).
+    :return: A (start, end) tuple of naive UTC datetimes.
+    """
+    try:
+        return utc_timestamp(start), utc_timestamp(end)
+    except ValueError:
+        raise AggregateValueError('start and end must be ISO 8601 dates')
+
+
+def summarize(bucket_seconds: int, count: int, total, total_of_squares, minimum, maximum, statistics: list) -> dict:
+    """
+    Compute the requested statistics of a bucket from its count, sum, sum of squares, minimum and maximum.
+
+    :param bucket_seconds: The seconds from BUCKET_ORIGIN to the start of the bucket.
+    :type bucket_seconds: int
+    :param count: The number of readings in the bucket.
+    :type count: int
+    :param total: The sum of the readings.
+    :param total_of_squares: The sum of the squares of the readings.
+    :param minimum: The smallest reading.
+    :param maximum: The largest reading.
+    :param statistics: The statistics requested.
+    :type statistics: list
+    :return: A dict with the bucket start and the requested statistics.
+    """
+    mean = float(total) / count
+    summary = {'bucket': bucket_seconds_to_datetime(bucket_seconds)}
+
+    if 'min' in statistics:
+        summary['min'] = float(minimum)
+    if 'max' in statistics:
+        summary['max'] = float(maximum)
+    if 'avg' in statistics:
+        summary['avg'] = mean
+    if 'count' in statistics:
+        summary['count'] = int(count)
+    if 'stddev' in statistics:
+        # Population standard deviation; rounding can leave a tiny negative variance
+        summary['stddev'] = math.sqrt(max(float(total_of_squares) / count - mean * mean, 0.0))
+
+    return summary
+
+
+def _merge(sums: dict, rows):
+    for bucket_seconds, count, total, total_of_squares, minimum, maximum in rows:
+        if not count:
+            continue
+
+        if bucket_seconds in sums:
+            previous = sums[bucket_seconds]
+            sums[bucket_seconds] = (previous[0] + count,
+                                    previous[1] + float(total),
+                                    previous[2] + float(total_of_squares),
+                                    min(previous[3], float(minimum)),
+                                    max(previous[4], float(maximum)))
+        else:
+            sums[bucket_seconds] = (count, float(total), float(total_of_squares), float(minimum), float(maximum))
+
+
+def _query_reading_buckets(model, location_ids: list, lower, upper, upper_inclusive: bool, width: int) -> list:
+    archive = reading_archive()
+
+    if archive is None:
+        return _query_table_buckets(model, location_ids, lower, upper, upper_inclusive, width)
+
+    rows = []
+
+    # The months held by the archive are summed from it, the others from the table
+    for archived, part_lower, part_upper, part_upper_inclusive in split_range(archive.window(model.__tablename__),
+                                                                              lower, upper, upper_inclusive):
+        if archived:
+            rows.extend(archive.buckets(model, location_ids, part_lower, part_upper, part_upper_inclusive, width))
+        else:
+            rows.extend(_query_table_buckets(model, location_ids, part_lower, part_upper, part_upper_inclusive, width))
+
+    return rows
+
+
+def _query_table_buckets(model, location_ids: list, lower, upper, upper_inclusive: bool, width: int) -> list:
+    bucket_seconds = bucket_start_seconds(model.timestamp, width).label('bucket_seconds')
+    upper_filter = model.timestamp <= upper if upper_inclusive else model.timestamp < upper
+
+    return model.query.filter(
+        and_(model.timestamp >= lower,
+             upper_filter)).filter(
+        location_filter(model, location_ids)).with_entities(
+        bucket_seconds,
+        func.count(model.value),
+        func.sum(decoded(model.value), type_=Float),
+        func.sum(decoded(model.value) * decoded(model.value), type_=Float),
+        func.min(model.value),
+        func.max(model.value)).group_by(bucket_seconds).all()
+
+
+def aggregate_readings(model,
+                       start: str,
+                       end: str,
+                       city: str,
+                       province: str,
+                       country: str,
+                       bucket: str,
+                       statistics: list) -> list:
+    """
+    Summarize the readings of a location within a date range per time bucket.
+
+    The grouping is done by the database, so only one row per bucket is read. Whole hours or days
+    inside the range are read from the coarsest rollup that divides the bucket; only the partial
+    hours or days at the ends of the range are summed from the readings, or from the archive for the
+    months it holds.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: The start date (e.g. 2017-01-30).
+    :type start: str
+    :param end: The end date (e.g. 2017-01-30), inclusive.
+    :type end: str
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :param bucket: The bucket size, one of BUCKET_SECONDS.
+    :type bucket: str
+    :param statistics: The statistics requested, from STATISTICS.
+    :type statistics: list
+    :return: A list of bucket summaries ordered by bucket start.
+    """
+    start, end = parse_date_range(start, end)
+
+    location_ids = find_location_ids(city, province, country)
+
+    if not location_ids:
+        return []
+
+    width = BUCKET_SECONDS[bucket]
+    rollup_model = coarsest_rollup(model, width)
+    sums = {}
+
+    if rollup_model is not None:
+        lower = ceil_bucket(start, rollup_model.period_seconds)
+        upper = floor_bucket(end, rollup_model.period_seconds)
+    else:
+        lower = upper = None
+
+    if rollup_model is not None and lower < upper:
+        _merge(sums, query_rollup_buckets(rollup_model, location_ids, lower, upper, width))
+
+        if start < lower:
+            _merge(sums, _query_reading_buckets(model, location_ids, start, lower, False, width))
+
+        _merge(sums, _query_reading_buckets(model, location_ids, upper, end, True, width))
+    else:
+        _merge(sums, _query_reading_buckets(model, location_ids, start, end, True, width))
+
+    return [summarize(bucket_seconds, *sums[bucket_seconds], statistics=statistics) for bucket_seconds in sorted(sums)]
@@ -0,0 +1,836 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import and_, func, select
+
+from api.weather_data_flaskapi.business.buckets import EPOCH_OFFSET_SECONDS
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.partitions import add_months, month_start
+from api.weather_data_flaskapi.business.queries import LOCATION_COLUMNS, area_filter, area_reading_rows, \
+    location_filter, location_reading_rows, reading_bounds
+from database import db
+from database.models import Location
+
+log = logging.getLogger(__name__)
+
+# The archived columns of a reading and their types; text columns are stored as codes into a dictionary
+ARCHIVE_COLUMNS = {
+    'id': np.int64,
+    'location_id': np.int64,
+    'timestamp': 'datetime64[us]',
+    'value': np.float64,
+    'value_error_range': np.float64,
+    'latitude': np.float64,
+    'latitude_public': np.float64,
+    'longitude': np.float64,
+    'longitude_public': np.float64,
+    'value_units': np.int32,
+}
+
+DICTIONARY_COLUMNS = ('value_units',)
+
+# Rows read from the database per fetch of an export
+EXPORT_CHUNK_SIZE = 10000
+
+# Archived rows converted to Python objects at a time
+ROW_BATCH_SIZE = 1000
+
+MANIFEST = 'manifest.json'
+
+STATE = 'archive.json'
+
+# The archive of the application; see set_reading_archive
+_archives = {'reading': None}
+
+
+@lru_cache(maxsize=None)
+def archived_row_type(model):
+    """
+    Build the row type of archived readings, with the fields of the rows of reading_rows.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :return: A named tuple class.
+    """
+    names = [column.name for column in model.__table__.columns if column.name != 'location_id']
+    return namedtuple('Archived' + model.__name__, names + list(LOCATION_COLUMNS))
+
+
+def _month_name(month) -> str:
+    return '{month:%Y-%m}'.format(month=month)
+
+
+def _datetime(month) -> datetime:
+    return datetime(month.year, month.month, 1)
+
+
+def _datetime64(value: datetime):
+    return np.datetime64(value, 'us')
+
+
+class ArchivedMonth(object):
+    """
+    The readings of a metric in one month, as one memory-mapped array per column.
+
+    Rows are sorted by location, timestamp and id. The manifest holds the first and last row, the
+    first and last timestamp and the smallest and largest value of each location, so a query reads
+    only the runs of its locations and skips months they have no readings in.
+    """
+
+    def __init__(self, path: str):
+        """
+        ArchivedMonth constructor.
+
+        :param path: The directory of the month.
+        :type path: str
+        """
+        self.path = path
+
+        with open(os.path.join(path, MANIFEST)) as manifest:
+            self.manifest = json.load(manifest)
+
+        self.rows = self.manifest['rows']
+        self.dictionaries = self.manifest['dictionaries']
+        self.locations = dict((int(location_id), run) for location_id, run in self.manifest['locations'].items())
+        self._columns = {}
+
+    def column(self, name: str):
+        """
+        Get a column, mapped into memory on first use.
+
+        :param name: The column name, one of ARCHIVE_COLUMNS.
+        :type name: str
+        :return: The numpy array.
+        """
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+
+        return self._columns[name]
+
+    def select(self, location_ids: list, start: datetime, end: datetime, end_inclusive: bool = True,
+               position: tuple = None, area=None):
+        """
+        Find the rows of locations within a date range, in (timestamp, id) order.
+
+        :param location_ids: The identifiers of the locations, or None for every location.
+        :type location_ids: list
+        :param start: The start date and time.
+        :type start: datetime
+        :param end: The end date and time.
+        :type end: datetime
+        :param end_inclusive: Whether the range holds its end.
+        :type end_inclusive: bool
+        :param position: Only the rows after this (timestamp, id) keyset position.
+        :type position: tuple
+        :param area: Only the rows whose public coordinates are in this area.
+        :type area: Area
+        :return: An array of row numbers.
+        """
+        timestamps = self.column('timestamp')
+        lower = _datetime64(start)
+        upper = _datetime64(end)
+        runs = []
+
+        for location_id in sorted(self.locations) if location_ids is None else location_ids:
+            run = self.locations.get(location_id)
+
+            # The manifest rules the location out without reading any column
+            if run is None or _datetime64(datetime.fromisoformat(run['last'])) < lower or \
+                    _datetime64(datetime.fromisoformat(run['first'])) > upper:
+                continue
+
+            location_timestamps = timestamps[run['start']:run['stop']]
+            first = np.searchsorted(location_timestamps, lower, side='left')
+            last = np.searchsorted(location_timestamps, upper, side='right' if end_inclusive else 'left')
+            runs.append(np.arange(run['start'] + first, run['start'] + last))
+
+        if not runs:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.concatenate(runs)
+
+        if area is not None:
+            rows = rows[area.mask(self.column('latitude_public')[rows], self.column('longitude_public')[rows])]
+
+        if position is not None:
+            after_timestamp, after_id = _datetime64(position[0]), position[1]
+            row_timestamps = timestamps[rows]
+            rows = rows[(row_timestamps > after_timestamp) |
+                        ((row_timestamps == after_timestamp) & (self.column('id')[rows] > after_id))]
+
+        if len(runs) > 1:
+            rows = rows[np.lexsort((self.column('id')[rows], timestamps[rows]))]
+
+        return rows
+
+    def values(self, name: str, rows) -> list:
+        """
+        Read a column of rows as Python values.
+
+        :param name: The column name, one of ARCHIVE_COLUMNS.
+        :type name: str
+        :param rows: An array of row numbers.
+        :return: list
+        """
+        values = self.column(name)[rows]
+
+        if name in DICTIONARY_COLUMNS:
+            dictionary = self.dictionaries[name]
+            return [dictionary[code] for code in values.tolist()]
+
+        return values.tolist()
+
+
+class ReadingArchive(object):
+    """
+    A cold storage of the readings of closed months, in one directory per metric and month.
+
+    Each metric directory holds archive.json with the range of months archived, [from, until). A month
+    of the range without readings has no directory.
+    """
+
+    def __init__(self, directory: str):
+        """
+        ReadingArchive constructor.
+
+        :param directory: The directory of the archive.
+        :type directory: str
+        """
+        self.directory = directory
+        self._months = {}
+        self._lock = threading.Lock()
+
+    def _metric_directory(self, metric: str) -> str:
+        return os.path.join(self.directory, metric)
+
+    def window(self, metric: str):
+        """
+        Find the range of the readings of a metric held by the archive.
+
+        :param metric: The reading table (humidity, pressure or temperature).
+        :type metric: str
+        :return: A (from, until) tuple of datetimes, until excluded, or None when nothing is archived.
+        """
+        try:
+            with open(os.path.join(self._metric_directory(metric), STATE)) as state:
+                state = json.load(state)
+        except FileNotFoundError:
+            return None
+
+        return datetime.fromisoformat(state['from']), datetime.fromisoformat(state['until'])
+
+    def _month(self, metric: str, month) -> ArchivedMonth:
+        path = os.path.join(self._metric_directory(metric), _month_name(month))
+
+        try:
+            modified = os.stat(os.path.join(path, MANIFEST)).st_mtime
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            archived = self._months.get(path)
+
+            # A month exported again is mapped again
+            if archived is None or archived[0] != modified:
+                archived = (modified, ArchivedMonth(path))
+                self._months[path] = archived
+
+            return archived[1]
+
+    def _overlapping_months(self, metric: str, start: datetime, end: datetime) -> list:
+        months = []
+        month = month_start(start)
+
+        while _datetime(month) <= end:
+            archived = self._month(metric, month)
+
+            if archived is not None:
+                months.append(archived)
+
+            month = add_months(month, 1)
+
+        return months
+
+    def rows(self, model, location_ids: list, start: datetime, end: datetime, end_inclusive: bool = True,
+             position: tuple = None, limit: int = None, area=None):
+        """
+        Read archived readings of locations within a date range, in (timestamp, id) order.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param location_ids: The identifiers of the locations, or None for every location.
+        :type location_ids: list
+        :param start: The start date and time.
+        :type start: datetime
+        :param end: The end date and time.
+        :type end: datetime
+        :param end_inclusive: Whether the range holds its end.
+        :type end_inclusive: bool
+        :param position: Only read the rows after this (timestamp, id) keyset position.
+        :type position: tuple
+        :param limit: The most rows to read.
+        :type limit: int
+        :param area: Only read the rows whose public coordinates are in this area.
+        :type area: Area
+        :return: A generator of rows with the fields of archived_row_type.
+        """
+        locations = {}
+        read = 0
+
+        for archived in self._overlapping_months(model.__tablename__, start, end):
+            rows = archived.select(location_ids, start, end, end_inclusive=end_inclusive, position=position, area=area)
+
+            if limit is not None:
+                rows = rows[:limit - read]
+
+            for offset in range(0, len(rows), ROW_BATCH_SIZE):
+                yield from _archived_rows(model, archived, rows[offset:offset + ROW_BATCH_SIZE], locations)
+
+            read += len(rows)
+
+            if limit is not None and read >= limit:
+                return
+
+    def bounds(self, model, location_ids: list, start: datetime, end: datetime, end_inclusive: bool = True,
+               area=None) -> tuple:
+        """
+        Find the first and last timestamps of the archived readings of locations within a date range.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param location_ids: The identifiers of the locations, or None for every location.
+        :type location_ids: list
+        :param start: The start date and time.
+        :type start: datetime
+        :param end: The end date and time.
+        :type end: datetime
+        :param end_inclusive: Whether the range holds its end.
+        :type end_inclusive: bool
+        :param area: Only the rows whose public coordinates are in this area.
+        :type area: Area
+        :return: A (first, last) tuple, (None, None) without readings.
+        """
+        first, last = None, None
+
+        for archived in self._overlapping_months(model.__tablename__, start, end):
+            rows = archived.select(location_ids, start, end, end_inclusive=end_inclusive, area=area)
+
+            if len(rows):
+                month_first, last = archived.values('timestamp', rows[[0, -1]])
+                first = month_first if first is None else first
+
+        return first, last
+
+    def closest(self, model, location_id: int, at: datetime) -> list:
+        """
+        Find the archived readings of a location closest in time to a date: the last one at or before it
+        and the first one after it.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param location_id: The identifier of the location.
+        :type location_id: int
+        :param at: The date and time.
+        :type at: datetime
+        :return: A list of at most two rows with the fields of archived_row_type.
+        """
+        metric = model.__tablename__
+        window = self.window(metric)
+
+        if window is None:
+            return []
+
+        instant = _datetime64(at)
+        last_month = month_start(min(at, window[1] - timedelta(microseconds=1)))
+        first_month = month_start(max(at, window[0]))
+        found = []
+
+        # Backwards for the last reading at or before the date, forwards for the first one after it
+        for month, step, offset in ((last_month, -1, -1), (first_month, 1, 0)):
+            while window[0] <= _datetime(month) < window[1]:
+                archived = self._month(metric, month)
+                run = archived.locations.get(location_id) if archived is not None else None
+
+                if run is not None:
+                    index = np.searchsorted(archived.column('timestamp')[run['start']:run['stop']], instant,
+                                            side='right') + offset
+
+                    if 0 <= index < run['stop'] - run['start']:
+                        found.extend(_archived_rows(model, archived, np.array([run['start'] + index]), {}))
+                        break
+
+                month = add_months(month, step)
+
+        return found
+
+    def buckets(self, model, location_ids: list, lower: datetime, upper: datetime, upper_inclusive: bool,
+                width: int) -> list:
+        """
+        Sum archived readings of locations into time buckets.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param location_ids: The identifiers of the locations.
+        :type location_ids: list
+        :param lower: The start date and time.
+        :type lower: datetime
+        :param upper: The end date and time.
+        :type upper: datetime
+        :param upper_inclusive: Whether the range holds its end.
+        :type upper_inclusive: bool
+        :param width: The width of the buckets in seconds.
+        :type width: int
+        :return: A list of (bucket seconds, count, sum, sum of squares, minimum, maximum) rows.
+        """
+        buckets = []
+
+        for archived in self._overlapping_months(model.__tablename__, lower, upper):
+            rows = archived.select(location_ids, lower, upper, end_inclusive=upper_inclusive)
+
+            if not len(rows):
+                continue
+
+            seconds = archived.column('timestamp')[rows].astype('datetime64[s]').astype(np.int64) + \
+                EPOCH_OFFSET_SECONDS
+            values = np.asarray(archived.column('value')[rows])
+            starts, groups = np.unique(seconds - seconds % width, return_inverse=True)
+
+            order = np.argsort(groups, kind='stable')
+            firsts = np.searchsorted(groups[order], np.arange(len(starts)))
+
+            buckets.extend(zip(starts.tolist(),
+                               np.bincount(groups).tolist(),
+                               np.bincount(groups, weights=values).tolist(),
+                               np.bincount(groups, weights=values * values).tolist(),
+                               np.minimum.reduceat(values[order], firsts).tolist(),
+                               np.maximum.reduceat(values[order], firsts).tolist()))
+
+        return buckets
+
+    def export_month(self, model, month) -> int:
+        """
+        Write the readings of a month to the archive, replacing an earlier export of the month.
+
+        A month without readings in the table keeps its earlier export, as its readings may have expired.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param month: The first day of the month.
+        :return: The number of readings written.
+        """
+        table = model.__table__
+        start = _datetime(month)
+        end = _datetime(add_months(month, 1))
+        dictionaries = dict((name, {}) for name in DICTIONARY_COLUMNS)
+        chunks = dict((name, []) for name in ARCHIVE_COLUMNS)
+
+        result = db.session.execute(select(*[table.columns[name] for name in ARCHIVE_COLUMNS]).where(
+            and_(table.c.timestamp >= start,
+                 table.c.timestamp < end)).order_by(table.c.location_id, table.c.timestamp, table.c.id),
+            execution_options={'yield_per': EXPORT_CHUNK_SIZE})
+
+        for rows in result.partitions():
+            for name, values in zip(ARCHIVE_COLUMNS, zip(*rows)):
+                if name in DICTIONARY_COLUMNS:
+                    codes = dictionaries[name]
+                    values = [codes.setdefault(value, len(codes)) for value in values]
+
+                chunks[name].append(np.array(values, dtype=ARCHIVE_COLUMNS[name]))
+
+        if not chunks['id']:
+            return 0
+
+        columns = dict((name, np.concatenate(chunk)) for name, chunk in chunks.items())
+        path = os.path.join(self._metric_directory(model.__tablename__), _month_name(month))
+        staging = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+
+        os.makedirs(staging)
+
+        for name, values in columns.items():
+            np.save(os.path.join(staging, name + '.npy'), values)
+
+        with open(os.path.join(staging, MANIFEST), 'w') as manifest:
+            json.dump({'month': _month_name(month),
+                       'rows': len(columns['id']),
+                       'dictionaries': dict((name, sorted(codes, key=codes.get))
+                                            for name, codes in dictionaries.items()),
+                       'locations': _location_runs(columns)}, manifest)
+
+        # The files of an earlier export stay readable by the requests that mapped them
+        if os.path.exists(path):
+            os.rename(path, staging + '.old')
+
+        os.rename(staging, path)
+
+        shutil.rmtree(staging + '.old', ignore_errors=True)
+
+        return len(columns['id'])
+
+    def set_window(self, metric: str, start: datetime, until: datetime):
+        """
+        Record the range of months archived.
+
+        :param metric: The reading table (humidity, pressure or temperature).
+        :type metric: str
+        :param start: The start of the first month archived.
+        :type start: datetime
+        :param until: The start of the first month not archived.
+        :type until: datetime
+        :return: None
+        """
+        directory = self._metric_directory(metric)
+        os.makedirs(directory, exist_ok=True)
+        staging = os.path.join(directory, STATE + '.tmp')
+
+        with open(staging, 'w') as state:
+            json.dump({'from': start.isoformat(), 'until': until.isoformat()}, state)
+
+        os.replace(staging, os.path.join(directory, STATE))
+
+
+def _location_columns(location_ids) -> dict:
+    return dict((location[0], tuple(location[1:])) for location in db.session.execute(
+        select(Location.id, *[getattr(Location, name) for name in LOCATION_COLUMNS]).where(
+            Location.id.in_(sorted(location_ids)))))
+
+
+def _archived_rows(model, archived: ArchivedMonth, rows, locations: dict):
+    # Rows of an archived month with the fields of the rows of the reading tables; the location columns
+    # are read from the location table into locations as they are first needed
+    row_type = archived_row_type(model)
+    names = [name for name in row_type._fields if name not in LOCATION_COLUMNS]
+    columns = dict((name, archived.values(name, rows) if name in ARCHIVE_COLUMNS else [None] * len(rows))
+                   for name in names + ['location_id'])
+    missing = set(columns['location_id']).difference(locations)
+
+    if missing:
+        locations.update(_location_columns(missing))
+
+    for index, location_id in enumerate(columns['location_id']):
+        yield row_type(*([columns[name][index] for name in names] + list(locations[location_id])))
+
+
+def _location_runs(columns: dict) -> dict:
+    location_ids = columns['location_id']
+    starts = np.flatnonzero(np.diff(location_ids, prepend=location_ids[0] - 1))
+    stops = np.append(starts[1:], len(location_ids))
+    runs = {}
+
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        values = columns['value'][start:stop]
+        runs[str(int(location_ids[start]))] = {
+            'start': start,
+            'stop': stop,
+            'first': columns['timestamp'][start].astype(datetime).isoformat(),
+            'last': columns['timestamp'][stop - 1].astype(datetime).isoformat(),
+            'min': float(values.min()),
+            'max': float(values.max()),
+        }
+
+    return runs
+
+
+def _next_reading_month(model, month, closed):
+    after = db.session.execute(select(func.min(model.timestamp)).where(
+        model.timestamp >= _datetime(month))).scalar()
+
+    if after is None:
+        return closed
+
+    return min(month_start(after), closed)
+
+
+def archive_closed_months(archive: ReadingArchive, model, hot_days: int, now: datetime = None) -> int:
+    """
+    Export the months of a metric that ended before the hot window and are not archived yet.
+
+    The first export starts from the month of the oldest reading; later ones continue after the last
+    month archived. Months without readings are skipped.
+
+    :param archive: The archive.
+    :type archive: ReadingArchive
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param hot_days: The days of readings only kept in the database.
+    :type hot_days: int
+    :param now: The current date and time, by default now.
+    :type now: datetime
+    :return: The number of readings written.
+    """
+    metric = model.__tablename__
+    closed = month_start((now or datetime.utcnow()) - timedelta(days=hot_days))
+    window = archive.window(metric)
+
+    if window is not None:
+        start, month = window[0], month_start(window[1])
+    else:
+        oldest = db.session.execute(select(func.min(model.timestamp))).scalar()
+
+        if oldest is None:
+            return 0
+
+        month = month_start(oldest)
+        start = _datetime(month)
+
+    written = 0
+
+    while True:
+        month = _next_reading_month(model, month, closed)
+
+        if month >= closed:
+            break
+
+        count = archive.export_month(model, month)
+        written += count
+        log.info('Archived {count} {metric} readings of {month}.'.format(count=count, metric=metric,
+                                                                         month=_month_name(month)))
+
+        # Moved after each month, so readers switch to the archive a month at a time
+        month = add_months(month, 1)
+        archive.set_window(metric, start, _datetime(month))
+
+    if window is None or window[1] < _datetime(closed):
+        archive.set_window(metric, start, _datetime(closed))
+
+    return written
+
+
+def split_range(window: tuple, start: datetime, end: datetime, end_inclusive: bool = True) -> list:
+    """
+    Split a date range into the parts read from the database and from the archive, in order.
+
+    :param window: The (from, until) range held by the archive, or None.
+    :type window: tuple
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time.
+    :type end: datetime
+    :param end_inclusive: Whether the range holds its end.
+    :type end_inclusive: bool
+    :return: A list of (archived, start, end, end inclusive) tuples.
+    """
+    if window is None:
+        return [(False, start, end, end_inclusive)]
+
+    archived_from, archived_until = window
+    parts = []
+
+    for archived, lower, upper in ((False, None, archived_from),
+                                   (True, archived_from, archived_until),
+                                   (False, archived_until, None)):
+        part_start = start if lower is None else max(start, lower)
+
+        if upper is None or end < upper:
+            part_end, part_end_inclusive = end, end_inclusive
+        else:
+            part_end, part_end_inclusive = upper, False
+
+        if part_start < part_end or (part_start == part_end and part_end_inclusive):
+            parts.append((archived, part_start, part_end, part_end_inclusive))
+
+    return parts
+
+
+def tiered_reading_rows(model, start, end, city: str, province: str, country: str, position: tuple = None,
+                        limit: int = None, yield_per: int = None):
+    """
+    Read the readings of a location within a date range, from the archive for the months it holds and
+    from the database for the others, in (timestamp, id) order.
+
+    The rows have the fields of the rows of reading_rows; archived rows have no reading key.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :param position: Only read the rows after this (timestamp, id) keyset position.
+    :type position: tuple
+    :param limit: The most rows to read.
+    :type limit: int
+    :param yield_per: Fetch the rows of the database from a server-side cursor in batches of this size,
+        and read the parts of the range only as the rows are consumed.
+    :type yield_per: int
+    :return: An iterable of rows.
+    """
+    location_ids = find_location_ids(city, province, country)
+
+    if not location_ids:
+        return []
+
+    def read_database(part_start, part_end, part_end_inclusive, part_limit):
+        return location_reading_rows(model, location_ids, part_start, part_end, part_end_inclusive, position,
+                                     part_limit, yield_per)
+
+    def read_archive(archive, part_start, part_end, part_end_inclusive, part_limit):
+        return archive.rows(model, location_ids, part_start, part_end, part_end_inclusive, position, part_limit)
+
+    return _tiered_rows(model, start, end, limit, yield_per, read_database, read_archive)
+
+
+def tiered_area_rows(model, area, start, end, position: tuple = None, limit: int = None, yield_per: int = None):
+    """
+    Read the readings in an area within a date range, from the archive for the months it holds and from
+    the database for the others, in (timestamp, id) order.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param area: The area of the readings.
+    :type area: Area
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param position: Only read the rows after this (timestamp, id) keyset position.
+    :type position: tuple
+    :param limit: The most rows to read.
+    :type limit: int
+    :param yield_per: Fetch the rows of the database from a server-side cursor in batches of this size,
+        and read the parts of the range only as the rows are consumed.
+    :type yield_per: int
+    :return: An iterable of rows.
+    """
+    def read_database(part_start, part_end, part_end_inclusive, part_limit):
+        return area_reading_rows(model, area, part_start, part_end, part_end_inclusive, position, part_limit,
+                                 yield_per)
+
+    def read_archive(archive, part_start, part_end, part_end_inclusive, part_limit):
+        return archive.rows(model, None, part_start, part_end, part_end_inclusive, position, part_limit, area=area)
+
+    return _tiered_rows(model, start, end, limit, yield_per, read_database, read_archive)
+
+
+def tiered_reading_bounds(model, start, end, city: str, province: str, country: str) -> tuple:
+    """
+    Find the first and last timestamps of the readings of a location within a date range, from the archive
+    for the months it holds and from the database for the others.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :return: A (first, last) tuple, or None without readings.
+    """
+    location_ids = find_location_ids(city, province, country)
+
+    if not location_ids:
+        return None
+
+    def read_database(part_start, part_end, part_end_inclusive):
+        return reading_bounds(model, location_filter(model, location_ids), part_start, part_end, part_end_inclusive)
+
+    def read_archive(archive, part_start, part_end, part_end_inclusive):
+        return archive.bounds(model, location_ids, part_start, part_end, part_end_inclusive)
+
+    return _tiered_bounds(model, start, end, read_database, read_archive)
+
+
+def tiered_area_bounds(model, area, start, end) -> tuple:
+    """
+    Find the first and last timestamps of the readings in an area within a date range, from the archive
+    for the months it holds and from the database for the others.
+
+    The readings of a near query outside its radius but inside its box may widen the bounds.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param area: The area of the readings.
+    :type area: Area
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :return: A (first, last) tuple, or None without readings.
+    """
+    def read_database(part_start, part_end, part_end_inclusive):
+        return reading_bounds(model, area_filter(model, area), part_start, part_end, part_end_inclusive)
+
+    def read_archive(archive, part_start, part_end, part_end_inclusive):
+        return archive.bounds(model, None, part_start, part_end, part_end_inclusive, area=area)
+
+    return _tiered_bounds(model, start, end, read_database, read_archive)
+
+
+def _tiered_bounds(model, start, end, read_database, read_archive):
+    archive = reading_archive()
+    first, last = None, None
+
+    for archived, part_start, part_end, part_end_inclusive in split_range(
+            archive.window(model.__tablename__) if archive is not None else None, start, end):
+        if archived:
+            part_first, part_last = read_archive(archive, part_start, part_end, part_end_inclusive)
+        else:
+            part_first, part_last = read_database(part_start, part_end, part_end_inclusive)
+
+        if part_first is not None:
+            first = part_first if first is None else first
+            last = part_last
+
+    return None if first is None else (first, last)
+
+
+def _tiered_rows(model, start, end, limit, yield_per, read_database, read_archive):
+    archive = reading_archive()
+    parts = split_range(archive.window(model.__tablename__) if archive is not None else None, start, end)
+
+    def read(archived, part_start, part_end, part_end_inclusive, part_limit):
+        if archived:
+            return read_archive(archive, part_start, part_end, part_end_inclusive, part_limit)
+
+        return read_database(part_start, part_end, part_end_inclusive, part_limit)
+
+    if yield_per is not None:
+        records = itertools.chain.from_iterable(read(*part, limit) for part in parts)
+        return records if limit is None else itertools.islice(records, limit)
+
+    records = []
+
+    for part in parts:
+        records.extend(read(*part, None if limit is None else limit - len(records)))
+
+        if limit is not None and len(records) >= limit:
+            break
+
+    return records
+
+
+def set_reading_archive(archive):
+    """
+    Set the archive the endpoints read readings older than the hot window from.
+
+    :param archive: A ReadingArchive, or None to read every reading from the database.
+    :return: None
+    """
+    _archives['reading'] = archive
+
+
+def reading_archive():
+    """
+    Get the archive of readings.
+
+    :return: The ReadingArchive, or None.
+    """
+    return _archives['reading']
@@ -0,0 +1,77 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from datetime import datetime, timedelta
+
+from database.functions import epoch_seconds
+
+# Buckets are counted from 0001-01-01 00:00:00, a Monday. This keeps every bucket start positive for
+# the modulo below and starts weekly buckets on Mondays.
+BUCKET_ORIGIN = datetime(1, 1, 1)
+
+# Seconds from BUCKET_ORIGIN to 1970-01-01 00:00:00
+EPOCH_OFFSET_SECONDS = 62135596800
+
+
+def bucket_start_seconds(timestamp_column, width: int):
+    """
+    Build the SQL expression for the start of the bucket of a timestamp.
+
+    :param timestamp_column: The timestamp column.
+    :param width: The width of the buckets in seconds.
+    :type width: int
+    :return: The seconds from BUCKET_ORIGIN to the start of the bucket.
+    """
+    seconds = epoch_seconds(timestamp_column) + EPOCH_OFFSET_SECONDS
+    return seconds - seconds % width
+
+
+def bucket_seconds_to_datetime(seconds: int) -> datetime:
+    """
+    Convert the seconds from BUCKET_ORIGIN to a date and time.
+
+    :param seconds: The seconds from BUCKET_ORIGIN.
+    :type seconds: int
+    :return: datetime
+    """
+    return BUCKET_ORIGIN + timedelta(seconds=int(seconds))
+
+
+def floor_bucket(timestamp: datetime, width: int) -> datetime:
+    """
+    The start of the bucket holding a timestamp.
+
+    :param timestamp: The date and time.
+    :type timestamp: datetime
+    :param width: The width of the buckets in seconds.
+    :type width: int
+    :return: datetime
+    """
+    seconds = int((timestamp - BUCKET_ORIGIN).total_seconds())
+    return bucket_seconds_to_datetime(seconds - seconds % width)
+
+
+def ceil_bucket(timestamp: datetime, width: int) -> datetime:
+    """
+    The start of the first bucket at or after a timestamp.
+
+    :param timestamp: The date and time.
+    :type timestamp: datetime
+    :param width: The width of the buckets in seconds.
+    :type width: int
+    :return: datetime
+    """
+    start = floor_bucket(timestamp, width)
+
+    if start < timestamp:
+        start += timedelta(seconds=width)
+
+    return start
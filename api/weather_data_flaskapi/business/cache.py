@@ -0,0 +1,473 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from database.models import utc_timestamp
+
+CACHE_BACKENDS = ('memory', 'sqlite')
+
+EPOCH = datetime(1970, 1, 1)
+
+# The response cache of the application; see set_response_cache
+_caches = {'response': None}
+
+
+def cache_key(*parts) -> str:
+    """
+    Build a cache key from normalized request parameters.
+
+    :param parts: The parameters; strings, numbers, None or datetimes.
+    :return: The key.
+    """
+    normalized = json.dumps([part.isoformat() if isinstance(part, datetime) else part for part in parts])
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class ReadingScope(object):
+    """
+    The readings a cached response was computed from: a metric at a location within a time window.
+    """
+
+    def __init__(self, metric: str, city: str, province: str, country: str, first: datetime, last: datetime):
+        """
+        ReadingScope constructor.
+
+        :param metric: The reading table (humidity, pressure or temperature).
+        :type metric: str
+        :type city: str
+        :type province: str
+        :type country: str
+        :param first: The start of the window.
+        :type first: datetime
+        :param last: The end of the window, inclusive.
+        :type last: datetime
+        """
+        self.metric = metric
+        self.city = city
+        self.province = province
+        self.country = country
+        self.first = first
+        self.last = last
+
+    @property
+    def location(self) -> tuple:
+        return self.metric, self.city, self.province, self.country
+
+    def overlaps(self, first: datetime, last: datetime) -> bool:
+        return self.first <= last and self.last >= first
+
+
+class LRUCache(object):
+    """
+    An in-process cache of byte strings, evicting the least recently used entries beyond a total size.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        """
+        LRUCache constructor.
+
+        :param max_bytes: The most bytes of values held.
+        :type max_bytes: int
+        :param ttl_seconds: The seconds an entry is served after it is set.
+        :type ttl_seconds: int
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._locations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        Get a value.
+
+        :param key: The key.
+        :type key: str
+        :return: The value, or None when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            value, expires, scope = entry
+
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key: str, value: bytes, scope: ReadingScope = None):
+        """
+        Set a value.
+
+        :param key: The key.
+        :type key: str
+        :param value: The value.
+        :type value: bytes
+        :param scope: The readings the value depends on, for invalidation.
+        :type scope: ReadingScope
+        :return: None
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, scope)
+            self._bytes += len(value)
+
+            if scope is not None:
+                self._locations.setdefault(scope.location, set()).add(key)
+
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, scope: ReadingScope) -> int:
+        """
+        Remove the values computed from readings in a scope.
+
+        :param scope: The changed readings.
+        :type scope: ReadingScope
+        :return: The number of values removed.
+        """
+        with self._lock:
+            keys = [key for key in self._locations.get(scope.location, ())
+                    if self._entries[key][2].overlaps(scope.first, scope.last)]
+
+            for key in keys:
+                self._remove(key)
+
+            return len(keys)
+
+    def clear(self):
+        """
+        Remove every value.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._locations.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        value, expires, scope = self._entries.pop(key)
+        self._bytes -= len(value)
+
+        if scope is not None:
+            keys = self._locations[scope.location]
+            keys.discard(key)
+
+            if not keys:
+                del self._locations[scope.location]
+
+
+class TTLCache(object):
+    """
+    An in-process cache of objects, bounded by a number of entries and evicting the least recently used.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        """
+        TTLCache constructor.
+
+        :param max_entries: The most entries held.
+        :type max_entries: int
+        :param ttl_seconds: The seconds an entry is served after it is set.
+        :type ttl_seconds: int
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a value.
+
+        :param key: The key.
+        :return: The value, or None when it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            value, expires = entry
+
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """
+        Set a value.
+
+        :param key: The key.
+        :param value: The value.
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove a value.
+
+        :param key: The key.
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every value.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(object):
+    """
+    A cache of byte strings in a SQLite file, shared by the worker processes of a host.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: int):
+        """
+        SQLiteCache constructor.
+
+        :param path: The path of the SQLite file.
+        :type path: str
+        :param max_bytes: The most bytes of values held.
+        :type max_bytes: int
+        :param ttl_seconds: The seconds an entry is served after it is set.
+        :type ttl_seconds: int
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS response_cache ('
+                               'key TEXT PRIMARY KEY, '
+                               'value BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, '
+                               'expires REAL NOT NULL, '
+                               'accessed REAL NOT NULL, '
+                               'metric TEXT, city TEXT, province TEXT, country TEXT, first REAL, last REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS response_cache_location_index '
+                               'ON response_cache (metric, city, province, country)')
+            connection.execute('CREATE INDEX IF NOT EXISTS response_cache_accessed_index ON response_cache (accessed)')
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+
+        return connection
+
+    def get(self, key: str):
+        """
+        Get a value.
+
+        :param key: The key.
+        :type key: str
+        :return: The value, or None when it is missing or expired.
+        """
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute('SELECT value, expires FROM response_cache WHERE key = ?', (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        if row[1] < now:
+            connection.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            return None
+
+        connection.execute('UPDATE response_cache SET accessed = ? WHERE key = ?', (now, key))
+
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, scope: ReadingScope = None):
+        """
+        Set a value.
+
+        :param key: The key.
+        :type key: str
+        :param value: The value.
+        :type value: bytes
+        :param scope: The readings the value depends on, for invalidation.
+        :type scope: ReadingScope
+        :return: None
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        now = time.time()
+        location = scope.location if scope is not None else (None, None, None, None)
+        window = (_epoch_seconds(scope.first), _epoch_seconds(scope.last)) if scope is not None else (None, None)
+
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (key, value, len(value), now + self.ttl_seconds, now) + location + window)
+
+        self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        total, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM response_cache').fetchone()
+
+        if total <= self.max_bytes:
+            return
+
+        connection.execute('DELETE FROM response_cache WHERE expires < ?', (time.time(),))
+        total, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM response_cache').fetchone()
+        keys = []
+
+        for key, size in connection.execute('SELECT key, size FROM response_cache ORDER BY accessed'):
+            if total <= self.max_bytes:
+                break
+
+            keys.append((key,))
+            total -= size
+
+        connection.executemany('DELETE FROM response_cache WHERE key = ?', keys)
+
+    def invalidate(self, scope: ReadingScope) -> int:
+        """
+        Remove the values computed from readings in a scope.
+
+        :param scope: The changed readings.
+        :type scope: ReadingScope
+        :return: The number of values removed.
+        """
+        cursor = self._connection().execute(
+            'DELETE FROM response_cache '
+            'WHERE metric = ? AND city = ? AND province = ? AND country = ? AND first <= ? AND last >= ?',
+            scope.location + (_epoch_seconds(scope.last), _epoch_seconds(scope.first)))
+
+        return cursor.rowcount
+
+    def clear(self):
+        """
+        Remove every value.
+
+        :return: None
+        """
+        self._connection().execute('DELETE FROM response_cache')
+
+
+def _epoch_seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+def create_cache(backend: str, max_bytes: int, ttl_seconds: int, path: str = None):
+    """
+    Create a cache.
+
+    :param backend: One of CACHE_BACKENDS, or None for no cache.
+    :type backend: str
+    :param max_bytes: The most bytes of values held.
+    :type max_bytes: int
+    :param ttl_seconds: The seconds an entry is served after it is set.
+    :type ttl_seconds: int
+    :param path: The path of the SQLite file of the sqlite backend.
+    :type path: str
+    :return: The cache, or None.
+    """
+    if backend is None:
+        return None
+
+    if backend == 'memory':
+        return LRUCache(max_bytes, ttl_seconds)
+
+    if backend == 'sqlite':
+        if not path:
+            raise ValueError('the sqlite cache needs a path')
+
+        return SQLiteCache(path, max_bytes, ttl_seconds)
+
+    raise ValueError('cache backend must be one of {backends}'.format(backends=', '.join(CACHE_BACKENDS)))
+
+
+def set_response_cache(cache):
+    """
+    Set the cache of the public responses.
+
+    :param cache: A cache from create_cache, or None to disable caching.
+    :return: None
+    """
+    _caches['response'] = cache
+
+
+def response_cache():
+    """
+    Get the cache of the public responses.
+
+    :return: The cache, or None when caching is disabled.
+    """
+    return _caches['response']
+
+
+def invalidate_readings(metric: str, readings):
+    """
+    Remove the cached responses computed from changed readings.
+
+    :param metric: The reading table (humidity, pressure or temperature).
+    :type metric: str
+    :param readings: (city, province, country, timestamp) tuples of the changed readings.
+    :return: None
+    """
+    cache = response_cache()
+
+    if cache is None:
+        return
+
+    windows = {}
+
+    for city, province, country, timestamp in readings:
+        timestamp = utc_timestamp(timestamp)
+        first, last = windows.get((city, province, country), (timestamp, timestamp))
+        windows[(city, province, country)] = (min(first, timestamp), max(last, timestamp))
+
+    for (city, province, country), (first, last) in windows.items():
+        cache.invalidate(ReadingScope(metric, city, province, country, first, last))
@@ -0,0 +1,166 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from sqlalchemy import and_, literal, or_, select, union_all
+
+from api.weather_data_flaskapi.business.archive import reading_archive, split_range
+from database import db
+from database.models import Location
+
+# The most locations of a combined query
+MAX_COMBINED_LOCATIONS = 100
+
+# The most readings a combined query returns
+MAX_COMBINED_ROWS = 100000
+
+# The reading columns of a combined query, all public
+COMBINED_COLUMNS = ('id', 'value', 'value_units', 'value_error_range', 'latitude_public', 'longitude_public',
+                    'timestamp')
+
+
+class CombinedQueryError(ValueError):
+    """
+    Exception on a combined query that names too many locations or matches too many readings.
+    """
+    pass
+
+
+def _location_key(city: str, province: str, country: str) -> tuple:
+    # The database matches locations regardless of case and trailing spaces, so they are compared the same way
+    return tuple(part.rstrip().lower() for part in (city, province, country))
+
+
+def parse_locations(values: list) -> list:
+    """
+    Parse the locations of a combined query.
+
+    :param values: 'city,province,country' strings; the city may hold commas.
+    :type values: list
+    :return: A list of distinct (city, province, country) tuples, in request order.
+    """
+    locations = []
+    keys = set()
+
+    for value in values:
+        parts = [part.strip() for part in value.rsplit(',', 2)]
+
+        if len(parts) != 3 or not all(parts):
+            raise CombinedQueryError('location must be city,province,country')
+
+        if _location_key(*parts) not in keys:
+            keys.add(_location_key(*parts))
+            locations.append(tuple(parts))
+
+    if len(locations) > MAX_COMBINED_LOCATIONS:
+        raise CombinedQueryError('at most {count} locations can be queried at once'.format(
+            count=MAX_COMBINED_LOCATIONS))
+
+    return locations
+
+
+def find_locations(locations: list) -> list:
+    """
+    Find the stations of many cities in one query.
+
+    :param locations: (city, province, country) tuples.
+    :type locations: list
+    :return: A list of (location identifier, city, province, country, version, modified date) rows,
+        ordered by location identifier.
+    """
+    return db.session.execute(select(Location.id,
+                                     Location.city,
+                                     Location.province,
+                                     Location.country,
+                                     Location.version,
+                                     Location.modified_date).where(
+        or_(*[and_(Location.city == city,
+                   Location.province == province,
+                   Location.country == country) for city, province, country in locations])).order_by(
+        Location.id)).all()
+
+
+def _table_select(model, location_ids: list, start, end, end_inclusive: bool):
+    table = model.__table__
+
+    return select(literal(model.__tablename__).label('metric'),
+                  table.c.location_id,
+                  *[table.c[name] for name in COMBINED_COLUMNS]).where(
+        table.c.location_id.in_(location_ids),
+        table.c.timestamp >= start,
+        table.c.timestamp <= end if end_inclusive else table.c.timestamp < end)
+
+
+def combined_readings(models: list, locations: list, stations: list, start, end,
+                      max_rows: int = MAX_COMBINED_ROWS) -> list:
+    """
+    Read the readings of many metrics at many locations within one date range, grouped into series.
+
+    The parts of the range in the database are read for every metric with one UNION ALL statement;
+    the parts held by the archive are read from it.
+
+    :param models: The ORM classes of the readings (Humidity, Pressure or Temperature).
+    :type models: list
+    :param locations: The (city, province, country) tuples, in the order of the series.
+    :type locations: list
+    :param stations: The rows of find_locations for the locations.
+    :type stations: list
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param max_rows: The most readings to return.
+    :type max_rows: int
+    :return: A list of series dicts with the 'city', 'province', 'country', 'metric' and the 'items'
+        in (timestamp, id) order, by location then metric.
+    """
+    # Stations are matched back to the requested locations, which may differ from them in case
+    requested = dict((_location_key(*location), location) for location in locations)
+    keys = dict((station.id, requested[_location_key(station.city, station.province, station.country)])
+                for station in stations
+                if _location_key(station.city, station.province, station.country) in requested)
+    stored = dict(((station.city, station.province, station.country), keys[station.id])
+                  for station in stations if station.id in keys)
+    series = dict(((location, model.__tablename__), []) for location in locations for model in models)
+    archive = reading_archive()
+    statements = []
+    read = 0
+
+    if keys:
+        location_ids = sorted(keys)
+
+        for model in models:
+            window = archive.window(model.__tablename__) if archive is not None else None
+
+            for archived, part_start, part_end, part_end_inclusive in split_range(window, start, end):
+                if not archived:
+                    statements.append(_table_select(model, location_ids, part_start, part_end, part_end_inclusive))
+                    continue
+
+                for row in archive.rows(model, location_ids, part_start, part_end, part_end_inclusive,
+                                        limit=max_rows + 1 - read):
+                    series[(stored[(row.city, row.province, row.country)], model.__tablename__)].append(row)
+                    read += 1
+
+    if statements:
+        for row in db.session.execute(union_all(*statements).limit(max_rows + 1 - read)):
+            series[(keys[row.location_id], row.metric)].append(row)
+            read += 1
+
+    if read > max_rows:
+        raise CombinedQueryError('the query matches more than {count} readings; narrow the date range'.format(
+            count=max_rows))
+
+    return [{'city': location[0],
+             'province': location[1],
+             'country': location[2],
+             'metric': metric,
+             'items': sorted(items, key=lambda row: (row.timestamp, row.id))}
+            for (location, metric), items in series.items()]
@@ -0,0 +1,166 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import numpy as np
+
+# How the records of a collection are thinned to max_points
+DECIMATIONS = ('lttb', 'minmax')
+
+# The fewest and the most points of a decimated collection
+MIN_DECIMATED_POINTS = 3
+MAX_DECIMATED_POINTS = 10000
+
+
+def _seconds(timestamp, start) -> float:
+    return (timestamp - start).total_seconds()
+
+
+def time_buckets(records, start, end, count: int):
+    """
+    Group records read in timestamp order into equal time buckets.
+
+    The buckets span the timestamps of the records: laid over a wider range, most of them would be empty
+    and the records would fall into a few.
+
+    Only the current bucket is held in memory, so the records can come from a server-side cursor.
+
+    :param records: The records, in timestamp order.
+    :param start: The start of the first bucket, the first timestamp of the records.
+    :type start: datetime
+    :param end: The end of the last bucket, inclusive, the last timestamp of the records.
+    :type end: datetime
+    :param count: The number of buckets.
+    :type count: int
+    :return: An iterable of the non-empty buckets, each a list of records, in order.
+    """
+    width = max(_seconds(end, start), 1.0) / count
+    bucket, index = [], None
+
+    for record in records:
+        record_index = min(max(int(_seconds(record.timestamp, start) // width), 0), count - 1)
+
+        if record_index != index and bucket:
+            yield bucket
+            bucket = []
+
+        bucket.append(record)
+        index = record_index
+
+    if bucket:
+        yield bucket
+
+
+def _points(records, start) -> tuple:
+    return np.array([_seconds(record.timestamp, start) for record in records]), \
+        np.array([float(record.value) for record in records])
+
+
+def _largest_triangle(bucket: list, previous, following: tuple, start):
+    """
+    Choose the record of a bucket forming the largest triangle with the previous choice and a following point.
+    """
+    times, values = _points(bucket, start)
+    previous_time, previous_value = _seconds(previous.timestamp, start), float(previous.value)
+    following_time, following_value = following
+
+    areas = np.abs((previous_time - following_time) * (values - previous_value) -
+                   (previous_time - times) * (following_value - previous_value))
+
+    return bucket[int(np.argmax(areas))]
+
+
+def lttb(records, start, end, max_points: int):
+    """
+    Thin records to at most max_points with Largest-Triangle-Three-Buckets, keeping the visual peaks.
+
+    The first and last records are kept; between them one record is kept per time bucket, the one forming
+    the largest triangle with the record kept before it and the mean of the next bucket. Two buckets are
+    held in memory at a time.
+
+    :param records: The records, in timestamp order.
+    :param start: The first timestamp of the records.
+    :type start: datetime
+    :param end: The last timestamp of the records.
+    :type end: datetime
+    :param max_points: The most records to keep, at least MIN_DECIMATED_POINTS.
+    :type max_points: int
+    :return: An iterable of the kept records, in order.
+    """
+    records = iter(records)
+    first = next(records, None)
+
+    if first is None:
+        return
+
+    yield first
+
+    previous, pending = first, None
+
+    for bucket in time_buckets(records, start, end, max_points - 2):
+        if pending is not None:
+            times, values = _points(bucket, start)
+            previous = _largest_triangle(pending, previous, (times.mean(), values.mean()), start)
+            yield previous
+
+        pending = bucket
+
+    if pending is None:
+        return
+
+    # The last record is kept as is, and is the following point of the last bucket
+    last = pending.pop()
+
+    if pending:
+        yield _largest_triangle(pending, previous, (_seconds(last.timestamp, start), float(last.value)), start)
+
+    yield last
+
+
+def min_max(records, start, end, max_points: int):
+    """
+    Thin records to at most max_points by keeping the smallest and largest record of each time bucket.
+
+    :param records: The records, in timestamp order.
+    :param start: The first timestamp of the records.
+    :type start: datetime
+    :param end: The last timestamp of the records.
+    :type end: datetime
+    :param max_points: The most records to keep, at least MIN_DECIMATED_POINTS.
+    :type max_points: int
+    :return: An iterable of the kept records, in order.
+    """
+    for bucket in time_buckets(records, start, end, max_points // 2):
+        values = np.array([float(record.value) for record in bucket])
+        kept = sorted({int(np.argmin(values)), int(np.argmax(values))})
+
+        for index in kept:
+            yield bucket[index]
+
+
+def decimate(records, start, end, max_points: int, decimation: str = 'lttb'):
+    """
+    Thin records for charting, see lttb and min_max.
+
+    :param records: The records, in timestamp order.
+    :param start: The first timestamp of the records.
+    :type start: datetime
+    :param end: The last timestamp of the records.
+    :type end: datetime
+    :param max_points: The most records to keep.
+    :type max_points: int
+    :param decimation: One of DECIMATIONS.
+    :type decimation: str
+    :return: An iterable of the kept records, in order.
+    """
+    if decimation == 'minmax':
+        return min_max(records, start, end, max_points)
+
+    return lttb(records, start, end, max_points)
@@ -0,0 +1,164 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from passlib.hash import sha512_crypt
+
+# The password hashing pool of the application; see set_hashing_pool
+_pools = {'hashing': None}
+
+
+class HashingBusyError(ValueError):
+    """
+    Exception when too many passwords are waiting to be hashed, or hashing took too long.
+    """
+    pass
+
+
+def _hash(secret: str) -> str:
+    return sha512_crypt.hash(secret)
+
+
+def _verify(secret: str, hashed: str) -> bool:
+    return sha512_crypt.verify(secret, hashed)
+
+
+class HashingPool(object):
+    """
+    A pool of worker processes hashing and verifying passwords off the request threads.
+
+    At most max_pending passwords wait or run at a time; beyond that a request fails at once rather
+    than holding its thread.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout_seconds: float):
+        """
+        HashingPool constructor.
+
+        :param workers: The number of worker processes.
+        :type workers: int
+        :param max_pending: The most passwords waiting or being hashed.
+        :type max_pending: int
+        :param timeout_seconds: The seconds a request waits for its password.
+        :type timeout_seconds: float
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _submit(self, function, *args):
+        if not self._pending.acquire(blocking=False):
+            raise HashingBusyError('too many passwords are waiting to be hashed')
+
+        try:
+            with self._lock:
+                # Started on first use, so the processes are forked from the WSGI worker rather than its parent
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+                future = self._executor.submit(function, *args)
+        except Exception:
+            self._pending.release()
+            raise
+
+        future.add_done_callback(lambda done: self._pending.release())
+
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except TimeoutError:
+            future.cancel()
+            raise HashingBusyError('hashing the password took too long')
+
+    def hash(self, secret: str) -> str:
+        """
+        Hash a salted password.
+
+        :param secret: The salted password.
+        :type secret: str
+        :return: The hash.
+        """
+        return self._submit(_hash, secret)
+
+    def verify(self, secret: str, hashed: str) -> bool:
+        """
+        Check a salted password against its hash.
+
+        :param secret: The salted password.
+        :type secret: str
+        :param hashed: The stored hash.
+        :type hashed: str
+        :return: True if the password matches, else False.
+        """
+        return self._submit(_verify, secret, hashed)
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+
+        :return: None
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def set_hashing_pool(pool):
+    """
+    Set the pool hashing passwords.
+
+    :param pool: A HashingPool, or None to hash on the request thread.
+    :return: None
+    """
+    previous = _pools['hashing']
+    _pools['hashing'] = pool
+
+    if previous is not None and previous is not pool:
+        previous.shutdown()
+
+
+def hash_password(secret: str) -> str:
+    """
+    Hash a salted password.
+
+    :param secret: The salted password.
+    :type secret: str
+    :return: The hash.
+    """
+    pool = _pools['hashing']
+
+    if pool is None:
+        return _hash(secret)
+
+    return pool.hash(secret)
+
+
+def verify_password(secret: str, hashed: str) -> bool:
+    """
+    Check a salted password against its hash.
+
+    :param secret: The salted password.
+    :type secret: str
+    :param hashed: The stored hash.
+    :type hashed: str
+    :return: True if the password matches, else False.
+    """
+    pool = _pools['hashing']
+
+    if pool is None:
+        return _verify(secret, hashed)
+
+    return pool.verify(secret, hashed)
@@ -0,0 +1,358 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from api.weather_data_flaskapi.business.weather_data import create_readings, reading_row
+from database.models import READING_MODELS
+
+log = logging.getLogger(__name__)
+
+# The ingest queue of the application; see set_ingest_queue
+_queues = {'ingest': None}
+
+
+class IngestQueueFullError(ValueError):
+    """
+    Exception when the ingest queue holds its most readings.
+    """
+    pass
+
+
+class _Journal(object):
+    """
+    An append-only file of queued readings, locked by its process while it is open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = 0
+        self.file = open(path, 'ab')
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, metric: str, readings: list):
+        self.file.write(json.dumps({'metric': metric, 'readings': readings}).encode('utf-8') + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.entries += 1
+
+    def remove(self):
+        os.remove(self.path)
+        self.file.close()
+
+
+def _read_journal(path: str) -> list:
+    entries = []
+
+    with open(path, 'rb') as journal:
+        for line in journal:
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # The last line of a process that died while writing it
+                log.warning('Skipped a partial entry of {path}.'.format(path=path))
+                continue
+
+            entries.append((entry['metric'], entry['readings']))
+
+    return entries
+
+
+class IngestQueue(object):
+    """
+    Readings acknowledged to the client before they are written.
+
+    A background thread drains the queue in groups of up to group_size readings of a kind, each
+    written with multi-row INSERTs and one commit, as soon as a group is full or flush_seconds after
+    the oldest queued reading.
+
+    With a journal directory every accepted request is appended to a journal file and synced to disk
+    before it is acknowledged. The writer starts a new file each time it drains the queue and removes
+    the old one once its readings are committed, so the files left by a process that died hold
+    exactly the readings it had not written; they are replayed by the next process to start a writer.
+    Readings the database fails to write are queued again, and the journal files kept, until they are
+    written. A crash between a commit and the removal of its file replays readings already written.
+    """
+
+    def __init__(self, app, max_readings: int, group_size: int, flush_seconds: float, journal_directory: str = None):
+        """
+        IngestQueue constructor.
+
+        :param app: The Flask application, for the database connection of the writer.
+        :param max_readings: The most readings queued before requests are refused.
+        :type max_readings: int
+        :param group_size: The most readings written per commit.
+        :type group_size: int
+        :param flush_seconds: The most seconds a reading waits for its group to fill.
+        :type flush_seconds: float
+        :param journal_directory: The directory of the journal files, or None to keep the queue in memory only.
+        :type journal_directory: str
+        """
+        self.app = app
+        self.max_readings = max_readings
+        self.group_size = group_size
+        self.flush_seconds = flush_seconds
+        self.journal_directory = journal_directory
+        self._pending = deque()
+        self._count = 0
+        self._oldest = None
+        self._journal = None
+        self._retired = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def put(self, metric: str, readings: list):
+        """
+        Queue validated readings of a kind.
+
+        :param metric: The reading table (humidity, pressure or temperature).
+        :type metric: str
+        :param readings: JSON data of the readings.
+        :type readings: list
+        :return: None
+        """
+        with self._condition:
+            # Started by the first request, so the thread runs in the WSGI worker rather than its parent
+            if self._thread is None:
+                self._start()
+
+            if self._count + len(readings) > self.max_readings:
+                raise IngestQueueFullError('the ingest queue is full')
+
+            if self._journal is not None:
+                self._journal.append(metric, readings)
+
+            self._pending.append((metric, readings))
+            self._count += len(readings)
+
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+            if self._count >= self.group_size:
+                self._condition.notify()
+
+    def _new_journal(self):
+        if self.journal_directory is None:
+            return None
+
+        return _Journal(os.path.join(self.journal_directory, 'ingest-{pid}-{time}.journal'.format(
+            pid=os.getpid(), time=int(time.time() * 1000000))))
+
+    def _replay(self):
+        # A file can be locked only once the process that wrote it has gone
+        for path in sorted(glob.glob(os.path.join(self.journal_directory, 'ingest-*.journal'))):
+            try:
+                journal = _Journal(path)
+            except OSError:
+                continue
+
+            entries = _read_journal(path)
+
+            for metric, readings in entries:
+                self._pending.append((metric, readings))
+                self._count += len(readings)
+
+            self._retired.append(journal)
+
+            log.info('Replaying {count} queued requests from {path}.'.format(count=len(entries), path=path))
+
+        if self._pending:
+            self._oldest = time.monotonic()
+
+    def _start(self):
+        if self.journal_directory is not None:
+            self._replay()
+            self._journal = self._new_journal()
+
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _take(self) -> list:
+        with self._condition:
+            while not self._stopped:
+                if self._count >= self.group_size:
+                    break
+
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds:
+                    break
+
+                timeout = self.flush_seconds if self._oldest is None else \
+                    self.flush_seconds - (time.monotonic() - self._oldest)
+                self._condition.wait(timeout)
+
+            entries = list(self._pending)
+            self._pending.clear()
+            self._count = 0
+            self._oldest = None
+
+            if self._journal is not None and self._journal.entries:
+                self._retired.append(self._journal)
+                self._journal = self._new_journal()
+
+            return entries
+
+    def _groups(self, entries: list) -> list:
+        readings = {}
+
+        for metric, entry_readings in entries:
+            readings.setdefault(metric, []).extend(entry_readings)
+
+        return [(metric, metric_readings[offset:offset + self.group_size])
+                for metric, metric_readings in readings.items()
+                for offset in range(0, len(metric_readings), self.group_size)]
+
+    def _write(self, groups: list) -> list:
+        # Returns the groups, or the readings of a group, that could not be written
+        for position, (metric, readings) in enumerate(groups):
+            try:
+                with self.app.app_context():
+                    result = create_readings(READING_MODELS[metric], readings)
+            except Exception:
+                log.exception('Could not write {count} queued {metric} readings.'.format(count=len(readings),
+                                                                                         metric=metric))
+                return groups[position:]
+
+            # Only the readings refused by validation are dropped; those the database failed to write are kept
+            failed = [readings[item['index']] for item in result['results'] if item['status'] >= 500]
+
+            if result['rejected'] > len(failed):
+                log.warning('{count} queued {metric} readings were rejected.'.format(
+                    count=result['rejected'] - len(failed), metric=metric))
+
+            if failed:
+                log.warning('Could not write {count} queued {metric} readings.'.format(count=len(failed),
+                                                                                       metric=metric))
+                return [(metric, failed)] + groups[position + 1:]
+
+        return []
+
+    def _requeue(self, groups: list):
+        with self._condition:
+            for metric, readings in reversed(groups):
+                self._pending.appendleft((metric, readings))
+                self._count += len(readings)
+
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _run(self):
+        while True:
+            entries = self._take()
+            failed = self._write(self._groups(entries))
+
+            if failed:
+                # Kept, with their journal files, for the next drain
+                self._requeue(failed)
+
+                if self._stopped:
+                    log.error('Stopped with {count} queued readings not written.'.format(count=self._count))
+                    return
+
+                time.sleep(self.flush_seconds)
+            else:
+                with self._condition:
+                    retired, self._retired = self._retired, []
+
+                for journal in retired:
+                    journal.remove()
+
+            with self._condition:
+                if self._stopped and not self._pending:
+                    return
+
+    def stop(self):
+        """
+        Write the queued readings and stop the writer.
+
+        :return: None
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._condition:
+            if self._journal is not None and not self._pending:
+                self._journal.remove()
+                self._journal = None
+
+
+def set_ingest_queue(queue):
+    """
+    Set the queue of readings acknowledged before they are written.
+
+    :param queue: An IngestQueue, or None to write readings before answering.
+    :return: None
+    """
+    _queues['ingest'] = queue
+
+
+def ingest_queue():
+    """
+    Get the queue of readings acknowledged before they are written.
+
+    :return: The IngestQueue, or None.
+    """
+    return _queues['ingest']
+
+
+def queue_reading(model, data):
+    """
+    Validate a reading and queue it for writing.
+
+    :param model: The ORM class of the reading (Humidity, Pressure or Temperature).
+    :param data: JSON data for a reading.
+    :return: None
+    """
+    reading_row(data)
+    ingest_queue().put(model.__tablename__, [data])
+
+
+def queue_readings(model, data) -> dict:
+    """
+    Validate readings and queue the valid ones for writing.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param data: A JSON list of readings.
+    :return: A dict with the 'accepted' and 'rejected' counts and the status of each reading in 'results'.
+    """
+    results = []
+    accepted = []
+
+    for index, reading in enumerate(data):
+        try:
+            reading_row(reading)
+            accepted.append(reading)
+            results.append({'index': index, 'status': 202, 'message': None})
+        except ValueError as exception:
+            results.append({'index': index, 'status': 400, 'message': str(exception)})
+
+    if accepted:
+        ingest_queue().put(model.__tablename__, accepted)
+
+    return {
+        'created': 0,
+        'accepted': len(accepted),
+        'rejected': len(results) - len(accepted),
+        'results': results
+    }
@@ -0,0 +1,328 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+
+from api.weather_data_flaskapi.business.archive import tiered_reading_rows
+from database.models import READING_MODELS
+
+# How a grid point takes the value of a series
+ALIGNMENTS = ('nearest', 'previous')
+
+# The quantities computed from the aligned temperature and relative humidity, in degrees Celsius
+DERIVED = ('dew_point', 'heat_index', 'humidex')
+
+# The most points of a grid
+MAX_JOINED_POINTS = 10000
+
+# The rows fetched per round trip while reading a series, and aligned at a time
+JOINED_FETCH_SIZE = 5000
+
+# The temperature units understood by the derived quantities, as (scale, offset) to degrees Celsius
+TEMPERATURE_UNITS = {
+    'c': (1.0, 0.0),
+    'celsius': (1.0, 0.0),
+    'f': (5.0 / 9.0, -160.0 / 9.0),
+    'fahrenheit': (5.0 / 9.0, -160.0 / 9.0),
+    'k': (1.0, -273.15),
+    'kelvin': (1.0, -273.15),
+}
+
+
+class JoinedValueError(ValueError):
+    """
+    Exception on a grid, tolerance or derived quantity that cannot be computed.
+    """
+    pass
+
+
+def parse_derived(derived: str) -> list:
+    """
+    Parse a comma separated list of derived quantities.
+
+    :param derived: The derived quantities requested (e.g. dew_point,humidex), or None.
+    :type derived: str
+    :return: The list of derived quantities.
+    """
+    quantities = [quantity.strip() for quantity in (derived or '').split(',') if quantity.strip()]
+
+    if any(quantity not in DERIVED for quantity in quantities):
+        raise JoinedValueError('derived must be a comma separated list of {quantities}'.format(
+            quantities=', '.join(DERIVED)))
+
+    return quantities
+
+
+def time_grid(start, end, step_seconds: int):
+    """
+    Build the grid of a joined series.
+
+    :param start: The first point.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param step_seconds: The seconds between points.
+    :type step_seconds: int
+    :return: A numpy datetime64 array.
+    """
+    if step_seconds <= 0:
+        raise JoinedValueError('step must be a positive number of seconds')
+
+    if end < start:
+        raise JoinedValueError('end must not be before start')
+
+    if (end - start).total_seconds() // step_seconds + 1 > MAX_JOINED_POINTS:
+        raise JoinedValueError('the grid holds more than {count} points; use a larger step or narrow the date '
+                               'range'.format(count=MAX_JOINED_POINTS))
+
+    return np.arange(np.datetime64(start, 'us'), np.datetime64(end, 'us') + 1,
+                     np.timedelta64(step_seconds, 's')).astype('datetime64[us]')
+
+
+def check_tolerance(step_seconds: int, tolerance_seconds: int = None) -> int:
+    """
+    Check the tolerance of a grid.
+
+    A point takes a reading at most a step away, so the readings read for a grid are bounded by its range.
+
+    :param step_seconds: The seconds between points.
+    :type step_seconds: int
+    :param tolerance_seconds: The most seconds between a point and its reading, or None for the step.
+    :type tolerance_seconds: int
+    :return: The tolerance in seconds.
+    """
+    if tolerance_seconds is None:
+        return step_seconds
+
+    if tolerance_seconds < 0:
+        raise JoinedValueError('tolerance must not be negative')
+
+    if tolerance_seconds > step_seconds:
+        raise JoinedValueError('tolerance must not be more than the step')
+
+    return tolerance_seconds
+
+
+def _aligned_series(model, grid, start, end, city: str, province: str, country: str, alignment: str,
+                    tolerance_seconds: int) -> tuple:
+    """
+    Read a series and align it onto a grid as its rows arrive, holding one fetch of rows at a time.
+
+    The rows are read in timestamp order, so a point keeps the reading of an earlier fetch unless a later
+    one is closer ('nearest') or at all ('previous').
+
+    :return: A (values, units) tuple of numpy arrays over the grid, NaN and '' where no reading is taken.
+    """
+    tolerance = np.timedelta64(tolerance_seconds, 's')
+    taken = np.full(len(grid), np.datetime64('NaT'), dtype='datetime64[us]')
+    values = np.full(len(grid), np.nan)
+    units = np.full(len(grid), '', dtype=object)
+    rows = iter(tiered_reading_rows(model, start, end, city, province, country, yield_per=JOINED_FETCH_SIZE))
+
+    while True:
+        batch = list(islice(rows, JOINED_FETCH_SIZE))
+
+        if not batch:
+            break
+
+        timestamps = np.array([row.timestamp for row in batch], dtype='datetime64[us]')
+
+        # Only the points within the tolerance of the fetch can take one of its readings
+        first = np.searchsorted(grid, timestamps[0] - tolerance, side='left')
+        last = np.searchsorted(grid, timestamps[-1] + tolerance, side='right')
+        points = grid[first:last]
+        chosen = align(timestamps, points, alignment, tolerance_seconds)
+        found = chosen >= 0
+        candidate = timestamps[np.maximum(chosen, 0)]
+
+        if alignment == 'nearest':
+            # NaT compares false, so a point without a reading takes any; a tie keeps the earlier reading
+            kept = taken[first:last]
+            found &= np.isnat(kept) | (np.abs(candidate - points) < np.abs(kept - points))
+
+        for offset in np.flatnonzero(found).tolist():
+            row = batch[int(chosen[offset])]
+            taken[first + offset] = candidate[offset]
+            values[first + offset] = row.value
+            units[first + offset] = row.value_units
+
+    return values, units
+
+
+def align(timestamps, grid, alignment: str, tolerance_seconds: int):
+    """
+    Find the reading taken by each point of a grid.
+
+    :param timestamps: The sorted datetime64 timestamps of the readings.
+    :param grid: The datetime64 points.
+    :param alignment: 'nearest' takes the closest reading, the earlier on a tie; 'previous' takes the last
+        reading at or before the point.
+    :type alignment: str
+    :param tolerance_seconds: The most seconds between a point and its reading.
+    :type tolerance_seconds: int
+    :return: A numpy array of the index of the reading of each point, -1 where none is within the tolerance.
+    """
+    tolerance = np.timedelta64(tolerance_seconds, 's')
+    previous = np.searchsorted(timestamps, grid, side='right') - 1
+
+    if not len(timestamps):
+        return previous
+
+    chosen = previous
+
+    if alignment == 'nearest':
+        following = np.minimum(previous + 1, len(timestamps) - 1)
+        before = np.where(previous >= 0, grid - timestamps[np.maximum(previous, 0)],
+                          np.timedelta64(np.iinfo(np.int64).max, 'us'))
+        after = timestamps[following] - grid
+        chosen = np.where((following > previous) & (after < before), following, previous)
+
+    distance = np.abs(grid - timestamps[np.maximum(chosen, 0)])
+    return np.where((chosen >= 0) & (distance <= tolerance), chosen, -1)
+
+
+def _celsius(values, units):
+    celsius = np.full(len(values), np.nan)
+
+    for unit in set(units.tolist()):
+        name = unit.strip().lower().lstrip('°').replace('deg', '').strip()
+        scale, offset = TEMPERATURE_UNITS.get(name, (np.nan, np.nan))
+        selected = units == unit
+        celsius[selected] = values[selected] * scale + offset
+
+    return celsius
+
+
+def dew_point(temperature, relative_humidity):
+    """
+    Compute the dew point with the Magnus formula (Alduchov and Eskridge constants).
+
+    :param temperature: The temperatures in degrees Celsius.
+    :param relative_humidity: The relative humidities in percent.
+    :return: A numpy array of degrees Celsius; NaN where the humidity is not above 0.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log(np.where(relative_humidity > 0, relative_humidity, np.nan) / 100.0) + \
+            17.625 * temperature / (243.04 + temperature)
+        return 243.04 * gamma / (17.625 - gamma)
+
+
+def heat_index(temperature, relative_humidity):
+    """
+    Compute the heat index with the regression of the US National Weather Service.
+
+    :param temperature: The temperatures in degrees Celsius.
+    :param relative_humidity: The relative humidities in percent.
+    :return: A numpy array of degrees Celsius.
+    """
+    fahrenheit = temperature * 9.0 / 5.0 + 32.0
+    humidity = relative_humidity
+    simple = 0.5 * (fahrenheit + 61.0 + (fahrenheit - 68.0) * 1.2 + humidity * 0.094)
+
+    rothfusz = -42.379 + 2.04901523 * fahrenheit + 10.14333127 * humidity - 0.22475541 * fahrenheit * humidity - \
+        6.83783e-3 * fahrenheit ** 2 - 5.481717e-2 * humidity ** 2 + 1.22874e-3 * fahrenheit ** 2 * humidity + \
+        8.5282e-4 * fahrenheit * humidity ** 2 - 1.99e-6 * fahrenheit ** 2 * humidity ** 2
+
+    with np.errstate(invalid='ignore'):
+        dry = (humidity < 13.0) & (fahrenheit >= 80.0) & (fahrenheit <= 112.0)
+        rothfusz = np.where(dry, rothfusz - (13.0 - humidity) / 4.0 * np.sqrt(
+            np.maximum(17.0 - np.abs(fahrenheit - 95.0), 0.0) / 17.0), rothfusz)
+        humid = (humidity > 85.0) & (fahrenheit >= 80.0) & (fahrenheit <= 87.0)
+        rothfusz = np.where(humid, rothfusz + (humidity - 85.0) / 10.0 * (87.0 - fahrenheit) / 5.0, rothfusz)
+        index = np.where((simple + fahrenheit) / 2.0 >= 80.0, rothfusz, simple)
+
+    return (index - 32.0) * 5.0 / 9.0
+
+
+def humidex(temperature, relative_humidity):
+    """
+    Compute the humidex of Environment Canada.
+
+    :param temperature: The temperatures in degrees Celsius.
+    :param relative_humidity: The relative humidities in percent.
+    :return: A numpy array of degrees Celsius.
+    """
+    dew_points = dew_point(temperature, relative_humidity)
+    vapour_pressure = 6.11 * np.exp(5417.7530 * (1.0 / 273.16 - 1.0 / (273.15 + dew_points)))
+    return temperature + 0.5555 * (vapour_pressure - 10.0)
+
+
+DERIVED_FUNCTIONS = {
+    'dew_point': dew_point,
+    'heat_index': heat_index,
+    'humidex': humidex,
+}
+
+
+def _listed(values) -> list:
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def joined_readings(start, end, city: str, province: str, country: str, step_seconds: int, alignment: str = 'nearest',
+                    tolerance_seconds: int = None, derived: list = ()) -> dict:
+    """
+    Align the humidity, pressure and temperature readings of a location onto one time grid.
+
+    Each series is read once, in timestamp order, and matched to the grid a fetch at a time with a vectorized
+    binary search.
+    Readings of the stations of the city are merged into one series per metric.
+
+    :param start: The first point of the grid.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :param step_seconds: The seconds between points.
+    :type step_seconds: int
+    :param alignment: 'nearest' or 'previous', see align.
+    :type alignment: str
+    :param tolerance_seconds: The most seconds between a point and its reading, at most the step (default: the
+        step).
+    :type tolerance_seconds: int
+    :param derived: The derived quantities to compute, see DERIVED.
+    :type derived: list
+    :return: A dict of the 'timestamp' list, a value list per metric and derived quantity, None where no
+        reading is within the tolerance, and the 'units' of each metric.
+    """
+    tolerance_seconds = check_tolerance(step_seconds, tolerance_seconds)
+
+    if alignment not in ALIGNMENTS:
+        raise JoinedValueError('alignment must be one of {alignments}'.format(alignments=', '.join(ALIGNMENTS)))
+
+    grid = time_grid(start, end, step_seconds)
+    tolerance = timedelta(seconds=tolerance_seconds)
+    joined = {'timestamp': grid.astype('datetime64[us]').tolist(), 'units': {}}
+    aligned = {}
+
+    for metric, model in READING_MODELS.items():
+        aligned[metric] = _aligned_series(model, grid, start - tolerance, end + tolerance, city, province, country,
+                                          alignment, tolerance_seconds)
+        joined[metric] = _listed(aligned[metric][0])
+
+        present = set(aligned[metric][1][aligned[metric][1] != ''].tolist())
+        joined['units'][metric] = present.pop() if len(present) == 1 else None
+
+    if derived:
+        temperature = _celsius(*aligned['temperature'])
+        relative_humidity = aligned['humidity'][0]
+
+        for quantity in derived:
+            joined[quantity] = _listed(DERIVED_FUNCTIONS[quantity](temperature, relative_humidity))
+
+    return joined
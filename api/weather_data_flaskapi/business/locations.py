@@ -0,0 +1,153 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from database.models import Location
+
+# The scale of the elevation column
+ELEVATION_QUANTUM = Decimal('0.0001')
+
+
+def location_key(city: str, province: str, country: str, elevation, elevation_units: str) -> tuple:
+    """
+    Build the key of a location, with the elevation as the location table stores it.
+
+    :param city: The city of the station.
+    :type city: str
+    :param province: The province of the station.
+    :type province: str
+    :param country: The country of the station.
+    :type country: str
+    :param elevation: The elevation of the station.
+    :param elevation_units: The units of the elevation.
+    :type elevation_units: str
+    :return: A (city, province, country, elevation, elevation_units) tuple.
+    """
+    return city, province, country, Decimal(str(elevation)).quantize(ELEVATION_QUANTUM), elevation_units
+
+
+def _find_location(key: tuple):
+    city, province, country, elevation, elevation_units = key
+
+    return Location.query.filter(
+        and_(Location.city == city,
+             Location.province == province,
+             Location.country == country,
+             Location.elevation == elevation,
+             Location.elevation_units == elevation_units)).one_or_none()
+
+
+def get_or_create_location(city: str, province: str, country: str, elevation, elevation_units: str) -> Location:
+    """
+    Find the location of a station, adding it to the location table the first time it is seen.
+
+    :param city: The city of the station.
+    :type city: str
+    :param province: The province of the station.
+    :type province: str
+    :param country: The country of the station.
+    :type country: str
+    :param elevation: The elevation of the station.
+    :param elevation_units: The units of the elevation.
+    :type elevation_units: str
+    :return: Location
+    """
+    key = location_key(city, province, country, elevation, elevation_units)
+    location = _find_location(key)
+
+    if location is not None:
+        return location
+
+    try:
+        with db.session.begin_nested():
+            location = Location(*key)
+            db.session.add(location)
+    except IntegrityError:
+        # Another writer added the location first
+        location = _find_location(key)
+
+    return location
+
+
+def find_location_ids(city: str, province: str, country: str) -> list:
+    """
+    Find the identifiers of the stations in a city.
+
+    :param city: The city of the stations.
+    :type city: str
+    :param province: The province of the stations.
+    :type province: str
+    :param country: The country of the stations.
+    :type country: str
+    :return: The list of location identifiers, usually only one.
+    """
+    return [location_id for location_id, in Location.query.with_entities(Location.id).filter(
+        and_(Location.city == city,
+             Location.province == province,
+             Location.country == country)).all()]
+
+
+def location_versions(city: str, province: str, country: str) -> list:
+    """
+    Find the write versions of the stations in a city.
+
+    :param city: The city of the stations.
+    :type city: str
+    :param province: The province of the stations.
+    :type province: str
+    :param country: The country of the stations.
+    :type country: str
+    :return: A list of (location identifier, version, modified date) tuples.
+    """
+    return [tuple(row) for row in Location.query.with_entities(Location.id,
+                                                               Location.version,
+                                                               Location.modified_date).filter(
+        and_(Location.city == city,
+             Location.province == province,
+             Location.country == country)).order_by(Location.id).all()]
+
+
+def reading_version(model, reading_id: int):
+    """
+    Find the write version of the location of a reading.
+
+    :param model: The ORM class of the reading (Humidity, Pressure or Temperature).
+    :param reading_id: The reading identifier.
+    :type reading_id: int
+    :return: A (location identifier, version, modified date) tuple, or None when the reading does not exist.
+    """
+    row = db.session.execute(select(Location.id, Location.version, Location.modified_date).join(
+        model, model.location_id == Location.id).where(model.id == reading_id)).first()
+
+    return tuple(row) if row is not None else None
+
+
+def touch_locations(location_ids):
+    """
+    Bump the write version of locations whose readings changed.
+
+    :param location_ids: The identifiers of the locations.
+    :return: None
+    """
+    location_ids = sorted(set(location_ids))
+
+    if not location_ids:
+        return
+
+    db.session.execute(update(Location).where(Location.id.in_(location_ids)).values(
+        version=Location.version + 1,
+        modified_date=datetime.utcnow()).execution_options(synchronize_session=False))
@@ -0,0 +1,146 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+
+from database import db
+from database.models import User
+
+log = logging.getLogger(__name__)
+
+# The login recorder of the application; see set_login_recorder
+_recorders = {'login': None}
+
+
+class LoginRecorder(object):
+    """
+    Buffers the last login date of users and writes them in one batched UPDATE every flush interval
+    and when the process exits.
+
+    A date is lost only if the process dies without running its exit handlers.
+    """
+
+    def __init__(self, app, flush_seconds: float):
+        """
+        LoginRecorder constructor.
+
+        :param app: The Flask application, for the database connection of the flushing thread.
+        :param flush_seconds: The seconds between writes.
+        :type flush_seconds: float
+        """
+        self.app = app
+        self.flush_seconds = flush_seconds
+        self._logins = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self, user_id: int, login_date: datetime = None):
+        """
+        Buffer the login of a user.
+
+        :param user_id: The user's identifier.
+        :type user_id: int
+        :param login_date: The date and time of the login, by default now.
+        :type login_date: datetime
+        :return: None
+        """
+        with self._lock:
+            self._logins[user_id] = login_date or datetime.utcnow()
+
+            # Started by the first login, so the thread runs in the WSGI worker rather than its parent
+            if self._thread is None:
+                self._start()
+
+    def flush(self) -> int:
+        """
+        Write the buffered last login dates.
+
+        :return: The number of users written.
+        """
+        with self._lock:
+            logins, self._logins = self._logins, {}
+
+        if not logins:
+            return 0
+
+        # Core rather than ORM bulk UPDATE, so a user deleted since the login is skipped instead of an error
+        statement = update(User.__table__).where(
+            User.__table__.c.id == bindparam('user_id')).values(
+            last_login_date=bindparam('login_date'))
+
+        with self.app.app_context():
+            try:
+                db.session.execute(statement, [{'user_id': user_id, 'login_date': login_date}
+                                               for user_id, login_date in sorted(logins.items())])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+                with self._lock:
+                    # Keep the dates for the next flush unless a newer login replaced them
+                    for user_id, login_date in logins.items():
+                        self._logins.setdefault(user_id, login_date)
+
+                raise
+            finally:
+                db.session.remove()
+
+        return len(logins)
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                log.exception('Could not write the last login dates.')
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='login-recorder', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stop the flushing thread and write the buffered dates.
+
+        :return: None
+        """
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        self.flush()
+
+
+def set_login_recorder(recorder):
+    """
+    Set the recorder of last login dates.
+
+    :param recorder: A LoginRecorder, or None to write the date at each login.
+    :return: None
+    """
+    _recorders['login'] = recorder
+
+
+def login_recorder():
+    """
+    Get the recorder of last login dates.
+
+    :return: The LoginRecorder, or None.
+    """
+    return _recorders['login']
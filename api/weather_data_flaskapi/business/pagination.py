@@ -0,0 +1,94 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+
+class CursorValueError(ValueError):
+    """
+    Exception on a cursor that cannot be decoded.
+    """
+    pass
+
+
+def encode_cursor(timestamp: datetime, record_id: int) -> str:
+    """
+    Encode the (timestamp, id) keyset position of a record as an opaque cursor.
+
+    :param timestamp: The timestamp of the last record on the page.
+    :type timestamp: datetime
+    :param record_id: The identifier of the last record on the page.
+    :type record_id: int
+    :return: The opaque cursor.
+    """
+    position = '{timestamp}|{id}'.format(timestamp=timestamp.isoformat(), id=record_id)
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode an opaque cursor into its (timestamp, id) keyset position.
+
+    :param cursor: The opaque cursor returned by encode_cursor.
+    :type cursor: str
+    :return: A (timestamp, id) tuple.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        position = base64.urlsafe_b64decode(cursor + padding).decode('utf-8')
+        timestamp, record_id = position.split('|')
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorValueError('cursor is not valid')
+
+
+def cursor_position(cursor: str):
+    """
+    Decode the keyset position of an optional cursor.
+
+    :param cursor: The opaque cursor, or None for the first page.
+    :type cursor: str
+    :return: A (timestamp, id) tuple, or None for the first page.
+    """
+    if not cursor:
+        return None
+
+    return decode_cursor(cursor)
+
+
+def keyset_page(records: list, limit: int) -> dict:
+    """
+    Build one page of keyset pagination on (timestamp, id).
+
+    The records must be read in (timestamp, id) order after the cursor's position, with a limit of one
+    more than the page size. Unlike OFFSET paging, every page is an index seek, so deep pages cost the
+    same as the first.
+
+    :param records: Up to limit + 1 records.
+    :type records: list
+    :param limit: The maximum number of records on the page.
+    :type limit: int
+    :return: A dict with the page 'items', the 'next' cursor (None on the last page) and the 'limit'.
+    """
+    next_cursor = None
+
+    # The extra record only tells us that another page exists
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].timestamp, records[-1].id)
+
+    return {
+        'items': records,
+        'next': next_cursor,
+        'limit': limit
+    }
@@ -0,0 +1,299 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import logging
+import re
+import time
+from datetime import date, datetime
+
+from sqlalchemy import and_, delete, func, select, text
+
+from api.weather_data_flaskapi.business.locations import touch_locations
+from api.weather_data_flaskapi.business.queries import location_filter
+from database import db
+from database.models import Location
+
+log = logging.getLogger(__name__)
+
+# The partition holding readings past the last monthly partition
+MAX_PARTITION = 'pmax'
+
+# The most partitions MySQL allows in a table
+MAX_PARTITIONS = 8192
+
+# Readings removed by each DELETE of a table that is not partitioned
+DELETE_CHUNK_SIZE = 5000
+
+_MONTHLY_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+class PartitionError(ValueError):
+    """
+    Exception when a table cannot be partitioned as asked.
+    """
+    pass
+
+
+def month_start(value) -> date:
+    """
+    Find the first day of the month of a date.
+
+    :param value: A date or datetime.
+    :return: date
+    """
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """
+    Move the first day of a month by a number of months.
+
+    :param month: The first day of a month.
+    :type month: date
+    :param count: The number of months, possibly negative.
+    :type count: int
+    :return: date
+    """
+    months = month.year * 12 + month.month - 1 + count
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """
+    Name the partition of a month (e.g. p201706).
+
+    :param month: The first day of the month.
+    :type month: date
+    :return: str
+    """
+    return 'p{month:%Y%m}'.format(month=month)
+
+
+def _partition_clause(month: date) -> str:
+    return "PARTITION {name} VALUES LESS THAN ('{upper:%Y-%m-%d}')".format(
+        name=partition_name(month), upper=add_months(month, 1))
+
+
+def _months(first: date, last: date) -> list:
+    months = []
+
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+
+    return months
+
+
+def supports_partitions() -> bool:
+    """
+    Tell whether the database partitions tables natively.
+
+    :return: True on MySQL, else False.
+    """
+    return db.session.get_bind().dialect.name == 'mysql'
+
+
+def partition_months(model) -> list:
+    """
+    Find the monthly partitions of a reading table.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :return: The first days of the months with a partition, in order; empty when the table is not partitioned.
+    """
+    if not supports_partitions():
+        return []
+
+    names = db.session.execute(text(
+        'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL '
+        'ORDER BY PARTITION_ORDINAL_POSITION'), {'table': model.__tablename__}).scalars()
+
+    return [date(int(match.group(1)), int(match.group(2)), 1)
+            for match in (_MONTHLY_PARTITION.match(name) for name in names) if match]
+
+
+def _has_index(table: str, index: str) -> bool:
+    return db.session.execute(text(
+        'SELECT COUNT(*) FROM information_schema.STATISTICS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index'),
+        {'table': table, 'index': index}).scalar() > 0
+
+
+def partition_table(model, months_ahead: int, today: date = None) -> int:
+    """
+    Partition a reading table by month of the reading timestamp.
+
+    MySQL requires every unique key of a partitioned table to hold the partitioning column and does not
+    allow foreign keys on it, so the primary key becomes (id, timestamp), the reading key index becomes
+    (reading_key, timestamp) and the foreign key to the location table is dropped. The table is
+    rewritten; run this in a maintenance window.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param months_ahead: The number of months after the current one to create partitions for.
+    :type months_ahead: int
+    :param today: The current date, by default today.
+    :type today: date
+    :return: The number of monthly partitions created.
+    """
+    if not supports_partitions():
+        raise PartitionError('monthly partitions need MySQL')
+
+    if partition_months(model):
+        raise PartitionError('{table} is already partitioned'.format(table=model.__tablename__))
+
+    table = model.__tablename__
+    current = month_start(today or datetime.utcnow())
+    first = db.session.execute(select(func.min(model.timestamp))).scalar()
+    months = _months(month_start(first) if first is not None else current, add_months(current, months_ahead))
+
+    if len(months) >= MAX_PARTITIONS:
+        raise PartitionError('{table} would need {count} monthly partitions; delete its oldest readings first'.format(
+            table=table, count=len(months)))
+
+    foreign_keys = db.session.execute(text(
+        'SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS '
+        'WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :table'), {'table': table}).scalars().all()
+
+    for foreign_key in foreign_keys:
+        db.session.execute(text('ALTER TABLE {table} DROP FOREIGN KEY {foreign_key}'.format(
+            table=table, foreign_key=foreign_key)))
+
+    keys = ['DROP PRIMARY KEY', 'ADD PRIMARY KEY (id, timestamp)']
+    reading_key_index = '{table}_reading_key_index'.format(table=table)
+
+    if _has_index(table, reading_key_index):
+        keys.append('DROP INDEX {index}'.format(index=reading_key_index))
+
+    keys.append('ADD UNIQUE INDEX {index} (reading_key, timestamp)'.format(index=reading_key_index))
+
+    db.session.execute(text('ALTER TABLE {table} {keys}'.format(table=table, keys=', '.join(keys))))
+
+    db.session.execute(text('ALTER TABLE {table} PARTITION BY RANGE COLUMNS(timestamp) ({partitions})'.format(
+        table=table,
+        partitions=', '.join([_partition_clause(month) for month in months] +
+                             ['PARTITION {name} VALUES LESS THAN (MAXVALUE)'.format(name=MAX_PARTITION)]))))
+
+    log.info('Partitioned {table} into {count} months.'.format(table=table, count=len(months)))
+
+    return len(months)
+
+
+def add_partitions(model, months_ahead: int, today: date = None) -> int:
+    """
+    Create the monthly partitions of a partitioned reading table up to a number of months ahead.
+
+    The new months are split off the last partition, which is empty unless readings arrived from beyond
+    the last month.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param months_ahead: The number of months after the current one to have partitions for.
+    :type months_ahead: int
+    :param today: The current date, by default today.
+    :type today: date
+    :return: The number of monthly partitions created.
+    """
+    existing = partition_months(model)
+
+    if not existing:
+        raise PartitionError('{table} is not partitioned'.format(table=model.__tablename__))
+
+    last = add_months(month_start(today or datetime.utcnow()), months_ahead)
+    months = _months(add_months(existing[-1], 1), last)
+
+    if not months:
+        return 0
+
+    db.session.execute(text('ALTER TABLE {table} REORGANIZE PARTITION {maximum} INTO ({partitions})'.format(
+        table=model.__tablename__,
+        maximum=MAX_PARTITION,
+        partitions=', '.join([_partition_clause(month) for month in months] +
+                             ['PARTITION {name} VALUES LESS THAN (MAXVALUE)'.format(name=MAX_PARTITION)]))))
+
+    log.info('Added {count} partitions to {table}.'.format(count=len(months), table=model.__tablename__))
+
+    return len(months)
+
+
+def _forget_readings():
+    # The readings of any station may have gone, so every validator changes
+    touch_locations(db.session.execute(select(Location.id)).scalars().all())
+    db.session.commit()
+
+
+def drop_partitions_before(model, before: date) -> int:
+    """
+    Drop the monthly partitions of a reading table that end on or before a date.
+
+    A partition is dropped whole, without reading or logging its rows. The rollups are kept.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param before: Drop the months ending on or before this date.
+    :type before: date
+    :return: The number of partitions dropped.
+    """
+    months = [month for month in partition_months(model) if add_months(month, 1) <= before]
+
+    if not months:
+        return 0
+
+    db.session.execute(text('ALTER TABLE {table} DROP PARTITION {partitions}'.format(
+        table=model.__tablename__,
+        partitions=', '.join(partition_name(month) for month in months))))
+
+    _forget_readings()
+
+    log.info('Dropped {count} partitions of {table}.'.format(count=len(months), table=model.__tablename__))
+
+    return len(months)
+
+
+def delete_readings_before(model, before: datetime, chunk_size: int = DELETE_CHUNK_SIZE, location_ids: list = None,
+                           pause_seconds: float = 0) -> int:
+    """
+    Delete the readings of a table older than a date, a chunk per transaction.
+
+    This is the fallback for tables that are not partitioned. The rollups are kept.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param before: Delete the readings before this date and time.
+    :type before: datetime
+    :param chunk_size: The readings deleted per transaction.
+    :type chunk_size: int
+    :param location_ids: Delete only the readings of these locations, by default of all.
+    :type location_ids: list
+    :param pause_seconds: The seconds to wait between chunks, letting other writers and replicas catch up.
+    :type pause_seconds: float
+    :return: The number of readings deleted.
+    """
+    deleted = 0
+    expired = model.timestamp < before
+
+    if location_ids is not None:
+        expired = and_(location_filter(model, location_ids), expired)
+
+    while True:
+        ids = db.session.execute(select(model.id).where(expired).order_by(model.timestamp).limit(
+            chunk_size)).scalars().all()
+
+        if not ids:
+            break
+
+        db.session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        deleted += len(ids)
+
+        if pause_seconds and len(ids) == chunk_size:
+            time.sleep(pause_seconds)
+
+    if deleted:
+        _forget_readings()
+
+    return deleted
@@ -0,0 +1,282 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import itertools
+from functools import lru_cache
+
+from sqlalchemy import and_, bindparam, func, or_, select
+
+from api.weather_data_flaskapi.business.locations import find_location_ids
+from api.weather_data_flaskapi.business.spatial import covering_ranges
+from database import db
+from database.models import Location
+
+# The location columns returned with each reading row
+LOCATION_COLUMNS = ('city', 'province', 'country', 'elevation', 'elevation_units')
+
+
+def location_filter(model, location_ids: list):
+    """
+    Build the filter for the rows of a list of locations.
+
+    A city usually has one station, so the filter is usually a single integer equality.
+
+    :param model: The ORM class of the readings or rollups.
+    :param location_ids: The identifiers of the locations.
+    :type location_ids: list
+    :return: The filter expression.
+    """
+    if len(location_ids) == 1:
+        return model.location_id == location_ids[0]
+
+    return model.location_id.in_(location_ids)
+
+
+def query_readings(model, start, end, city: str, province: str, country: str):
+    """
+    Build the query for the readings of a location within a date range.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: The start date (e.g. 2017-01-30).
+    :param end: The end date (e.g. 2017-01-30), inclusive.
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :return: The unordered query.
+    """
+    return model.query.filter(
+        and_(model.timestamp >= start,
+             model.timestamp <= end)).filter(
+        location_filter(model, find_location_ids(city, province, country)))
+
+
+def reading_rows_select(model):
+    """
+    Build the unfiltered select of reading rows: the reading columns and the location columns.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :return: The select statement.
+    """
+    readings = model.__table__
+    locations = Location.__table__
+
+    columns = [column for column in readings.columns if column.name != 'location_id']
+    columns += [locations.columns[name] for name in LOCATION_COLUMNS]
+
+    return select(*columns).select_from(readings.join(locations, readings.c.location_id == locations.c.id))
+
+
+@lru_cache(maxsize=None)
+def _reading_rows_statement(model, end_inclusive: bool, after_position: bool, limited: bool):
+    readings = model.__table__
+
+    statement = reading_rows_select(model).where(
+        readings.c.location_id.in_(bindparam('location_ids', expanding=True)),
+        readings.c.timestamp >= bindparam('start'),
+        readings.c.timestamp <= bindparam('end') if end_inclusive else readings.c.timestamp < bindparam('end'))
+
+    if after_position:
+        statement = statement.where(
+            or_(readings.c.timestamp > bindparam('after_timestamp'),
+                and_(readings.c.timestamp == bindparam('after_timestamp'),
+                     readings.c.id > bindparam('after_id'))))
+
+    statement = statement.order_by(readings.c.timestamp, readings.c.id)
+
+    if limited:
+        statement = statement.limit(bindparam('limit'))
+
+    return statement
+
+
+def reading_rows(model, start, end, city: str, province: str, country: str, position: tuple = None,
+                 limit: int = None, yield_per: int = None):
+    """
+    Read the readings of a location within a date range as plain rows, in (timestamp, id) order.
+
+    The statements are built once per shape with bound parameters, so a request only binds its values
+    and reuses the compiled SQL. Rows are named tuples with the reading and location columns; they skip
+    the ORM identity map and are meant for read-only requests.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time, inclusive.
+    :type end: datetime
+    :param city: The city of the readings.
+    :type city: str
+    :param province: The province of the readings.
+    :type province: str
+    :param country: The country of the readings.
+    :type country: str
+    :param position: Only read the rows after this (timestamp, id) keyset position.
+    :type position: tuple
+    :param limit: The most rows to read.
+    :type limit: int
+    :param yield_per: Fetch the rows from a server-side cursor in batches of this size.
+    :type yield_per: int
+    :return: The result, an iterable of rows.
+    """
+    location_ids = find_location_ids(city, province, country)
+
+    if not location_ids:
+        return []
+
+    return location_reading_rows(model, location_ids, start, end, position=position, limit=limit,
+                                 yield_per=yield_per)
+
+
+def location_reading_rows(model, location_ids: list, start, end, end_inclusive: bool = True, position: tuple = None,
+                          limit: int = None, yield_per: int = None):
+    """
+    Read the readings of locations within a date range as plain rows, in (timestamp, id) order.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param location_ids: The identifiers of the locations.
+    :type location_ids: list
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time.
+    :type end: datetime
+    :param end_inclusive: Whether the range holds its end.
+    :type end_inclusive: bool
+    :param position: Only read the rows after this (timestamp, id) keyset position.
+    :type position: tuple
+    :param limit: The most rows to read.
+    :type limit: int
+    :param yield_per: Fetch the rows from a server-side cursor in batches of this size.
+    :type yield_per: int
+    :return: The result, an iterable of rows.
+    """
+    statement = _reading_rows_statement(model, end_inclusive, position is not None, limit is not None)
+    parameters = {'location_ids': location_ids, 'start': start, 'end': end}
+
+    if position is not None:
+        parameters['after_timestamp'], parameters['after_id'] = position
+
+    if limit is not None:
+        parameters['limit'] = limit
+
+    if yield_per is not None:
+        return db.session.execute(statement, parameters, execution_options={'yield_per': yield_per})
+
+    return db.session.execute(statement, parameters).all()
+
+
+def reading_bounds(model, condition, start, end, end_inclusive: bool = True) -> tuple:
+    """
+    Find the first and last timestamps of the readings matching a filter within a date range.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param condition: The filter expression, e.g. of location_filter or area_filter.
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time.
+    :type end: datetime
+    :param end_inclusive: Whether the range holds its end.
+    :type end_inclusive: bool
+    :return: A (first, last) tuple, (None, None) without readings.
+    """
+    readings = model.__table__
+
+    return tuple(db.session.execute(select(func.min(readings.c.timestamp), func.max(readings.c.timestamp)).where(
+        condition,
+        readings.c.timestamp >= start,
+        readings.c.timestamp <= end if end_inclusive else readings.c.timestamp < end)).one())
+
+
+def area_filter(model, area):
+    """
+    Build the filter for the readings in an area.
+
+    Each box of the area is matched as a few ranges of the geohash index, narrowed by the public
+    coordinates; the radius of a near query is left to the caller.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param area: The area of the readings.
+    :type area: Area
+    :return: The filter expression.
+    """
+    readings = model.__table__
+    boxes = []
+
+    for box in area.boxes:
+        min_latitude, min_longitude, max_latitude, max_longitude = box
+        boxes.append(and_(or_(*[and_(readings.c.geohash >= lower, readings.c.geohash < upper)
+                                for lower, upper in covering_ranges(box)]),
+                          readings.c.latitude_public.between(min_latitude, max_latitude),
+                          readings.c.longitude_public.between(min_longitude, max_longitude)))
+
+    return or_(*boxes)
+
+
+def area_reading_rows(model, area, start, end, end_inclusive: bool = True, position: tuple = None, limit: int = None,
+                      yield_per: int = None):
+    """
+    Read the readings in an area within a date range as plain rows, in (timestamp, id) order.
+
+    The rows are those of reading_rows. The readings outside the radius of a near query are dropped
+    as they are read, and a limited read continues until it has its rows.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param area: The area of the readings.
+    :type area: Area
+    :param start: The start date and time.
+    :type start: datetime
+    :param end: The end date and time.
+    :type end: datetime
+    :param end_inclusive: Whether the range holds its end.
+    :type end_inclusive: bool
+    :param position: Only read the rows after this (timestamp, id) keyset position.
+    :type position: tuple
+    :param limit: The most rows to read.
+    :type limit: int
+    :param yield_per: Fetch the rows from a server-side cursor in batches of this size.
+    :type yield_per: int
+    :return: An iterable of rows.
+    """
+    readings = model.__table__
+    statement = reading_rows_select(model).where(
+        area_filter(model, area),
+        readings.c.timestamp >= start,
+        readings.c.timestamp <= end if end_inclusive else readings.c.timestamp < end).order_by(
+        readings.c.timestamp, readings.c.id)
+
+    def after(position):
+        if position is None:
+            return statement
+
+        return statement.where(or_(readings.c.timestamp > position[0],
+                                   and_(readings.c.timestamp == position[0], readings.c.id > position[1])))
+
+    if yield_per is not None:
+        result = db.session.execute(after(position), execution_options={'yield_per': yield_per})
+        rows = (row for batch in result.partitions() for row in area.filter_rows(batch))
+        return rows if limit is None else itertools.islice(rows, limit)
+
+    if limit is None:
+        return area.filter_rows(db.session.execute(after(position)))
+
+    rows = []
+
+    while len(rows) < limit:
+        batch = db.session.execute(after(position).limit(limit)).all()
+        rows.extend(area.filter_rows(batch))
+
+        if len(batch) < limit:
+            break
+
+        position = (batch[-1].timestamp, batch[-1].id)
+
+    return rows[:limit]
@@ -0,0 +1,193 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, select
+
+from api.weather_data_flaskapi.business.buckets import bucket_start_seconds, bucket_seconds_to_datetime, \
+    floor_bucket
+from api.weather_data_flaskapi.business.partitions import DELETE_CHUNK_SIZE, delete_readings_before
+from api.weather_data_flaskapi.business.queries import location_filter
+from api.weather_data_flaskapi.business.rollups import recompute_rollups
+from database import db
+from database.models import Location, ROLLUP_MODELS
+
+log = logging.getLogger(__name__)
+
+# Matches any metric or country in a retention policy
+ANY = '*'
+
+# The seconds of a daily rollup bucket
+DAY_SECONDS = 86400
+
+
+class RetentionPolicyError(ValueError):
+    """
+    Exception on a retention policy that is not a dict of dicts of days.
+    """
+    pass
+
+
+def validate_policies(policies: dict):
+    """
+    Check retention policies.
+
+    :param policies: Days raw readings are kept, as {metric: {country: days}}; '*' matches any metric or
+        country and None keeps the readings forever.
+    :type policies: dict
+    :return: None
+    """
+    if not isinstance(policies, dict):
+        raise RetentionPolicyError('retention policies must map metrics to countries')
+
+    for metric, countries in policies.items():
+        if not isinstance(countries, dict):
+            raise RetentionPolicyError('the retention policy of {metric} must map countries to days'.format(
+                metric=metric))
+
+        for country, days in countries.items():
+            if days is not None and (not isinstance(days, int) or days < 1):
+                raise RetentionPolicyError('the retention of {metric} in {country} must be a number of days'.format(
+                    metric=metric, country=country))
+
+
+def retention_days(policies: dict, metric: str, country: str):
+    """
+    Find the days raw readings of a metric in a country are kept.
+
+    A policy for the metric takes precedence over the '*' policy, and within it a country over '*'.
+
+    :param policies: Days raw readings are kept, as {metric: {country: days}}.
+    :type policies: dict
+    :param metric: The reading table (humidity, pressure or temperature).
+    :type metric: str
+    :param country: The country of the readings.
+    :type country: str
+    :return: The number of days, or None to keep the readings forever.
+    """
+    for metric_policy in (metric, ANY):
+        countries = policies.get(metric_policy)
+
+        if countries is None:
+            continue
+
+        for country_policy in (country, ANY):
+            if country_policy in countries:
+                return countries[country_policy]
+
+    return None
+
+
+def expiry_cutoffs(policies: dict, model, now: datetime = None) -> dict:
+    """
+    Group the locations of a metric by the date before which their raw readings have expired.
+
+    The dates are whole days, so only complete daily rollup buckets lose their readings.
+
+    :param policies: Days raw readings are kept, as {metric: {country: days}}.
+    :type policies: dict
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param now: The current date and time, by default now.
+    :type now: datetime
+    :return: A dict of lists of location identifiers by cutoff date.
+    """
+    now = now or datetime.utcnow()
+    cutoffs = {}
+
+    for location_id, country in db.session.execute(select(Location.id, Location.country).order_by(Location.id)):
+        days = retention_days(policies, model.__tablename__, country)
+
+        if days is not None:
+            cutoff = floor_bucket(now - timedelta(days=days), DAY_SECONDS)
+            cutoffs.setdefault(cutoff, []).append(location_id)
+
+    return cutoffs
+
+
+def downsample_readings(model, location_ids: list, before: datetime) -> int:
+    """
+    Make sure the daily rollups hold the readings about to expire.
+
+    The rollups are maintained as readings are written, so this only fills days whose rollup is missing
+    or counts fewer readings than the table, e.g. readings loaded before the rollups existed. A day
+    whose rollup counts more readings has already lost some of them and is left alone.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param location_ids: The identifiers of the locations.
+    :type location_ids: list
+    :param before: The readings before this date and time are about to expire.
+    :type before: datetime
+    :return: The number of daily buckets recomputed.
+    """
+    daily_model = ROLLUP_MODELS[model][-1]
+    bucket_seconds = bucket_start_seconds(model.timestamp, DAY_SECONDS).label('bucket_seconds')
+
+    days = db.session.execute(select(model.location_id, bucket_seconds, func.count(model.id)).where(
+        and_(location_filter(model, location_ids),
+             model.timestamp < before)).group_by(model.location_id, bucket_seconds)).all()
+
+    if not days:
+        return 0
+
+    first = bucket_seconds_to_datetime(min(seconds for location_id, seconds, count in days))
+    rolled_up = dict(((location_id, bucket), count) for location_id, bucket, count in db.session.execute(
+        select(daily_model.location_id, daily_model.bucket, daily_model.count).where(
+            and_(location_filter(daily_model, location_ids),
+                 daily_model.bucket >= first,
+                 daily_model.bucket < before))))
+
+    missing = []
+
+    for location_id, seconds, count in days:
+        bucket = bucket_seconds_to_datetime(seconds)
+
+        if rolled_up.get((location_id, bucket), 0) < count:
+            missing.append((location_id, bucket))
+
+    if missing:
+        recompute_rollups(model, missing, rollup_models=[daily_model])
+        db.session.commit()
+
+    return len(missing)
+
+
+def apply_retention(policies: dict, model, now: datetime = None, chunk_size: int = DELETE_CHUNK_SIZE,
+                    pause_seconds: float = 0) -> dict:
+    """
+    Downsample the expired raw readings of a metric into the daily rollups and delete them.
+
+    The readings are deleted in chunks of one transaction each, so no lock is held for long. The hourly
+    and daily rollups are kept.
+
+    :param policies: Days raw readings are kept, as {metric: {country: days}}.
+    :type policies: dict
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param now: The current date and time, by default now.
+    :type now: datetime
+    :param chunk_size: The readings deleted per transaction.
+    :type chunk_size: int
+    :param pause_seconds: The seconds to wait between chunks.
+    :type pause_seconds: float
+    :return: A dict with the number of daily buckets 'downsampled' and readings 'deleted'.
+    """
+    downsampled = 0
+    deleted = 0
+
+    for cutoff, location_ids in sorted(expiry_cutoffs(policies, model, now).items()):
+        downsampled += downsample_readings(model, location_ids, cutoff)
+        deleted += delete_readings_before(model, cutoff, chunk_size=chunk_size, location_ids=location_ids,
+                                          pause_seconds=pause_seconds)
+
+    log.info('Expired {deleted} {metric} readings.'.format(deleted=deleted, metric=model.__tablename__))
+
+    return {'downsampled': downsampled, 'deleted': deleted}
@@ -0,0 +1,263 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, and_, case, delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from api.weather_data_flaskapi.business.buckets import bucket_start_seconds, bucket_seconds_to_datetime, \
+    ceil_bucket, floor_bucket
+from api.weather_data_flaskapi.business.queries import location_filter
+from database import db
+from database.models import ROLLUP_MODELS, utc_timestamp
+from database.types import decoded, scaled_value
+
+log = logging.getLogger(__name__)
+
+# Rollup rows written by each multi-row INSERT of a rebuild
+REBUILD_CHUNK_SIZE = 1000
+
+
+def _bucket_key(rollup_model, location_id: int, timestamp) -> tuple:
+    return location_id, floor_bucket(utc_timestamp(timestamp), rollup_model.period_seconds)
+
+
+def _bucket_filter(rollup_model, location_id: int, bucket: datetime):
+    return and_(rollup_model.location_id == location_id,
+                rollup_model.bucket == bucket)
+
+
+def _increment_bucket(rollup_model, key: tuple, count: int, total: float, total_of_squares: float,
+                      minimum: float, maximum: float):
+    location_id, bucket = key
+
+    increment = update(rollup_model).where(
+        _bucket_filter(rollup_model, location_id, bucket)).values(
+        count=rollup_model.count + count,
+        total=rollup_model.total + total,
+        total_of_squares=rollup_model.total_of_squares + total_of_squares,
+        minimum=case((rollup_model.minimum > minimum, minimum), else_=rollup_model.minimum),
+        maximum=case((rollup_model.maximum < maximum, maximum), else_=rollup_model.maximum)).execution_options(
+        synchronize_session=False)
+
+    if db.session.execute(increment).rowcount > 0:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(rollup_model).values(location_id=location_id,
+                                                           bucket=bucket,
+                                                           count=count,
+                                                           total=total,
+                                                           total_of_squares=total_of_squares,
+                                                           minimum=minimum,
+                                                           maximum=maximum))
+    except IntegrityError:
+        # Another writer created the bucket first
+        db.session.execute(increment)
+
+
+def _stored_value(model, value) -> float:
+    # Sum the value as the DECIMAL column stores it, so the rollups match a rebuild
+    return scaled_value(value, model.value.type.scale) / model.value.type.multiplier
+
+
+def add_to_rollups(model, readings):
+    """
+    Add new readings to the rollups of their kind.
+
+    The readings are first summed per bucket so each bucket is written once.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param readings: The new readings, as ORM objects or dicts of column values.
+    :return: None
+    """
+    for rollup_model in ROLLUP_MODELS[model]:
+        sums = {}
+
+        for reading in readings:
+            if isinstance(reading, dict):
+                location_id, timestamp = reading['location_id'], reading['timestamp']
+                value = _stored_value(model, reading['value'])
+            else:
+                location_id, timestamp = reading.location_id, reading.timestamp
+                value = _stored_value(model, reading.value)
+
+            key = _bucket_key(rollup_model, location_id, timestamp)
+            count, total, total_of_squares, minimum, maximum = sums.get(key, (0, 0.0, 0.0, value, value))
+            sums[key] = (count + 1,
+                         total + value,
+                         total_of_squares + value * value,
+                         min(minimum, value),
+                         max(maximum, value))
+
+        for key, bucket_sums in sums.items():
+            _increment_bucket(rollup_model, key, *bucket_sums)
+
+
+def recompute_rollups(model, locations, rollup_models=None):
+    """
+    Recompute the rollup buckets holding changed or deleted readings from the readings themselves.
+
+    A minimum or maximum cannot be taken back out of a bucket, so the buckets are summed again. Each
+    covers only one location for one hour or day.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param locations: (location identifier, timestamp) tuples of the readings.
+    :param rollup_models: The rollup ORM classes to recompute, by default all of the kind.
+    :return: None
+    """
+    for rollup_model in rollup_models or ROLLUP_MODELS[model]:
+        period = timedelta(seconds=rollup_model.period_seconds)
+
+        for key in set(_bucket_key(rollup_model, *location) for location in locations):
+            location_id, bucket = key
+
+            count, total, total_of_squares, minimum, maximum = model.query.filter(
+                model.location_id == location_id).filter(
+                and_(model.timestamp >= bucket,
+                     model.timestamp < bucket + period)).with_entities(
+                func.count(model.value),
+                func.sum(decoded(model.value), type_=Float),
+                func.sum(decoded(model.value) * decoded(model.value), type_=Float),
+                func.min(model.value),
+                func.max(model.value)).one()
+
+            db.session.execute(delete(rollup_model).where(
+                _bucket_filter(rollup_model, location_id, bucket)).execution_options(
+                synchronize_session=False))
+
+            if count:
+                db.session.execute(insert(rollup_model).values(location_id=location_id,
+                                                               bucket=bucket,
+                                                               count=count,
+                                                               total=float(total),
+                                                               total_of_squares=float(total_of_squares),
+                                                               minimum=float(minimum),
+                                                               maximum=float(maximum)))
+
+
+def rebuild_rollups(model, start: datetime = None, end: datetime = None):
+    """
+    Rebuild the rollups of a kind of reading from the readings.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param start: Rebuild from the bucket holding this date and time, or from the first reading.
+    :type start: datetime
+    :param end: Rebuild up to the bucket holding this date and time, or to the last reading.
+    :type end: datetime
+    :return: The number of rollup rows written.
+    """
+    written = 0
+
+    for rollup_model in ROLLUP_MODELS[model]:
+        width = rollup_model.period_seconds
+        bucket_seconds = bucket_start_seconds(model.timestamp, width).label('bucket_seconds')
+
+        readings = model.query
+        rollups = delete(rollup_model).execution_options(synchronize_session=False)
+
+        if start is not None:
+            lower = floor_bucket(start, width)
+            readings = readings.filter(model.timestamp >= lower)
+            rollups = rollups.where(rollup_model.bucket >= lower)
+
+        if end is not None:
+            upper = ceil_bucket(end + timedelta(microseconds=1), width)
+            readings = readings.filter(model.timestamp < upper)
+            rollups = rollups.where(rollup_model.bucket < upper)
+
+        db.session.execute(rollups)
+
+        rows = readings.with_entities(
+            model.location_id,
+            bucket_seconds,
+            func.count(model.value),
+            func.sum(decoded(model.value), type_=Float),
+            func.sum(decoded(model.value) * decoded(model.value), type_=Float),
+            func.min(model.value),
+            func.max(model.value)).group_by(
+            model.location_id,
+            bucket_seconds).yield_per(REBUILD_CHUNK_SIZE)
+
+        chunk = []
+
+        for location_id, seconds, count, total, total_of_squares, minimum, maximum in rows:
+            chunk.append({'location_id': location_id,
+                          'bucket': bucket_seconds_to_datetime(seconds),
+                          'count': count,
+                          'total': float(total),
+                          'total_of_squares': float(total_of_squares),
+                          'minimum': float(minimum),
+                          'maximum': float(maximum)})
+
+            if len(chunk) == REBUILD_CHUNK_SIZE:
+                db.session.execute(insert(rollup_model).values(chunk))
+                written += len(chunk)
+                chunk = []
+
+        if chunk:
+            db.session.execute(insert(rollup_model).values(chunk))
+            written += len(chunk)
+
+        db.session.commit()
+
+        log.info('Rebuilt {table}.'.format(table=rollup_model.__tablename__))
+
+    return written
+
+
+def coarsest_rollup(model, width: int):
+    """
+    Find the coarsest rollup whose buckets exactly divide buckets of a width.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param width: The width of the requested buckets in seconds.
+    :type width: int
+    :return: The rollup ORM class, or None.
+    """
+    rollup_models = [rollup_model for rollup_model in ROLLUP_MODELS[model] if width % rollup_model.period_seconds == 0]
+
+    if not rollup_models:
+        return None
+
+    return max(rollup_models, key=lambda rollup_model: rollup_model.period_seconds)
+
+
+def query_rollup_buckets(rollup_model, location_ids: list, lower: datetime, upper: datetime, width: int) -> list:
+    """
+    Sum the rollup buckets of the stations of a city into buckets of a larger width.
+
+    :param rollup_model: The rollup ORM class.
+    :param location_ids: The identifiers of the locations.
+    :type location_ids: list
+    :param lower: The first rollup bucket.
+    :type lower: datetime
+    :param upper: The end of the last rollup bucket, exclusive.
+    :type upper: datetime
+    :param width: The width of the requested buckets in seconds.
+    :type width: int
+    :return: A list of (bucket seconds, count, sum, sum of squares, minimum, maximum) rows.
+    """
+    bucket_seconds = bucket_start_seconds(rollup_model.bucket, width).label('bucket_seconds')
+
+    return rollup_model.query.filter(
+        location_filter(rollup_model, location_ids)).filter(
+        and_(rollup_model.bucket >= lower,
+             rollup_model.bucket < upper)).with_entities(
+        bucket_seconds,
+        func.sum(rollup_model.count),
+        func.sum(rollup_model.total),
+        func.sum(rollup_model.total_of_squares),
+        func.min(rollup_model.minimum),
+        func.max(rollup_model.maximum)).group_by(bucket_seconds).all()
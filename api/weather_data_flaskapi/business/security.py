@@ -12,13 +12,20 @@
 import uuid
 from datetime import datetime
 
+from flask import request
 from flask_jwt import JWTError
-from passlib.hash import sha512_crypt
 from sqlalchemy import and_
 
+from api.weather_data_flaskapi.business.cache import TTLCache
+from api.weather_data_flaskapi.business.hashing import HashingBusyError, hash_password, verify_password
+from api.weather_data_flaskapi.business.logins import login_recorder
+from api.weather_data_flaskapi.business.throttling import allow_login
 from database import db
 from database.models import User
 
+# The users of recent tokens by user id; see set_identity_cache
+_caches = {'identity': TTLCache(max_entries=1024, ttl_seconds=60)}
+
 
 class PasswordException(Exception):
     """
@@ -35,6 +42,33 @@ class PasswordException(Exception):
         self.message = message
 
 
+def set_identity_cache(cache):
+    """
+    Set the cache of the users of recent tokens.
+
+    Changes made through this module remove the user at once; the TTL bounds how long another process's
+    change goes unnoticed.
+
+    :param cache: A TTLCache, or None to look the user up on every request.
+    :return: None
+    """
+    _caches['identity'] = cache
+
+
+def forget_identity(user_id: int):
+    """
+    Remove a user from the identity cache after a change.
+
+    :param user_id: The user's identifier.
+    :type user_id: int
+    :return: None
+    """
+    cache = _caches['identity']
+
+    if cache is not None:
+        cache.delete(user_id)
+
+
 def salt_password(password, salt):
     return '%s%s' % (password, salt)
 
@@ -49,16 +83,27 @@ def authenticate(username: str, password: str):
     :type password: str
     :return: A User object on success, else None.
     """
+    if not allow_login(username, request.remote_addr):
+        raise JWTError(error='Too many requests', description='Too many login attempts', status_code=429)
+
     try:
         user = User.query.filter(and_(User.username == username, User.enabled == 1)).one()
 
-        if user.enabled and sha512_crypt.verify(
+        if user.enabled and verify_password(
                 salt_password(password, user.salt),
                 user.password):
-            update_last_login_date(username=username)
+            recorder = login_recorder()
+
+            if recorder is not None:
+                recorder.record(user.id)
+            else:
+                update_last_login_date(username=username)
+
             return user
         else:
             return None
+    except HashingBusyError:
+        raise JWTError(error='Service unavailable', description='Too many logins in progress', status_code=503)
     except Exception as exception:
         raise JWTError(error='Invalid credential', description='Stop hacking', status_code=401)
 
@@ -91,7 +136,7 @@ def create_user(data):
 
     if username_is_available(username):
         salt = str(uuid.uuid4())
-        encrypted_password = sha512_crypt.hash(salt_password(password, salt))
+        encrypted_password = hash_password(salt_password(password, salt))
 
         user = User(username=username,
                     password=encrypted_password,
@@ -112,9 +157,13 @@ def delete_user(username: str):
     :return: None
     """
     user = User.query.filter(User.username == username).one()
+    user_id = user.id
+
     db.session.delete(user)
     db.session.commit()
 
+    forget_identity(user_id)
+
 
 def disable_user(username: str) -> User:
     """
@@ -129,6 +178,8 @@ def disable_user(username: str) -> User:
     db.session.add(user)
     db.session.commit()
 
+    forget_identity(user.id)
+
     return user
 
 
@@ -145,6 +196,8 @@ def enable_user(username: str) -> User:
     db.session.add(user)
     db.session.commit()
 
+    forget_identity(user.id)
+
     return user
 
 
@@ -181,17 +234,40 @@ def update_password(username: str, password: str, new_password: str, salt: str)
     """
     user = User.query.filter(User.username == username).one()
 
-    if sha512_crypt.verify(salt_password(password, salt), user.password):
-        user.password = sha512_crypt.hash(salt_password(new_password, salt))
+    if verify_password(salt_password(password, salt), user.password):
+        user.password = hash_password(salt_password(new_password, salt))
         db.session.add(user)
         db.session.commit()
 
+        forget_identity(user.id)
+
         return user
     else:
         raise PasswordException(message='Current password is not correct.')
 
 
 def identity(payload):
+    """
+    Find the user of a JSON Web Token.
+
+    The user is cached by id, detached from the session, for the TTL of the identity cache.
+
+    :param payload: The decoded token.
+    :return: The User, or None when the user is disabled.
+    """
     user_id = payload['identity']
-    user = User.query.filter(User.id == user_id).one()
+    cache = _caches['identity']
+    user = cache.get(user_id) if cache is not None else None
+
+    if user is None:
+        user = User.query.filter(User.id == user_id).one()
+
+        if cache is not None:
+            # A later commit in the request must not expire the cached copy
+            db.session.expunge(user)
+            cache.set(user_id, user)
+
+    if not user.enabled:
+        return None
+
     return user
@@ -0,0 +1,287 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import logging
+import math
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from database import db
+from database.geohash import GEOHASH_PRECISION, RANGE_END, cell_geohash, cell_indexes, cell_number, encode
+
+log = logging.getLogger(__name__)
+
+# The mean radius of the Earth
+EARTH_RADIUS_KM = 6371.0088
+
+# The largest radius of a near query
+MAX_RADIUS_KM = 1000.0
+
+# The most geohash cells covering the box of a query; adjacent cells are merged into one range
+MAX_AREA_CELLS = 32
+
+# Readings given a geohash per transaction by backfill_geohashes
+GEOHASH_CHUNK_SIZE = 5000
+
+
+class AreaValueError(ValueError):
+    """
+    Exception on a bounding box or a point and radius that cannot be queried.
+    """
+    pass
+
+
+def covering_ranges(box: tuple, max_cells: int = MAX_AREA_CELLS) -> list:
+    """
+    Find the geohash ranges covering a box, with cells as small as allows at most max_cells of them.
+
+    :param box: A (minimum latitude, minimum longitude, maximum latitude, maximum longitude) tuple.
+    :type box: tuple
+    :param max_cells: The most cells to cover the box with.
+    :type max_cells: int
+    :return: A list of (lower, upper) geohash ranges, upper excluded.
+    """
+    min_latitude, min_longitude, max_latitude, max_longitude = box
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        west, south = cell_indexes(min_latitude, min_longitude, precision)
+        east, north = cell_indexes(max_latitude, max_longitude, precision)
+
+        if (east - west + 1) * (north - south + 1) <= max_cells:
+            break
+
+    numbers = sorted(cell_number(column, row, precision)
+                     for column in range(west, east + 1) for row in range(south, north + 1))
+    runs = []
+
+    for number in numbers:
+        if runs and runs[-1][1] == number - 1:
+            runs[-1][1] = number
+        else:
+            runs.append([number, number])
+
+    return [(cell_geohash(first, precision), cell_geohash(last, precision) + RANGE_END) for first, last in runs]
+
+
+class Area(object):
+    """
+    The readings of a query by place rather than by city: inside a bounding box, or within a radius of
+    a point. Boxes crossing the antimeridian are split in two.
+
+    The public coordinates of the readings are matched, as published to the clients.
+    """
+
+    def __init__(self, boxes: list, center: tuple = None, radius_km: float = None):
+        """
+        Area constructor.
+
+        :param boxes: A list of (minimum latitude, minimum longitude, maximum latitude, maximum longitude) tuples.
+        :type boxes: list
+        :param center: The (latitude, longitude) of the point of a near query.
+        :type center: tuple
+        :param radius_km: The radius of a near query in kilometres.
+        :type radius_km: float
+        """
+        self.boxes = boxes
+        self.center = center
+        self.radius_km = radius_km
+
+    def mask(self, latitudes, longitudes):
+        """
+        Tell which points are in the area.
+
+        :param latitudes: The latitudes of the points.
+        :param longitudes: The longitudes of the points.
+        :return: A numpy array of booleans.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        inside = np.zeros(len(latitudes), dtype=bool)
+
+        for min_latitude, min_longitude, max_latitude, max_longitude in self.boxes:
+            inside |= (latitudes >= min_latitude) & (latitudes <= max_latitude) & \
+                (longitudes >= min_longitude) & (longitudes <= max_longitude)
+
+        if self.radius_km is not None:
+            inside &= distances_km(self.center[0], self.center[1], latitudes, longitudes) <= self.radius_km
+
+        return inside
+
+    def filter_rows(self, rows) -> list:
+        """
+        Keep the reading rows whose public coordinates are in the area.
+
+        The boxes are matched by the query already, so only a near query drops rows here.
+
+        :param rows: Rows with latitude_public and longitude_public fields.
+        :return: list
+        """
+        rows = list(rows)
+
+        if self.radius_km is None or not rows:
+            return rows
+
+        mask = self.mask([row.latitude_public for row in rows], [row.longitude_public for row in rows])
+        return [row for row, inside in zip(rows, mask.tolist()) if inside]
+
+
+def distances_km(latitude: float, longitude: float, latitudes, longitudes):
+    """
+    Compute the great circle distances from a point to other points.
+
+    :param latitude: The latitude of the point.
+    :type latitude: float
+    :param longitude: The longitude of the point.
+    :type longitude: float
+    :param latitudes: The latitudes of the other points.
+    :param longitudes: The longitudes of the other points.
+    :return: A numpy array of kilometres.
+    """
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+
+    haversine = np.sin((latitudes - latitude) / 2) ** 2 + \
+        math.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(haversine, 1.0)))
+
+
+def _longitude_boxes(min_latitude: float, max_latitude: float, west: float, east: float) -> list:
+    if west <= east:
+        return [(min_latitude, west, max_latitude, east)]
+
+    return [(min_latitude, west, max_latitude, 180.0), (min_latitude, -180.0, max_latitude, east)]
+
+
+def _numbers(text: str, count: int, name: str) -> list:
+    try:
+        numbers = [float(number) for number in text.split(',')]
+    except ValueError:
+        numbers = []
+
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise AreaValueError('{name} must be {count} comma separated numbers'.format(name=name, count=count))
+
+    return numbers
+
+
+def _check_point(latitude: float, longitude: float, name: str):
+    if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+        raise AreaValueError('{name} latitudes must be within -90 to 90 and longitudes within -180 to 180'.format(
+            name=name))
+
+
+def bounding_box(text: str) -> Area:
+    """
+    Parse a bounding box.
+
+    :param text: 'minimum latitude,minimum longitude,maximum latitude,maximum longitude'; a minimum longitude
+        east of the maximum crosses the antimeridian.
+    :type text: str
+    :return: Area
+    """
+    min_latitude, min_longitude, max_latitude, max_longitude = _numbers(text, 4, 'bbox')
+    _check_point(min_latitude, min_longitude, 'bbox')
+    _check_point(max_latitude, max_longitude, 'bbox')
+
+    if min_latitude > max_latitude:
+        raise AreaValueError('bbox minimum latitude must not be north of its maximum latitude')
+
+    return Area(_longitude_boxes(min_latitude, max_latitude, min_longitude, max_longitude))
+
+
+def near(text: str, radius_km: float) -> Area:
+    """
+    Parse a point and radius.
+
+    :param text: 'latitude,longitude'.
+    :type text: str
+    :param radius_km: The radius in kilometres.
+    :type radius_km: float
+    :return: Area
+    """
+    latitude, longitude = _numbers(text, 2, 'near')
+    _check_point(latitude, longitude, 'near')
+
+    if radius_km is None or not 0 < radius_km <= MAX_RADIUS_KM:
+        raise AreaValueError('radius_km must be over 0 and at most {maximum:g}'.format(maximum=MAX_RADIUS_KM))
+
+    angle = radius_km / EARTH_RADIUS_KM
+    min_latitude = max(latitude - math.degrees(angle), -90.0)
+    max_latitude = min(latitude + math.degrees(angle), 90.0)
+    spread = math.sin(angle) / math.cos(math.radians(latitude)) if abs(latitude) < 90.0 else 2.0
+
+    # A circle holding a pole holds every longitude
+    if min_latitude == -90.0 or max_latitude == 90.0 or spread >= 1.0:
+        boxes = [(min_latitude, -180.0, max_latitude, 180.0)]
+    else:
+        delta = math.degrees(math.asin(spread))
+        west, east = longitude - delta, longitude + delta
+        boxes = _longitude_boxes(min_latitude, max_latitude,
+                                 west + 360.0 if west < -180.0 else west,
+                                 east - 360.0 if east > 180.0 else east)
+
+    return Area(boxes, center=(latitude, longitude), radius_km=radius_km)
+
+
+def parse_area(bbox: str = None, near_point: str = None, radius_km: float = None):
+    """
+    Parse the area arguments of a collection request.
+
+    :param bbox: A bounding box, see bounding_box.
+    :type bbox: str
+    :param near_point: A point, see near.
+    :type near_point: str
+    :param radius_km: The radius around the point in kilometres.
+    :type radius_km: float
+    :return: An Area, or None when neither bbox nor near is given.
+    """
+    if bbox is not None and near_point is not None:
+        raise AreaValueError('pass either bbox or near, not both')
+
+    if bbox is not None:
+        return bounding_box(bbox)
+
+    if near_point is not None:
+        return near(near_point, radius_km)
+
+    return None
+
+
+def backfill_geohashes(model, chunk_size: int = GEOHASH_CHUNK_SIZE) -> int:
+    """
+    Compute the geohash of the readings stored without one, a chunk per transaction.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param chunk_size: The readings updated per transaction.
+    :type chunk_size: int
+    :return: The number of readings updated.
+    """
+    table = model.__table__
+    statement = update(table).where(table.c.id == bindparam('reading_id')).values(geohash=bindparam('reading_geohash'))
+    updated = 0
+
+    while True:
+        rows = db.session.execute(select(table.c.id, table.c.latitude_public, table.c.longitude_public).where(
+            table.c.geohash.is_(None)).order_by(table.c.id).limit(chunk_size)).all()
+
+        if not rows:
+            break
+
+        db.session.execute(statement, [{'reading_id': reading_id, 'reading_geohash': encode(latitude, longitude)}
+                                       for reading_id, latitude, longitude in rows])
+        db.session.commit()
+        updated += len(rows)
+
+    log.info('Computed the geohash of {count} {metric} readings.'.format(count=updated, metric=model.__tablename__))
+
+    return updated
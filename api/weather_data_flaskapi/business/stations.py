@@ -0,0 +1,232 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import and_, func, select, union_all
+
+from api.weather_data_flaskapi.business.archive import reading_archive
+from api.weather_data_flaskapi.business.queries import reading_rows_select
+from api.weather_data_flaskapi.business.spatial import distances_km
+from database import db
+
+# The stations tried, nearest first, until one has a reading
+NEAREST_CANDIDATES = 8
+
+# The station indexes of the application by metric; see set_station_indexes
+_station_indexes = {}
+
+
+class StationIndex(object):
+    """
+    The public positions of the stations of a metric, kept in memory for nearest station lookups.
+
+    The first refresh, at startup, reads every distinct (location, public latitude, public longitude) of the
+    table; lookups then only read the readings written since, at most every refresh_seconds, so readings
+    written by other processes are seen too. Readings created or moved by this process are added at once;
+    a reading moved by another process is only seen after a restart. A position whose readings were
+    deleted stays until the process restarts; a lookup skips it.
+    """
+
+    def __init__(self, model, refresh_seconds: float):
+        """
+        StationIndex constructor.
+
+        :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+        :param refresh_seconds: The most seconds a lookup uses the index without reading the new readings.
+        :type refresh_seconds: float
+        """
+        self.model = model
+        self.refresh_seconds = refresh_seconds
+        self._positions = set()
+        self._location_ids = np.empty(0, dtype=np.int64)
+        self._coordinates = np.empty((0, 2), dtype=np.float64)
+        self._changed = False
+        self._last_id = None
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def add(self, positions):
+        """
+        Add station positions.
+
+        :param positions: (location identifier, public latitude, public longitude) tuples.
+        :return: None
+        """
+        with self._lock:
+            # Until the first refresh reads the table there is nothing to add to
+            if self._last_id is None:
+                return
+
+            self._add(positions)
+
+    def _add(self, positions):
+        positions = set((int(location_id), float(latitude), float(longitude))
+                        for location_id, latitude, longitude in positions)
+
+        if not positions.issubset(self._positions):
+            self._positions.update(positions)
+            self._changed = True
+
+    def refresh(self):
+        """
+        Read the station positions of the readings written since the last refresh.
+
+        :return: None
+        """
+        table = self.model.__table__
+
+        with self._lock:
+            statement = select(table.c.location_id, table.c.latitude_public, table.c.longitude_public,
+                               func.max(table.c.id)).group_by(table.c.location_id, table.c.latitude_public,
+                                                              table.c.longitude_public)
+
+            if self._last_id is not None:
+                statement = statement.where(table.c.id > self._last_id)
+
+            rows = db.session.execute(statement).all()
+            self._add((location_id, latitude, longitude) for location_id, latitude, longitude, last_id in rows)
+            self._last_id = max([self._last_id or 0] + [last_id for location_id, latitude, longitude, last_id in rows])
+            self._refreshed = time.monotonic()
+
+    def nearest(self, latitude: float, longitude: float, count: int = NEAREST_CANDIDATES) -> list:
+        """
+        Find the stations nearest to a point.
+
+        :param latitude: The latitude of the point.
+        :type latitude: float
+        :param longitude: The longitude of the point.
+        :type longitude: float
+        :param count: The most stations to return.
+        :type count: int
+        :return: A list of (location identifier, public latitude, public longitude, distance in km) tuples,
+            nearest first.
+        """
+        if self._refreshed is None or time.monotonic() - self._refreshed >= self.refresh_seconds:
+            self.refresh()
+
+        with self._lock:
+            if self._changed:
+                positions = sorted(self._positions)
+                self._location_ids = np.array([position[0] for position in positions], dtype=np.int64)
+                self._coordinates = np.array([position[1:] for position in positions], dtype=np.float64).reshape(-1, 2)
+                self._changed = False
+
+            location_ids, coordinates = self._location_ids, self._coordinates
+
+        if not len(location_ids):
+            return []
+
+        distances = distances_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+        count = min(count, len(distances))
+        nearest = np.argpartition(distances, count - 1)[:count]
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+
+        return [(int(location_ids[index]), float(coordinates[index, 0]), float(coordinates[index, 1]),
+                 float(distances[index])) for index in nearest.tolist()]
+
+
+def set_station_indexes(app, models, refresh_seconds: float):
+    """
+    Set up the station index of each metric and read the station positions, so the first nearest station
+    lookup does not wait for the scan of a readings table.
+
+    :param app: The Flask application, for the database connection.
+    :param models: The ORM classes of the readings.
+    :param refresh_seconds: The most seconds a lookup uses an index without reading the new readings.
+    :type refresh_seconds: float
+    :return: None
+    """
+    _station_indexes.clear()
+
+    with app.app_context():
+        for model in models:
+            index = StationIndex(model, refresh_seconds)
+            index.refresh()
+            _station_indexes[model.__tablename__] = index
+
+
+def station_index(model):
+    """
+    Get the station index of a metric.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :return: The StationIndex, or None.
+    """
+    return _station_indexes.get(model.__tablename__)
+
+
+def note_stations(model, positions):
+    """
+    Add the positions of readings just created to the station index of their metric.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param positions: (location identifier, public latitude, public longitude) tuples.
+    :return: None
+    """
+    index = station_index(model)
+
+    if index is not None:
+        index.add(positions)
+
+
+def _closest_in_table(model, location_id: int, latitude: float, longitude: float, at: datetime) -> list:
+    table = model.__table__
+    station = and_(table.c.location_id == location_id,
+                   table.c.latitude_public == latitude,
+                   table.c.longitude_public == longitude)
+
+    # The last reading at or before the time and the first after it, in one round trip
+    before = reading_rows_select(model).where(station, table.c.timestamp <= at).order_by(
+        table.c.timestamp.desc(), table.c.id.desc()).limit(1).subquery()
+    after = reading_rows_select(model).where(station, table.c.timestamp > at).order_by(
+        table.c.timestamp, table.c.id).limit(1).subquery()
+
+    return db.session.execute(union_all(select(before), select(after))).all()
+
+
+def _closest_in_archive(model, location_id: int, latitude: float, longitude: float, at: datetime) -> list:
+    archive = reading_archive()
+
+    if archive is None:
+        return []
+
+    return [row for row in archive.closest(model, location_id, at)
+            if row.latitude_public == latitude and row.longitude_public == longitude]
+
+
+def nearest_reading(model, latitude: float, longitude: float, at: datetime):
+    """
+    Find the reading closest in time to a date of the station nearest to a point.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param latitude: The latitude of the point.
+    :type latitude: float
+    :param longitude: The longitude of the point.
+    :type longitude: float
+    :param at: The date and time.
+    :type at: datetime
+    :return: A (reading row, distance in km) tuple, or None when no station has a reading.
+    """
+    stations = station_index(model).nearest(latitude, longitude)
+
+    for location_id, station_latitude, station_longitude, distance in stations:
+        rows = _closest_in_table(model, location_id, station_latitude, station_longitude, at) + \
+            _closest_in_archive(model, location_id, station_latitude, station_longitude, at)
+
+        if rows:
+            closest = min(rows, key=lambda row: (abs((row.timestamp - at).total_seconds()), row.timestamp, row.id))
+            return closest, distance
+
+    return None
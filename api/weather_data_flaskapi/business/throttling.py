@@ -0,0 +1,100 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# The login throttles of the application; see set_login_throttles
+_throttles = {'username': None, 'address': None}
+
+
+class TokenBucket(object):
+    """
+    Token buckets per key: each key may spend a burst of attempts, refilled at a steady rate.
+
+    The least recently used keys are forgotten beyond max_keys; a forgotten key starts with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        """
+        TokenBucket constructor.
+
+        :param rate: The attempts added to a bucket per second.
+        :type rate: float
+        :param burst: The most attempts a bucket holds.
+        :type burst: int
+        :param max_keys: The most keys remembered.
+        :type max_keys: int
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key) -> bool:
+        """
+        Spend an attempt of a key.
+
+        :param key: The key, e.g. a username or an IP address.
+        :return: True if the key had an attempt left, else False.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1.0
+
+            if allowed:
+                tokens -= 1.0
+
+            self._buckets[key] = (tokens, now)
+
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+            return allowed
+
+
+def set_login_throttles(username, address):
+    """
+    Set the throttles of login attempts.
+
+    :param username: The TokenBucket of attempts per username, or None.
+    :param address: The TokenBucket of attempts per client IP address, or None.
+    :return: None
+    """
+    _throttles['username'] = username
+    _throttles['address'] = address
+
+
+def allow_login(username: str, address: str) -> bool:
+    """
+    Spend a login attempt of a username and a client address.
+
+    :param username: The username tried.
+    :type username: str
+    :param address: The client IP address.
+    :type address: str
+    :return: True if both had an attempt left, else False.
+    """
+    allowed = True
+
+    # Both buckets are charged, so a client cannot dodge its address limit by cycling usernames
+    if _throttles['address'] is not None and address is not None:
+        allowed = _throttles['address'].allow(address) and allowed
+
+    if _throttles['username'] is not None:
+        allowed = _throttles['username'].allow(username) and allowed
+
+    return allowed
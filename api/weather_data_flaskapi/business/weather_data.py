@@ -9,14 +9,79 @@
 @deffield    updated: 2017-06-14
 """
 
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from api.weather_data_flaskapi.business.cache import invalidate_readings
+from api.weather_data_flaskapi.business.locations import get_or_create_location, location_key, touch_locations
+from api.weather_data_flaskapi.business.rollups import add_to_rollups, recompute_rollups
+from api.weather_data_flaskapi.business.stations import note_stations
 from database import db
-from database.models import Humidity, Pressure, Temperature
+from database.geohash import encode as encode_geohash
+from database.model_exceptions import ReadingValueError
+from database.models import Humidity, Pressure, Temperature, public_coordinate, utc_timestamp, validate_coordinates
+
+log = logging.getLogger(__name__)
+
+# Readings inserted by each multi-row INSERT of a batch
+BATCH_CHUNK_SIZE = 500
+
+# The most readings accepted in one batch
+BATCH_MAX_READINGS = 10000
+
+REQUIRED_READING_FIELDS = ('value', 'value_units', 'latitude', 'longitude', 'city', 'province', 'country',
+                           'elevation', 'elevation_units', 'timestamp')
+
+# The column lengths of the text fields of a reading
+READING_FIELD_LENGTHS = {'value_units': 16, 'city': 64, 'province': 2, 'country': 2, 'elevation_units': 16}
+
+
+def _stored_reading(model, reading_key: str):
+    return model.query.filter(model.reading_key == reading_key).one_or_none()
+
+
+def _add_reading(reading) -> tuple:
+    """
+    Add a new reading to the session, unless a reading with its reading key is already stored.
+
+    :param reading: The new Humidity, Pressure or Temperature.
+    :return: A (reading, created) tuple with the stored reading when it was not created.
+    """
+    if reading.reading_key is None:
+        db.session.add(reading)
+        db.session.flush()
+        return reading, True
+
+    stored = _stored_reading(type(reading), reading.reading_key)
+
+    if stored is not None:
+        return stored, False
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(reading)
+    except IntegrityError:
+        # A retry of the same reading was stored first
+        stored = _stored_reading(type(reading), reading.reading_key)
+
+        if stored is None:
+            raise
+
+        return stored, False
+
+    return reading, True
 
 
 def create_humidity(data) -> Humidity:
     """
     Creates a new humidity record in the database.
 
+    A reading sent again with the reading key of a stored reading is not stored twice; the stored reading is
+    returned.
+
     :param data: JSON data for a new Humidity object.
     :return: Humidity
     """
@@ -31,22 +96,32 @@ def create_humidity(data) -> Humidity:
     elevation = data.get('elevation')
     elevation_units = data.get('elevation_units')
     timestamp = data.get('timestamp')
+    reading_key = data.get('reading_key')
+
+    location = get_or_create_location(city, province, country, elevation, elevation_units)
 
     humidity = Humidity(value=value,
                         value_units=value_units,
                         value_error_range=value_error_range,
                         latitude=latitude,
                         longitude=longitude,
-                        city=city,
-                        province=province,
-                        country=country,
-                        elevation=elevation,
-                        elevation_units=elevation_units,
-                        timestamp=timestamp)
+                        location=location,
+                        timestamp=timestamp,
+                        reading_key=reading_key)
 
-    db.session.add(humidity)
+    humidity, created = _add_reading(humidity)
+
+    if not created:
+        db.session.commit()
+        return humidity
+
+    add_to_rollups(Humidity, [humidity])
+    touch_locations([location.id])
     db.session.commit()
 
+    invalidate_readings('humidity', [(city, province, country, timestamp)])
+    note_stations(Humidity, [(location.id, humidity.latitude_public, humidity.longitude_public)])
+
     return humidity
 
 
@@ -59,23 +134,34 @@ def update_humidity(humidity_id: int, data) -> Humidity:
     :return: Humidity
     """
     humidity = Humidity.query.filter(Humidity.id == humidity_id).one()
+    previous_location = (humidity.location_id, humidity.timestamp)
+    previous_reading = (humidity.city, humidity.province, humidity.country, humidity.timestamp)
+
     humidity.value = data.get('value')
     humidity.value_units = data.get('value_units')
     humidity.value_error_range = data.get('value_error_range')
     humidity.latitude = data.get('latitude')
-    humidity.latitude_public_public = float(int(humidity.latitude * 1000)) / 1000
+    humidity.latitude_public = public_coordinate(humidity.latitude)
     humidity.longitude = data.get('longitude')
-    humidity.longitude_public = float(int(humidity.longitude * 1000)) / 1000
-    humidity.city = data.get('city')
-    humidity.province = data.get('province')
-    humidity.country = data.get('country')
-    humidity.elevation = data.get('elevation')
-    humidity.elevation_units = data.get('elevation_units')
+    humidity.longitude_public = public_coordinate(humidity.longitude)
+    humidity.geohash = encode_geohash(humidity.latitude_public, humidity.longitude_public)
+    humidity.location = get_or_create_location(data.get('city'),
+                                               data.get('province'),
+                                               data.get('country'),
+                                               data.get('elevation'),
+                                               data.get('elevation_units'))
     humidity.timestamp = data.get('timestamp')
 
     db.session.add(humidity)
+    db.session.flush()
+    recompute_rollups(Humidity, [previous_location, (humidity.location_id, humidity.timestamp)])
+    touch_locations([previous_location[0], humidity.location_id])
+    current_reading = (humidity.city, humidity.province, humidity.country, humidity.timestamp)
     db.session.commit()
 
+    invalidate_readings('humidity', [previous_reading, current_reading])
+    note_stations(Humidity, [(humidity.location_id, humidity.latitude_public, humidity.longitude_public)])
+
     return humidity
 
 
@@ -87,14 +173,25 @@ def delete_humidity(humidity_id: int):
     :return: None
     """
     humidity = Humidity.query.filter(Humidity.id == humidity_id).one()
+    location = (humidity.location_id, humidity.timestamp)
+    reading = (humidity.city, humidity.province, humidity.country, humidity.timestamp)
+
     db.session.delete(humidity)
+    db.session.flush()
+    recompute_rollups(Humidity, [location])
+    touch_locations([location[0]])
     db.session.commit()
 
+    invalidate_readings('humidity', [reading])
+
 
 def create_pressure(data) -> Pressure:
     """
     Creates a new pressure record in the database.
 
+    A reading sent again with the reading key of a stored reading is not stored twice; the stored reading is
+    returned.
+
     :param data: JSON data for a new Pressure object.
     :return: Pressure
     """
@@ -109,22 +206,32 @@ def create_pressure(data) -> Pressure:
     elevation = data.get('elevation')
     elevation_units = data.get('elevation_units')
     timestamp = data.get('timestamp')
+    reading_key = data.get('reading_key')
+
+    location = get_or_create_location(city, province, country, elevation, elevation_units)
 
     pressure = Pressure(value=value,
                         value_units=value_units,
                         value_error_range=value_error_range,
                         latitude=latitude,
                         longitude=longitude,
-                        city=city,
-                        province=province,
-                        country=country,
-                        elevation=elevation,
-                        elevation_units=elevation_units,
-                        timestamp=timestamp)
+                        location=location,
+                        timestamp=timestamp,
+                        reading_key=reading_key)
 
-    db.session.add(pressure)
+    pressure, created = _add_reading(pressure)
+
+    if not created:
+        db.session.commit()
+        return pressure
+
+    add_to_rollups(Pressure, [pressure])
+    touch_locations([location.id])
     db.session.commit()
 
+    invalidate_readings('pressure', [(city, province, country, timestamp)])
+    note_stations(Pressure, [(location.id, pressure.latitude_public, pressure.longitude_public)])
+
     return pressure
 
 
@@ -137,23 +244,34 @@ def update_pressure(pressure_id: int, data) -> Pressure:
     :return: Pressure
     """
     pressure = Pressure.query.filter(Pressure.id == pressure_id).one()
+    previous_location = (pressure.location_id, pressure.timestamp)
+    previous_reading = (pressure.city, pressure.province, pressure.country, pressure.timestamp)
+
     pressure.value = data.get('value')
     pressure.value_units = data.get('value_units')
     pressure.value_error_range = data.get('value_error_range')
     pressure.latitude = data.get('latitude')
-    pressure.latitude_public_public = float(int(pressure.latitude * 1000)) / 1000
+    pressure.latitude_public = public_coordinate(pressure.latitude)
     pressure.longitude = data.get('longitude')
-    pressure.longitude_public = float(int(pressure.longitude * 1000)) / 1000
-    pressure.city = data.get('city')
-    pressure.province = data.get('province')
-    pressure.country = data.get('country')
-    pressure.elevation = data.get('elevation')
-    pressure.elevation_units = data.get('elevation_units')
+    pressure.longitude_public = public_coordinate(pressure.longitude)
+    pressure.geohash = encode_geohash(pressure.latitude_public, pressure.longitude_public)
+    pressure.location = get_or_create_location(data.get('city'),
+                                               data.get('province'),
+                                               data.get('country'),
+                                               data.get('elevation'),
+                                               data.get('elevation_units'))
     pressure.timestamp = data.get('timestamp')
 
     db.session.add(pressure)
+    db.session.flush()
+    recompute_rollups(Pressure, [previous_location, (pressure.location_id, pressure.timestamp)])
+    touch_locations([previous_location[0], pressure.location_id])
+    current_reading = (pressure.city, pressure.province, pressure.country, pressure.timestamp)
     db.session.commit()
 
+    invalidate_readings('pressure', [previous_reading, current_reading])
+    note_stations(Pressure, [(pressure.location_id, pressure.latitude_public, pressure.longitude_public)])
+
     return pressure
 
 
@@ -165,14 +283,25 @@ def delete_pressure(pressure_id: int):
     :return: None
     """
     pressure = Pressure.query.filter(Pressure.id == pressure_id).one()
+    location = (pressure.location_id, pressure.timestamp)
+    reading = (pressure.city, pressure.province, pressure.country, pressure.timestamp)
+
     db.session.delete(pressure)
+    db.session.flush()
+    recompute_rollups(Pressure, [location])
+    touch_locations([location[0]])
     db.session.commit()
 
+    invalidate_readings('pressure', [reading])
+
 
 def create_temperature(data) -> Temperature:
     """
     Creates a new temperature record in the database.
 
+    A reading sent again with the reading key of a stored reading is not stored twice; the stored reading is
+    returned.
+
     :param data: JSON data for a new Temperature object.
     :return: Temperature
     """
@@ -187,22 +316,32 @@ def create_temperature(data) -> Temperature:
     elevation = data.get('elevation')
     elevation_units = data.get('elevation_units')
     timestamp = data.get('timestamp')
+    reading_key = data.get('reading_key')
+
+    location = get_or_create_location(city, province, country, elevation, elevation_units)
 
     temperature = Temperature(value=value,
                               value_units=value_units,
                               value_error_range=value_error_range,
                               latitude=latitude,
                               longitude=longitude,
-                              city=city,
-                              province=province,
-                              country=country,
-                              elevation=elevation,
-                              elevation_units=elevation_units,
-                              timestamp=timestamp)
+                              location=location,
+                              timestamp=timestamp,
+                              reading_key=reading_key)
 
-    db.session.add(temperature)
+    temperature, created = _add_reading(temperature)
+
+    if not created:
+        db.session.commit()
+        return temperature
+
+    add_to_rollups(Temperature, [temperature])
+    touch_locations([location.id])
     db.session.commit()
 
+    invalidate_readings('temperature', [(city, province, country, timestamp)])
+    note_stations(Temperature, [(location.id, temperature.latitude_public, temperature.longitude_public)])
+
     return temperature
 
 
@@ -215,23 +354,34 @@ def update_temperature(temperature_id: int, data) -> Temperature:
     :return: Temperature
     """
     temperature = Temperature.query.filter(Temperature.id == temperature_id).one()
+    previous_location = (temperature.location_id, temperature.timestamp)
+    previous_reading = (temperature.city, temperature.province, temperature.country, temperature.timestamp)
+
     temperature.value = data.get('value')
     temperature.value_units = data.get('value_units')
     temperature.value_error_range = data.get('value_error_range')
     temperature.latitude = data.get('latitude')
-    temperature.latitude_public_public = float(int(temperature.latitude * 1000)) / 1000
+    temperature.latitude_public = public_coordinate(temperature.latitude)
     temperature.longitude = data.get('longitude')
-    temperature.longitude_public = float(int(temperature.longitude * 1000)) / 1000
-    temperature.city = data.get('city')
-    temperature.province = data.get('province')
-    temperature.country = data.get('country')
+    temperature.longitude_public = public_coordinate(temperature.longitude)
+    temperature.geohash = encode_geohash(temperature.latitude_public, temperature.longitude_public)
+    temperature.location = get_or_create_location(data.get('city'),
+                                                  data.get('province'),
+                                                  data.get('country'),
+                                                  data.get('elevation'),
+                                                  data.get('elevation_units'))
     temperature.timestamp = data.get('timestamp')
-    temperature.elevation = data.get('elevation')
-    temperature.elevation_units = data.get('elevation_units')
 
     db.session.add(temperature)
+    db.session.flush()
+    recompute_rollups(Temperature, [previous_location, (temperature.location_id, temperature.timestamp)])
+    touch_locations([previous_location[0], temperature.location_id])
+    current_reading = (temperature.city, temperature.province, temperature.country, temperature.timestamp)
     db.session.commit()
 
+    invalidate_readings('temperature', [previous_reading, current_reading])
+    note_stations(Temperature, [(temperature.location_id, temperature.latitude_public, temperature.longitude_public)])
+
     return temperature
 
 
@@ -243,5 +393,276 @@ def delete_temperature(temperature_id: int):
     :return: None
     """
     temperature = Temperature.query.filter(Temperature.id == temperature_id).one()
+    location = (temperature.location_id, temperature.timestamp)
+    reading = (temperature.city, temperature.province, temperature.country, temperature.timestamp)
+
     db.session.delete(temperature)
+    db.session.flush()
+    recompute_rollups(Temperature, [location])
+    touch_locations([location[0]])
+    db.session.commit()
+
+    invalidate_readings('temperature', [reading])
+
+
+def reading_row(data) -> dict:
+    """
+    Validate JSON data for a reading and convert it to a row for a reading table.
+
+    The location fields are returned as the 'location' key, to be replaced by the location identifier.
+
+    :param data: JSON data for a reading.
+    :return: A dict of column values.
+    """
+    if not isinstance(data, dict):
+        raise ReadingValueError('reading must be an object')
+
+    missing = [name for name in REQUIRED_READING_FIELDS if data.get(name) is None]
+
+    if missing:
+        raise ReadingValueError('missing {fields}'.format(fields=', '.join(missing)))
+
+    for name, length in READING_FIELD_LENGTHS.items():
+        if not isinstance(data[name], str) or len(data[name]) > length:
+            raise ReadingValueError('{name} must be text of at most {length} characters'.format(
+                name=name, length=length))
+
+    try:
+        latitude = float(data['latitude'])
+        longitude = float(data['longitude'])
+        value = float(data['value'])
+        value_error_range = float(data.get('value_error_range') or 0.0)
+        elevation = float(data['elevation'])
+    except (TypeError, ValueError):
+        raise ReadingValueError('value, value_error_range, latitude, longitude and elevation must be numbers')
+
+    try:
+        timestamp = utc_timestamp(data['timestamp'])
+    except ValueError:
+        raise ReadingValueError('timestamp must be an ISO 8601 date and time')
+
+    reading_key = data.get('reading_key')
+
+    if reading_key is not None and (not isinstance(reading_key, str) or len(reading_key) > 64):
+        raise ReadingValueError('reading_key must be text of at most 64 characters')
+
+    validate_coordinates(latitude, longitude)
+    latitude_public = public_coordinate(latitude)
+    longitude_public = public_coordinate(longitude)
+
+    return {
+        'value': value,
+        'value_units': data['value_units'],
+        'value_error_range': value_error_range,
+        'latitude': latitude,
+        'latitude_public': latitude_public,
+        'longitude': longitude,
+        'longitude_public': longitude_public,
+        'geohash': encode_geohash(latitude_public, longitude_public),
+        'location': location_key(data['city'], data['province'], data['country'], elevation, data['elevation_units']),
+        'timestamp': timestamp,
+        'reading_key': reading_key
+    }
+
+
+def _insert_new_readings(model, rows: list):
+    # Skip the rows whose reading key is already stored: ON DUPLICATE KEY UPDATE of the key to itself on
+    # MySQL, ON CONFLICT DO NOTHING on PostgreSQL and SQLite, and a savepoint per row on other databases
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        statement = mysql.insert(model.__table__).values(rows)
+        db.session.execute(statement.on_duplicate_key_update(reading_key=statement.inserted.reading_key))
+    elif dialect == 'postgresql':
+        db.session.execute(postgresql.insert(model.__table__).values(rows).on_conflict_do_nothing())
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(model.__table__).values(rows).on_conflict_do_nothing())
+    else:
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(model.__table__.insert().values([row]))
+            except IntegrityError:
+                if row['reading_key'] is None or db.session.execute(
+                        select(model.id).where(model.reading_key == row['reading_key'])).first() is None:
+                    raise
+
+
+def _stored_reading_keys(model, rows: list, lock: bool = False) -> set:
+    reading_keys = [row['reading_key'] for index, row in rows if row['reading_key'] is not None]
+
+    if not reading_keys:
+        return set()
+
+    statement = select(model.reading_key).where(model.reading_key.in_(reading_keys))
+
+    # A locking read sees the keys committed by other requests since the transaction began
+    if lock:
+        statement = statement.with_for_update()
+
+    return set(db.session.execute(statement).scalars())
+
+
+def _insert_chunk(model, rows: list) -> set:
+    # Returns the reading keys of the rows that were skipped because another request stored them first
+    try:
+        with db.session.begin_nested():
+            db.session.execute(model.__table__.insert().values(rows))
+            add_to_rollups(model, rows)
+
+        return set()
+    except IntegrityError:
+        if all(row['reading_key'] is None for row in rows):
+            raise
+
+    # Another request stored some of the reading keys since they were looked up. The rows still new are
+    # inserted with the upsert, in case yet another request stores one meanwhile, so their rollup buckets
+    # are summed again rather than added to.
+    with db.session.begin_nested():
+        stored = _stored_reading_keys(model, list(enumerate(rows)), lock=True)
+        new_rows = [row for row in rows if row['reading_key'] not in stored]
+
+        if new_rows:
+            _insert_new_readings(model, new_rows)
+            recompute_rollups(model, [(row['location_id'], row['timestamp']) for row in new_rows])
+
+    return stored
+
+
+def _validated_rows(data) -> tuple:
+    # The status of each reading, 201 until it is written, and the (index, row) of the readings to write
+    results = []
+    rows = []
+    reading_keys = set()
+
+    for index, reading in enumerate(data):
+        try:
+            row = reading_row(reading)
+        except ValueError as exception:
+            results.append({'index': index, 'status': 400, 'message': str(exception)})
+            continue
+
+        if row['reading_key'] is not None and row['reading_key'] in reading_keys:
+            results.append({'index': index, 'status': 200, 'message': 'already created'})
+            continue
+
+        reading_keys.add(row['reading_key'])
+        rows.append((index, row))
+        results.append({'index': index, 'status': 201, 'message': None})
+
+    return results, rows
+
+
+def _locate_rows(rows: list) -> tuple:
+    # Replace the location of each row by its identifier; returns the identifiers by location key and
+    # the (city, province, country, timestamp) of each reading by index
+    location_ids = {}
+    changed = {}
+
+    for index, row in rows:
+        key = row.pop('location')
+        changed[index] = key[:3] + (row['timestamp'],)
+
+        if key not in location_ids:
+            location_ids[key] = get_or_create_location(*key).id
+
+        row['location_id'] = location_ids[key]
+
+    return location_ids, changed
+
+
+def _write_chunk(model, chunk: list, results: list):
+    # Insert the (index, row) of a chunk whose reading keys are not stored yet, updating their results
+    stored = _stored_reading_keys(model, chunk)
+
+    for index, row in chunk:
+        if row['reading_key'] in stored:
+            results[index] = {'index': index, 'status': 200, 'message': 'already created'}
+
+    chunk = [(index, row) for index, row in chunk if row['reading_key'] not in stored]
+
+    if not chunk:
+        return
+
+    try:
+        skipped = _insert_chunk(model, [row for index, row in chunk])
+    except SQLAlchemyError:
+        log.exception('A batch of {count} readings was rejected by the database.'.format(count=len(chunk)))
+
+        for index, row in chunk:
+            results[index] = {'index': index, 'status': 500, 'message': 'the database rejected the reading'}
+
+        return
+
+    for index, row in chunk:
+        if row['reading_key'] in skipped:
+            results[index] = {'index': index, 'status': 200, 'message': 'already created'}
+
+
+def create_readings(model, data) -> list:
+    """
+    Creates many reading records in the database.
+
+    Readings are validated up front and the valid ones are inserted with one multi-row INSERT per
+    chunk of BATCH_CHUNK_SIZE, all committed in a single transaction. A chunk that the database
+    rejects is rolled back to its savepoint without losing the other chunks.
+
+    A reading whose reading key is already stored, or repeated earlier in the batch, is skipped with
+    a status of 200, so a batch can be sent again safely.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param data: A JSON list of readings.
+    :return: A dict with the 'created' and 'rejected' counts and the status of each reading in 'results'.
+    """
+    results, rows = _validated_rows(data)
+    location_ids, changed = _locate_rows(rows)
+
+    for offset in range(0, len(rows), BATCH_CHUNK_SIZE):
+        _write_chunk(model, rows[offset:offset + BATCH_CHUNK_SIZE], results)
+
+    touch_locations(location_ids.values())
     db.session.commit()
+
+    invalidate_readings(model.__tablename__,
+                        [reading for index, reading in changed.items() if results[index]['status'] == 201])
+    note_stations(model, set((row['location_id'], row['latitude_public'], row['longitude_public'])
+                             for index, row in rows if results[index]['status'] == 201))
+
+    created = sum(1 for result in results if result['status'] == 201)
+    rejected = sum(1 for result in results if result['status'] >= 400)
+
+    return {
+        'created': created,
+        'rejected': rejected,
+        'results': results
+    }
+
+
+def create_humidities(data) -> list:
+    """
+    Creates many humidity records in the database.
+
+    :param data: A JSON list of Humidity objects.
+    :return: A dict with the counts and the status of each reading.
+    """
+    return create_readings(Humidity, data)
+
+
+def create_pressures(data) -> list:
+    """
+    Creates many pressure records in the database.
+
+    :param data: A JSON list of Pressure objects.
+    :return: A dict with the counts and the status of each reading.
+    """
+    return create_readings(Pressure, data)
+
+
+def create_temperatures(data) -> list:
+    """
+    Creates many temperature records in the database.
+
+    :param data: A JSON list of Temperature objects.
+    :return: A dict with the counts and the status of each reading.
+    """
+    return create_readings(Temperature, data)
@@ -0,0 +1,65 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from flask_restplus import inputs
+
+from api.weather_data_flaskapi.business.decimation import DECIMATIONS, MAX_DECIMATED_POINTS, MIN_DECIMATED_POINTS
+from api.weather_data_flaskapi.location_date_range_pagination_arguments import \
+    location_date_range_pagination_arguments
+from api.weather_data_flaskapi.streaming import STREAM_FORMATS
+
+collection_arguments = location_date_range_pagination_arguments.copy()
+
+collection_arguments.add_argument('format',
+                                  type=str,
+                                  required=False,
+                                  choices=('json',) + STREAM_FORMATS,
+                                  default='json',
+                                  help='Response format: a json page, or every record streamed as ndjson, csv or '
+                                       'packed little-endian columns {error_msg}')
+
+# A collection is read by city, or by area with one of bbox or near
+for name, description in (('city', 'City'), ('province', 'Province'), ('country', 'Country')):
+    collection_arguments.replace_argument(name,
+                                          type=str,
+                                          required=False,
+                                          help='{description}, required without bbox or near'.format(
+                                              description=description))
+
+collection_arguments.add_argument('bbox',
+                                  type=str,
+                                  required=False,
+                                  help='Readings inside a box instead of a city: minlat,minlon,maxlat,maxlon')
+
+collection_arguments.add_argument('near',
+                                  type=str,
+                                  required=False,
+                                  help='Readings within radius_km of a point instead of a city: lat,lon')
+
+collection_arguments.add_argument('radius_km',
+                                  type=float,
+                                  required=False,
+                                  help='The radius around near, in kilometres')
+
+collection_arguments.add_argument('max_points',
+                                  type=inputs.int_range(MIN_DECIMATED_POINTS, MAX_DECIMATED_POINTS),
+                                  required=False,
+                                  help='Thin every record in the range (after the cursor, if given) to at most this '
+                                       'many for charting ({min_points} to {max_points}) {{error_msg}}'.format(
+                                           min_points=MIN_DECIMATED_POINTS, max_points=MAX_DECIMATED_POINTS))
+
+collection_arguments.add_argument('decimation',
+                                  type=str,
+                                  required=False,
+                                  choices=DECIMATIONS,
+                                  default='lttb',
+                                  help='How records are thinned to max_points: largest triangle three buckets, '
+                                       'or the smallest and largest record per bucket {error_msg}')
@@ -0,0 +1,179 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import json
+import struct
+from itertools import islice
+
+import numpy as np
+from flask_restplus import fields as restplus_fields
+
+COLUMNS_MIMETYPE = 'application/vnd.weather-data.columns'
+
+COLUMNS_MAGIC = b'WDCOLS1\n'
+
+# Records per batch of the column format
+COLUMNS_BATCH_SIZE = 8192
+
+_ALIGNMENT = 8
+
+
+def _column_type(field) -> str:
+    if isinstance(field, restplus_fields.Integer):
+        return 'int64'
+
+    if isinstance(field, restplus_fields.Float):
+        return 'float64'
+
+    if isinstance(field, restplus_fields.DateTime):
+        return 'timestamp_us'
+
+    return 'dictionary'
+
+
+def _padding(length: int) -> bytes:
+    return b'\0' * (-length % _ALIGNMENT)
+
+
+def _column(values: list, column_type: str) -> tuple:
+    """
+    Pack the values of a column of a batch.
+
+    :return: A (buffer, dictionary values or None) tuple.
+    """
+    if column_type == 'int64':
+        return np.array(values, dtype='<i8').tobytes(), None
+
+    if column_type == 'float64':
+        return np.array([np.nan if value is None else value for value in values], dtype='<f8').tobytes(), None
+
+    # A null timestamp is NaT, which is stored as the smallest int64
+    if column_type == 'timestamp_us':
+        return np.array(values, dtype='datetime64[us]').view('<i8').tobytes(), None
+
+    codes = {}
+    packed = np.fromiter((-1 if value is None else codes.setdefault(value, len(codes)) for value in values),
+                         dtype='<i4', count=len(values))
+    return packed.tobytes(), list(codes)
+
+
+def pack_batch(records: list, fields) -> bytes:
+    """
+    Pack a batch of records into the column format.
+
+    :param records: The records of the batch, with an attribute per field.
+    :type records: list
+    :param fields: The serializer model of a record; its fields are the columns.
+    :return: The batch.
+    """
+    header = {'count': len(records), 'columns': []}
+    buffers = []
+
+    for name, field in fields.items():
+        column_type = _column_type(field)
+        buffer, values = _column([getattr(record, name) for record in records], column_type)
+        column = {'name': name, 'type': column_type}
+
+        if values is not None:
+            column['values'] = values
+
+        header['columns'].append(column)
+        buffers += [buffer, _padding(len(buffer))]
+
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-(len(encoded) + 4) % _ALIGNMENT)
+
+    return struct.pack('<I', len(encoded)) + encoded + b''.join(buffers)
+
+
+def column_batches(records, fields):
+    """
+    Write records in the column format, a batch at a time, without marshalling each record.
+
+    The column format of the collection endpoints (format=columns, or
+    Accept: application/vnd.weather-data.columns), for analytics clients that load records straight into
+    typed arrays, e.g. with numpy.frombuffer.
+
+    A response is the 8 byte magic COLUMNS_MAGIC, then any number of batches, then an end marker of
+    8 zero bytes. A batch is:
+
+    - a little-endian uint32 header length, then that many bytes of UTF-8 JSON header, padded with
+      spaces so the buffers start on an 8 byte boundary;
+    - the buffer of each column of the header, in order, each padded with zero bytes to a multiple
+      of 8 bytes.
+
+    The header is {"count": <records in the batch>, "columns": [{"name": ..., "type": ...}, ...]} with
+    the columns of the JSON records, of these types:
+
+    - int64: little-endian signed 64 bit integers;
+    - float64: little-endian IEEE 754 doubles, NaN for null;
+    - timestamp_us: little-endian signed 64 bit microseconds since 1970-01-01T00:00:00 UTC,
+      -2^63 for null;
+    - dictionary: little-endian signed 32 bit codes into the "values" list of strings of the column,
+      -1 for null. The list only holds the strings of its batch.
+
+    :param records: The records, in the order they are written.
+    :param fields: The serializer model of a record.
+    :return: An iterable of bytes.
+    """
+    yield COLUMNS_MAGIC
+
+    records = iter(records)
+
+    while True:
+        batch = list(islice(records, COLUMNS_BATCH_SIZE))
+
+        if not batch:
+            break
+
+        yield pack_batch(batch, fields)
+
+    yield b'\0' * _ALIGNMENT
+
+
+def read_columns(data: bytes) -> dict:
+    """
+    Read a response in the column format, e.g. in a client or a test.
+
+    :param data: The response body.
+    :type data: bytes
+    :return: A dict of a numpy array per column, or a list of strings for dictionary columns.
+    """
+    if data[:len(COLUMNS_MAGIC)] != COLUMNS_MAGIC:
+        raise ValueError('not in the column format')
+
+    offset = len(COLUMNS_MAGIC)
+    columns = {}
+
+    while True:
+        length, = struct.unpack_from('<I', data, offset)
+        offset += 4
+
+        if not length:
+            break
+
+        header = json.loads(data[offset:offset + length].decode('utf-8'))
+        offset += length
+
+        for column in header['columns']:
+            dtype = '<i4' if column['type'] == 'dictionary' else '<f8' if column['type'] == 'float64' else '<i8'
+            values = np.frombuffer(data, dtype=dtype, count=header['count'], offset=offset)
+            offset += values.nbytes + len(_padding(values.nbytes))
+
+            if column['type'] == 'dictionary':
+                values = [None if code < 0 else column['values'][code] for code in values.tolist()]
+            elif column['type'] == 'timestamp_us':
+                values = values.view('datetime64[us]')
+
+            columns.setdefault(column['name'], []).append(values)
+
+    return dict((name, sum(parts, []) if isinstance(parts[0], list) else np.concatenate(parts))
+                for name, parts in columns.items())
@@ -0,0 +1,39 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from flask_restplus import reqparse
+
+from database.models import READING_MODELS
+
+combined_arguments = reqparse.RequestParser(bundle_errors=True)
+
+combined_arguments.add_argument('location',
+                                type=str,
+                                action='append',
+                                required=True,
+                                help='A location as city,province,country; repeat for more locations')
+
+combined_arguments.add_argument('metric',
+                                type=str,
+                                action='append',
+                                required=False,
+                                choices=tuple(READING_MODELS),
+                                help='A reading to return; repeat for more readings (default: all)')
+
+combined_arguments.add_argument('start',
+                                type=str,
+                                required=True,
+                                help='Start date (e.g. 2017-01-30)')
+
+combined_arguments.add_argument('end',
+                                type=str,
+                                required=True,
+                                help='End date, inclusive (e.g. 2017-01-30)')
@@ -0,0 +1,78 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+
+from api.weather_data_flaskapi.business.cache import cache_key
+
+
+def location_validators(versions: list, *parts) -> tuple:
+    """
+    Build the validators of a response computed from the readings of some locations.
+
+    :param versions: (location identifier, version, modified date) tuples of the locations.
+    :type versions: list
+    :param parts: The normalized request parameters that identify the response.
+    :return: An (entity tag, last modified date) tuple; the date is None when unknown.
+    """
+    etag = cache_key(*(parts + tuple([location_id, version] for location_id, version, modified in versions)))
+    modified_dates = [modified for location_id, version, modified in versions if modified is not None]
+
+    return etag, max(modified_dates) if modified_dates else None
+
+
+def _not_modified(etag: str, last_modified: datetime) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified <= request.if_modified_since
+
+    return False
+
+
+def conditional_response(etag: str, last_modified: datetime, produce):
+    """
+    Answer 304 Not Modified when the client holds the current response, otherwise produce the response
+    with its ETag and Last-Modified headers.
+
+    The validators are derived from the location versions, so a 304 costs neither the query nor the
+    marshalling of the response.
+
+    :param etag: The entity tag of the current response.
+    :type etag: str
+    :param last_modified: The last write to the readings of the response, in UTC, or None.
+    :type last_modified: datetime
+    :param produce: A function returning the response.
+    :return: The response.
+    """
+    if last_modified is not None:
+        # HTTP dates have a resolution of one second
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+    headers = {'ETag': quote_etag(etag)}
+
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if _not_modified(etag, last_modified):
+        return Response(status=304, headers=headers)
+
+    result = produce()
+
+    if isinstance(result, Response):
+        result.headers.extend(headers)
+        return result
+
+    return result, 200, headers
@@ -9,38 +9,16 @@
 @deffield    updated: 2017-06-14
 """
 
-from flask_restplus import reqparse
-from datetime import date, timedelta
+from api.weather_data_flaskapi.pagination_arguments import pagination_arguments
 
-date_range_pagination_arguments = reqparse.RequestParser()
+date_range_pagination_arguments = pagination_arguments.copy()
 
-date_range_pagination_arguments.add_argument('start-date',
+date_range_pagination_arguments.add_argument('start',
                                              type=str,
-                                             required=False,
-                                             default=str(date.today() - timedelta(days=7)),
-                                             help='Start date')
+                                             required=True,
+                                             help='Start date (e.g. 2017-01-30)')
 
-date_range_pagination_arguments.add_argument('end-date',
+date_range_pagination_arguments.add_argument('end',
                                              type=str,
-                                             required=False,
-                                             default=str(date.today()),
-                                             help='End date')
-
-date_range_pagination_arguments.add_argument('page',
-                                             type=int,
-                                             required=False,
-                                             default=1,
-                                             help='Page number')
-
-date_range_pagination_arguments.add_argument('bool',
-                                             type=bool,
-                                             required=False,
-                                             default=1,
-                                             help='Page number')
-
-date_range_pagination_arguments.add_argument('per_page',
-                                             type=int,
-                                             required=False,
-                                             choices=[2, 10, 20, 30, 40, 50],
-                                             default=10,
-                                             help='Results per page {error_msg}')
+                                             required=True,
+                                             help='End date (e.g. 2017-01-30)')
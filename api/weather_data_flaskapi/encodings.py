@@ -0,0 +1,136 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import cbor2
+import msgpack
+from flask import make_response, request
+from flask_restplus import abort
+
+from api.restplus import api
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+CBOR_MIMETYPE = 'application/cbor'
+
+
+def _unpack_msgpack(body: bytes):
+    # Native MessagePack timestamps are decoded as datetimes
+    return msgpack.unpackb(body, raw=False, timestamp=3)
+
+
+# The request bodies understood besides JSON, by content type
+BODY_DECODERS = {
+    MSGPACK_MIMETYPE: _unpack_msgpack,
+    'application/x-msgpack': _unpack_msgpack,
+    CBOR_MIMETYPE: cbor2.loads,
+}
+
+
+def _json_compatible(value):
+    # Dates decoded from MessagePack or CBOR become the ISO 8601 strings a JSON body holds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    if isinstance(value, dict):
+        return dict((key, _json_compatible(item)) for key, item in value.items())
+
+    if isinstance(value, list):
+        return [_json_compatible(item) for item in value]
+
+    return value
+
+
+def _encodable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+
+    if isinstance(value, Decimal):
+        return float(value)
+
+    raise TypeError('cannot encode {type}'.format(type=type(value).__name__))
+
+
+def request_body(model=None):
+    """
+    Decode the body of a request sent as JSON, MessagePack or CBOR, by its content type.
+
+    MessagePack and CBOR bodies hold the same objects and fields as JSON bodies; their dates may be either
+    native dates or ISO 8601 strings. Flask-RESTPlus only validates JSON bodies, so the endpoints taking
+    these encodings expect their model with validate=False and pass it here instead.
+
+    :param model: The serializer model to validate the decoded body against, or None.
+    :return: The decoded body, as request.json would return it.
+    """
+    decode = BODY_DECODERS.get(request.mimetype)
+
+    if decode is None:
+        data = request.json
+    else:
+        try:
+            data = _json_compatible(decode(request.get_data()))
+        except (ValueError, TypeError, cbor2.CBORDecodeError):
+            abort(400, 'Bad request: the body is not valid {mimetype}'.format(mimetype=request.mimetype))
+
+    if model is not None:
+        # Aborts with the 400 of the validation of @api.expect
+        model.validate(data, api.refresolver, api.format_checker)
+
+    return data
+
+
+def negotiated_mimetype() -> str:
+    """
+    Find the representation of the response of a request, as chosen by the API from its Accept header.
+
+    :return: The content type.
+    """
+    return request.accept_mimetypes.best_match(list(api.representations), default='application/json')
+
+
+@api.representation(MSGPACK_MIMETYPE)
+def msgpack_representation(data, code: int, headers: dict = None):
+    """
+    Write a response as MessagePack, for clients sending Accept: application/msgpack.
+
+    :param data: The marshalled response.
+    :param code: The status code.
+    :type code: int
+    :param headers: The response headers.
+    :type headers: dict
+    :return: The response.
+    """
+    response = make_response(msgpack.packb(data, use_bin_type=True, default=_encodable), code)
+    response.headers.extend(headers or {})
+    response.mimetype = MSGPACK_MIMETYPE
+
+    return response
+
+
+@api.representation(CBOR_MIMETYPE)
+def cbor_representation(data, code: int, headers: dict = None):
+    """
+    Write a response as CBOR, for clients sending Accept: application/cbor.
+
+    :param data: The marshalled response.
+    :param code: The status code.
+    :type code: int
+    :param headers: The response headers.
+    :type headers: dict
+    :return: The response.
+    """
+    response = make_response(cbor2.dumps(data, default=lambda encoder, value: encoder.encode(_encodable(value))), code)
+    response.headers.extend(headers or {})
+    response.mimetype = CBOR_MIMETYPE
+
+    return response
@@ -11,16 +11,23 @@
 
 import logging
 
-from flask import request
 from flask_jwt import jwt_required
-from flask_restplus import Resource, reqparse, abort
-from sqlalchemy import and_
+from flask_restplus import Resource, abort, marshal
 
 from api.restplus import api
+from api.weather_data_flaskapi.business.ingest import IngestQueueFullError, ingest_queue, queue_reading, queue_readings
+from api.weather_data_flaskapi.business.weather_data import BATCH_MAX_READINGS
+from api.weather_data_flaskapi.business.weather_data import create_humidities, create_pressures, create_temperatures
 from api.weather_data_flaskapi.business.weather_data import create_humidity, delete_humidity, update_humidity
 from api.weather_data_flaskapi.business.weather_data import create_pressure, delete_pressure, update_pressure
 from api.weather_data_flaskapi.business.weather_data import create_temperature, delete_temperature, update_temperature
+from api.weather_data_flaskapi.collection_arguments import collection_arguments
+from api.weather_data_flaskapi.encodings import request_body
+from api.weather_data_flaskapi.columnar import COLUMNS_MIMETYPE
+from api.weather_data_flaskapi.reading_collections import reading_collection, reading_item
 from api.weather_data_flaskapi.serializers import humidity, pressure, temperature
+from api.weather_data_flaskapi.serializers import humidity_page, pressure_page, temperature_page
+from api.weather_data_flaskapi.serializers import batch_result
 from database.model_exceptions import LatitudeValueError, LongitudeValueError
 from database.models import Humidity, Pressure, Temperature
 
@@ -32,47 +39,50 @@ ns = api.namespace('protected',
 
 @ns.route('/humidity/')
 class HumidityCollection(Resource):
-    @api.marshal_list_with(humidity)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
+    @api.response(200, 'Success', humidity_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     @jwt_required()
     def get(self):
         """
-        Returns list of humidity records.
+        Returns a page of humidity records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Humidity.query.filter(
-            and_(Humidity.timestamp >= start,
-                 Humidity.timestamp <= end)).filter(
-            and_(Humidity.city == city,
-                 Humidity.province == province,
-                 Humidity.country == country)).order_by(Humidity.timestamp).all()
-
-        return records
+        return reading_collection(Humidity, humidity, humidity_page)
 
     @api.response(201, 'Humidity successfully created.')
-    @api.expect(humidity)
+    @api.response(202, 'Humidity accepted; it is written shortly after.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect(humidity, validate=False)
     @api.marshal_with(humidity)
     @jwt_required()
     def post(self):
         """
         Creates a new humidity record.
+
+        When the ingest queue is enabled the reading is validated, answered with 202 and written shortly after.
         :return:
         """
-        data = request.json
+        data = request_body(humidity)
+
+        if ingest_queue() is not None:
+            try:
+                queue_reading(Humidity, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+            except ValueError as exception:
+                abort(400, 'Bad request: {message}'.format(message=exception))
+
+            return data, 202
 
         try:
             data = create_humidity(data)
@@ -84,10 +94,75 @@ class HumidityCollection(Resource):
         return data, 201
 
 
+@ns.route('/humidity/batch')
+class HumidityBatch(Resource):
+    @api.response(201, 'Every humidity record successfully created.', batch_result)
+    @api.response(202, 'Every humidity record accepted; they are written shortly after.', batch_result)
+    @api.response(207, 'Some humidity records were not created; see the status of each reading.', batch_result)
+    @api.response(400, 'Bad request: the body must be a list of readings.')
+    @api.response(413, 'Too many readings in one batch.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect([humidity], validate=False)
+    @jwt_required()
+    def post(self):
+        """
+        Creates many humidity records.
+
+        Use this method to send thousands of readings in one request.
+
+        * Send a JSON, MessagePack or CBOR list of humidity objects in the request body.
+
+        ```
+        [
+            {
+                "value": 14.4924,
+                "value_units": "RH",
+                "value_error_range": 0.192573,
+                "latitude": 54.788803,
+                "longitude": -5.176766,
+                "city": "Toronto",
+                "province": "ON",
+                "country": "CA",
+                "elevation": 66166.1257,
+                "elevation_units": "m",
+                "timestamp": "0525-05-07T21:46:04"
+            }
+        ]
+        ```
+
+        Each reading is validated on its own; the response lists the status of every reading in request order.
+        When the ingest queue is enabled valid readings are answered with 202 and written shortly after.
+
+        Gateways may send the body as application/msgpack or application/cbor, and get the response in the
+        same encoding by sending it in the Accept header.
+        :return:
+        """
+        data = request_body()
+
+        if not isinstance(data, list):
+            abort(400, 'Bad request: the body must be a list of readings')
+
+        if len(data) > BATCH_MAX_READINGS:
+            abort(413, 'Too many readings: at most {count} per batch'.format(count=BATCH_MAX_READINGS))
+
+        if ingest_queue() is not None:
+            try:
+                result = queue_readings(Humidity, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+
+            return marshal(result, batch_result), 202 if result['rejected'] == 0 else 207
+
+        result = create_humidities(data)
+
+        return marshal(result, batch_result), 201 if result['rejected'] == 0 else 207
+
+
 @ns.route('/humidity/<int:humidity_id>')
 @api.response(404, 'Humidity not found.')
 class HumidityItem(Resource):
-    @api.marshal_with(humidity)
+    @api.response(200, 'Success', humidity)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     @jwt_required()
     def get(self, humidity_id: int):
         """
@@ -96,9 +171,9 @@ class HumidityItem(Resource):
         :type humidity_id: int
         :return:
         """
-        return Humidity.query.filter(Humidity.id == humidity_id).one()
+        return reading_item(Humidity, humidity_id, humidity)
 
-    @api.expect(humidity)
+    @api.expect(humidity, validate=False)
     @api.marshal_with(humidity)
     @api.response(204, 'Humidity successfully updated.')
     @jwt_required()
@@ -108,7 +183,7 @@ class HumidityItem(Resource):
 
         Use this method to change the values for a humidity record.
 
-        * Send a JSON object with the new data in the request body.
+        * Send a JSON, MessagePack or CBOR object with the new data in the request body.
 
         ```
         {
@@ -132,7 +207,7 @@ class HumidityItem(Resource):
         :param humidity_id: The unique identifier of the humidity record.
         :type humidity_id: int
         """
-        data = request.json
+        data = request_body(humidity)
 
         try:
             data = update_humidity(humidity_id, data)
@@ -157,47 +232,50 @@ class HumidityItem(Resource):
 
 @ns.route('/pressure/')
 class PressureCollection(Resource):
-    @api.marshal_list_with(pressure)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
+    @api.response(200, 'Success', pressure_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     @jwt_required()
     def get(self):
         """
-        Returns list of pressure records.
+        Returns a page of pressure records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Pressure.query.filter(
-            and_(Pressure.timestamp >= start,
-                 Pressure.timestamp <= end)).filter(
-            and_(Pressure.city == city,
-                 Pressure.province == province,
-                 Pressure.country == country)).order_by(Pressure.timestamp).all()
-
-        return records
+        return reading_collection(Pressure, pressure, pressure_page)
 
     @api.response(201, 'Pressure successfully created.')
-    @api.expect(pressure)
+    @api.response(202, 'Pressure accepted; it is written shortly after.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect(pressure, validate=False)
     @api.marshal_with(pressure)
     @jwt_required()
     def post(self):
         """
         Creates a new pressure record.
+
+        When the ingest queue is enabled the reading is validated, answered with 202 and written shortly after.
         :return:
         """
-        data = request.json
+        data = request_body(pressure)
+
+        if ingest_queue() is not None:
+            try:
+                queue_reading(Pressure, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+            except ValueError as exception:
+                abort(400, 'Bad request: {message}'.format(message=exception))
+
+            return data, 202
 
         try:
             data = create_pressure(data)
@@ -209,10 +287,75 @@ class PressureCollection(Resource):
         return data, 201
 
 
+@ns.route('/pressure/batch')
+class PressureBatch(Resource):
+    @api.response(201, 'Every pressure record successfully created.', batch_result)
+    @api.response(202, 'Every pressure record accepted; they are written shortly after.', batch_result)
+    @api.response(207, 'Some pressure records were not created; see the status of each reading.', batch_result)
+    @api.response(400, 'Bad request: the body must be a list of readings.')
+    @api.response(413, 'Too many readings in one batch.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect([pressure], validate=False)
+    @jwt_required()
+    def post(self):
+        """
+        Creates many pressure records.
+
+        Use this method to send thousands of readings in one request.
+
+        * Send a JSON, MessagePack or CBOR list of pressure objects in the request body.
+
+        ```
+        [
+            {
+                "value": 14.4924,
+                "value_units": "Pa",
+                "value_error_range": 0.192573,
+                "latitude": 54.788803,
+                "longitude": -5.176766,
+                "city": "Toronto",
+                "province": "ON",
+                "country": "CA",
+                "elevation": 66166.1257,
+                "elevation_units": "m",
+                "timestamp": "0525-05-07T21:46:04"
+            }
+        ]
+        ```
+
+        Each reading is validated on its own; the response lists the status of every reading in request order.
+        When the ingest queue is enabled valid readings are answered with 202 and written shortly after.
+
+        Gateways may send the body as application/msgpack or application/cbor, and get the response in the
+        same encoding by sending it in the Accept header.
+        :return:
+        """
+        data = request_body()
+
+        if not isinstance(data, list):
+            abort(400, 'Bad request: the body must be a list of readings')
+
+        if len(data) > BATCH_MAX_READINGS:
+            abort(413, 'Too many readings: at most {count} per batch'.format(count=BATCH_MAX_READINGS))
+
+        if ingest_queue() is not None:
+            try:
+                result = queue_readings(Pressure, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+
+            return marshal(result, batch_result), 202 if result['rejected'] == 0 else 207
+
+        result = create_pressures(data)
+
+        return marshal(result, batch_result), 201 if result['rejected'] == 0 else 207
+
+
 @ns.route('/pressure/<int:pressure_id>')
 @api.response(404, 'Pressure not found.')
 class PressureItem(Resource):
-    @api.marshal_with(pressure)
+    @api.response(200, 'Success', pressure)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     @jwt_required()
     def get(self, pressure_id: int):
         """
@@ -221,9 +364,9 @@ class PressureItem(Resource):
         :type pressure_id: int
         :return:
         """
-        return Pressure.query.filter(Pressure.id == pressure_id).one()
+        return reading_item(Pressure, pressure_id, pressure)
 
-    @api.expect(pressure)
+    @api.expect(pressure, validate=False)
     @api.response(204, 'Pressure successfully updated.')
     @api.marshal_with(pressure)
     @jwt_required()
@@ -233,7 +376,7 @@ class PressureItem(Resource):
 
         Use this method to change the values for a pressure record.
 
-        * Send a JSON object with the new data in the request body.
+        * Send a JSON, MessagePack or CBOR object with the new data in the request body.
 
         ```
         {
@@ -257,7 +400,7 @@ class PressureItem(Resource):
         :param pressure_id: The unique identifier of the pressure record.
         :type pressure_id: int
         """
-        data = request.json
+        data = request_body(pressure)
 
         try:
             data = update_pressure(pressure_id, data)
@@ -283,47 +426,50 @@ class PressureItem(Resource):
 
 @ns.route('/temperature/')
 class TemperatureCollection(Resource):
-    @api.marshal_list_with(temperature)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
+    @api.response(200, 'Success', temperature_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     @jwt_required()
     def get(self):
         """
-        Returns list of temperature records.
+        Returns a page of temperature records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Temperature.query.filter(
-            and_(Temperature.timestamp >= start,
-                 Temperature.timestamp <= end)).filter(
-            and_(Temperature.city == city,
-                 Temperature.province == province,
-                 Temperature.country == country)).order_by(Temperature.timestamp).all()
-
-        return records
+        return reading_collection(Temperature, temperature, temperature_page)
 
     @api.response(201, 'Temperature successfully created.')
-    @api.expect(temperature)
+    @api.response(202, 'Temperature accepted; it is written shortly after.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect(temperature, validate=False)
     @api.marshal_with(temperature)
     @jwt_required()
     def post(self):
         """
         Creates a new temperature record.
+
+        When the ingest queue is enabled the reading is validated, answered with 202 and written shortly after.
         :return:
         """
-        data = request.json
+        data = request_body(temperature)
+
+        if ingest_queue() is not None:
+            try:
+                queue_reading(Temperature, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+            except ValueError as exception:
+                abort(400, 'Bad request: {message}'.format(message=exception))
+
+            return data, 202
         try:
             data = create_temperature(data)
         except LatitudeValueError:
@@ -334,10 +480,75 @@ class TemperatureCollection(Resource):
         return data, 201
 
 
+@ns.route('/temperature/batch')
+class TemperatureBatch(Resource):
+    @api.response(201, 'Every temperature record successfully created.', batch_result)
+    @api.response(202, 'Every temperature record accepted; they are written shortly after.', batch_result)
+    @api.response(207, 'Some temperature records were not created; see the status of each reading.', batch_result)
+    @api.response(400, 'Bad request: the body must be a list of readings.')
+    @api.response(413, 'Too many readings in one batch.')
+    @api.response(503, 'The ingest queue is full.')
+    @api.expect([temperature], validate=False)
+    @jwt_required()
+    def post(self):
+        """
+        Creates many temperature records.
+
+        Use this method to send thousands of readings in one request.
+
+        * Send a JSON, MessagePack or CBOR list of temperature objects in the request body.
+
+        ```
+        [
+            {
+                "value": 14.4924,
+                "value_units": "C",
+                "value_error_range": 0.192573,
+                "latitude": 54.788803,
+                "longitude": -5.176766,
+                "city": "Toronto",
+                "province": "ON",
+                "country": "CA",
+                "elevation": 66166.1257,
+                "elevation_units": "m",
+                "timestamp": "0525-05-07T21:46:04"
+            }
+        ]
+        ```
+
+        Each reading is validated on its own; the response lists the status of every reading in request order.
+        When the ingest queue is enabled valid readings are answered with 202 and written shortly after.
+
+        Gateways may send the body as application/msgpack or application/cbor, and get the response in the
+        same encoding by sending it in the Accept header.
+        :return:
+        """
+        data = request_body()
+
+        if not isinstance(data, list):
+            abort(400, 'Bad request: the body must be a list of readings')
+
+        if len(data) > BATCH_MAX_READINGS:
+            abort(413, 'Too many readings: at most {count} per batch'.format(count=BATCH_MAX_READINGS))
+
+        if ingest_queue() is not None:
+            try:
+                result = queue_readings(Temperature, data)
+            except IngestQueueFullError:
+                abort(503, 'Service unavailable: the ingest queue is full')
+
+            return marshal(result, batch_result), 202 if result['rejected'] == 0 else 207
+
+        result = create_temperatures(data)
+
+        return marshal(result, batch_result), 201 if result['rejected'] == 0 else 207
+
+
 @ns.route('/temperature/<int:temperature_id>')
 @api.response(404, 'Temperature not found.')
 class TemperatureItem(Resource):
-    @api.marshal_with(temperature)
+    @api.response(200, 'Success', temperature)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     @jwt_required()
     def get(self, temperature_id: int):
         """
@@ -346,9 +557,9 @@ class TemperatureItem(Resource):
         :type temperature_id: int
         :return:
         """
-        return Temperature.query.filter(Temperature.id == temperature_id).one()
+        return reading_item(Temperature, temperature_id, temperature)
 
-    @api.expect(temperature)
+    @api.expect(temperature, validate=False)
     @api.response(204, 'Temperature successfully updated.')
     @api.marshal_with(temperature)
     @jwt_required()
@@ -358,7 +569,7 @@ class TemperatureItem(Resource):
 
         Use this method to change the values for a temperature.
 
-        * Send a JSON object with the new data in the request body.
+        * Send a JSON, MessagePack or CBOR object with the new data in the request body.
 
         ```
         {
@@ -382,7 +593,7 @@ class TemperatureItem(Resource):
         :param temperature_id: The unique identifier of the temperature record.
         :type temperature_id: int
         """
-        data = request.json
+        data = request_body(temperature)
 
         try:
             data = update_temperature(temperature_id, data)
@@ -10,13 +10,33 @@
 """
 
 import logging
+from datetime import datetime
 
-from flask_restplus import Resource, reqparse
-from sqlalchemy import and_
+from flask_restplus import Resource, abort, marshal
 
 from api.restplus import api
+from api.weather_data_flaskapi.aggregate_arguments import aggregate_arguments
+from api.weather_data_flaskapi.business.aggregation import AggregateValueError, aggregate_readings, parse_date_range, \
+    parse_statistics
+from api.weather_data_flaskapi.business.cache import ReadingScope
+from api.weather_data_flaskapi.business.combined import CombinedQueryError, combined_readings, find_locations, \
+    parse_locations
+from api.weather_data_flaskapi.business.joined import JoinedValueError, check_tolerance, joined_readings, parse_derived, \
+    time_grid
+from api.weather_data_flaskapi.business.locations import location_versions
+from api.weather_data_flaskapi.business.stations import nearest_reading
+from api.weather_data_flaskapi.collection_arguments import collection_arguments
+from api.weather_data_flaskapi.columnar import COLUMNS_MIMETYPE
+from api.weather_data_flaskapi.combined_arguments import combined_arguments
+from api.weather_data_flaskapi.conditional_requests import conditional_response, location_validators
+from api.weather_data_flaskapi.joined_arguments import joined_arguments
+from api.weather_data_flaskapi.nearest_arguments import nearest_arguments
+from api.weather_data_flaskapi.reading_collections import reading_collection, reading_item
+from api.weather_data_flaskapi.response_caching import cached_json
+from api.weather_data_flaskapi.serializers import aggregate, combined, joined, nearest
 from api.weather_data_flaskapi.serializers import public_humidity, public_pressure, public_temperature
-from database.models import Humidity, Pressure, Temperature
+from api.weather_data_flaskapi.serializers import public_humidity_page, public_pressure_page, public_temperature_page
+from database.models import READING_MODELS, Humidity, Pressure, Temperature, utc_timestamp, validate_coordinates
 
 log = logging.getLogger(__name__)
 
@@ -26,42 +46,34 @@ ns = api.namespace('public',
 
 @ns.route('/humidity/')
 class PublicHumidityCollection(Resource):
-    @api.marshal_list_with(public_humidity)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'city': 'The required city for the returned records.'})
+    @api.response(200, 'Success', public_humidity_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     def get(self):
         """
-        Returns list of public humidity records.
+        Returns a page of public humidity records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With bbox, or near and radius_km, instead of city, province and country the records of every
+        station in the area are returned.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Humidity.query.filter(
-            and_(Humidity.timestamp >= start,
-                 Humidity.timestamp <= end)).filter(
-            and_(Humidity.city == city,
-                 Humidity.province == province,
-                 Humidity.country == country)).order_by(Humidity.timestamp).all()
-
-        return records
+        return reading_collection(Humidity, public_humidity, public_humidity_page, cached=True)
 
 
 @ns.route('/humidity/<int:humidity_id>')
 @api.response(404, 'PublicHumidity not found.')
 class PublicHumidityItem(Resource):
-    @api.marshal_with(public_humidity)
+    @api.response(200, 'Success', public_humidity)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     def get(self, humidity_id: int):
         """
         Returns a public humidity record.
@@ -69,47 +81,39 @@ class PublicHumidityItem(Resource):
         :type humidity_id: int
         :return:
         """
-        return Humidity.query.filter(Humidity.id == humidity_id).one()
+        return reading_item(Humidity, humidity_id, public_humidity)
 
 
 @ns.route('/pressure/')
 class PublicPressureCollection(Resource):
-    @api.marshal_list_with(public_pressure)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'city': 'The required city for the returned records.'})
+    @api.response(200, 'Success', public_pressure_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     def get(self):
         """
-        Returns list of public pressure records.
+        Returns a page of public pressure records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With bbox, or near and radius_km, instead of city, province and country the records of every
+        station in the area are returned.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Pressure.query.filter(
-            and_(Pressure.timestamp >= start,
-                 Pressure.timestamp <= end)).filter(
-            and_(Pressure.city == city,
-                 Pressure.province == province,
-                 Pressure.country == country)).order_by(Pressure.timestamp).all()
-
-        return records
+        return reading_collection(Pressure, public_pressure, public_pressure_page, cached=True)
 
 
 @ns.route('/pressure/<int:pressure_id>')
 @api.response(404, 'PublicPressure not found.')
 class PublicPressureItem(Resource):
-    @api.marshal_with(public_pressure)
+    @api.response(200, 'Success', public_pressure)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     def get(self, pressure_id: int):
         """
         Returns a public pressure record.
@@ -117,47 +121,39 @@ class PublicPressureItem(Resource):
         :type pressure_id: int
         :return:
         """
-        return Pressure.query.filter(Pressure.id == pressure_id).one()
+        return reading_item(Pressure, pressure_id, public_pressure)
 
 
 @ns.route('/temperature/')
 class PublicTemperatureCollection(Resource):
-    @api.marshal_list_with(public_temperature)
-    @api.doc(params={'start': 'The required start date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'end': 'The required end date (e.g. 2017-01-30) for the returned records.'})
-    @api.doc(params={'city': 'The required city for the returned records.'})
+    @api.response(200, 'Success', public_temperature_page)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.produces(['application/json', 'application/x-ndjson', 'text/csv', COLUMNS_MIMETYPE])
+    @api.expect(collection_arguments)
     def get(self):
         """
-        Returns list of public temperature records.
+        Returns a page of public temperature records.
+
+        Records are ordered by timestamp. Pass the returned "next" cursor to fetch the following page.
+
+        With format=ndjson or format=csv every record in the range (after the cursor, if given) is streamed
+        in one response instead; format=columns, or Accept: application/vnd.weather-data.columns, streams
+        them as packed little-endian column buffers.
+
+        With bbox, or near and radius_km, instead of city, province and country the records of every
+        station in the area are returned.
+
+        With max_points every record in the range is thinned server-side for charting, keeping the peaks.
         :return:
         """
-        parser = reqparse.RequestParser(bundle_errors=True)
-        parser.add_argument('start', type=str, required=True)
-        parser.add_argument('end', type=str, required=True)
-        parser.add_argument('city', type=str, required=True)
-        parser.add_argument('province', type=str, required=True)
-        parser.add_argument('country', type=str, required=True)
-        args = parser.parse_args()
-        start = args['start']
-        end = args['end']
-        city = args['city']
-        province = args['province']
-        country = args['country']
-
-        records = Temperature.query.filter(
-            and_(Temperature.timestamp >= start,
-                 Temperature.timestamp <= end)).filter(
-            and_(Temperature.city == city,
-                 Temperature.province == province,
-                 Temperature.country == country)).order_by(Temperature.timestamp).all()
-
-        return records
+        return reading_collection(Temperature, public_temperature, public_temperature_page, cached=True)
 
 
 @ns.route('/temperature/<int:temperature_id>')
 @api.response(404, 'PublicTemperature not found.')
 class PublicTemperatureItem(Resource):
-    @api.marshal_with(public_temperature)
+    @api.response(200, 'Success', public_temperature)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
     def get(self, temperature_id: int):
         """
         Returns a public temperature record.
@@ -165,4 +161,174 @@ class PublicTemperatureItem(Resource):
         :type temperature_id: int
         :return:
         """
-        return Temperature.query.filter(Temperature.id == temperature_id).one()
+        return reading_item(Temperature, temperature_id, public_temperature)
+
+
+@ns.route('/<any({metrics}):metric>/aggregate'.format(metrics=', '.join(READING_MODELS)))
+@api.doc(params={'metric': 'The reading to summarize: humidity, pressure or temperature.'})
+class PublicAggregate(Resource):
+    @api.response(200, 'Success', aggregate)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.response(400, 'Bad request: stats, start or end is not valid.')
+    @api.expect(aggregate_arguments)
+    def get(self, metric: str):
+        """
+        Returns summary statistics of public records per time bucket.
+
+        Buckets are aligned to UTC: hours, days, and weeks starting on Monday. Only buckets holding readings
+        are returned.
+        :param metric: The reading to summarize.
+        :type metric: str
+        :return:
+        """
+        args = aggregate_arguments.parse_args()
+
+        try:
+            start, end = parse_date_range(args['start'], args['end'])
+            statistics = parse_statistics(args['stats'])
+        except AggregateValueError as exception:
+            abort(400, 'Bad request: {message}'.format(message=str(exception)))
+
+        def summaries():
+            items = aggregate_readings(READING_MODELS[metric],
+                                       start=start,
+                                       end=end,
+                                       city=args['city'],
+                                       province=args['province'],
+                                       country=args['country'],
+                                       bucket=args['bucket'],
+                                       statistics=statistics)
+
+            return marshal({'bucket': args['bucket'], 'items': items}, aggregate)
+
+        versions = location_versions(args['city'], args['province'], args['country'])
+
+        def cached_summaries():
+            # The versions key the summaries to the readings they were read from, whichever process changed them
+            scope = ReadingScope(metric, args['city'], args['province'], args['country'], start, end)
+            key_parts = ('aggregate', args['bucket'], statistics) + scope.location + (start, end) + \
+                tuple([location_id, version] for location_id, version, modified in versions)
+
+            return cached_json(scope, key_parts, summaries)
+
+        etag, last_modified = location_validators(versions, 'aggregate', metric, args['bucket'], statistics, start, end)
+
+        return conditional_response(etag, last_modified, cached_summaries)
+
+
+@ns.route('/<any({metrics}):metric>/nearest'.format(metrics=', '.join(READING_MODELS)))
+@api.doc(params={'metric': 'The reading to find: humidity, pressure or temperature.'})
+class PublicNearest(Resource):
+    @api.response(200, 'Success', nearest)
+    @api.response(400, 'Bad request: lat, lon or at is not valid.')
+    @api.response(404, 'No station has a reading.')
+    @api.expect(nearest_arguments)
+    def get(self, metric: str):
+        """
+        Returns the public record of the station nearest to a point that is closest in time to a date.
+
+        The stations are found in memory by their public position; the record is read with one query.
+        :param metric: The reading to find.
+        :type metric: str
+        :return:
+        """
+        args = nearest_arguments.parse_args()
+
+        try:
+            validate_coordinates(args['lat'], args['lon'])
+            at = utc_timestamp(args['at']) if args['at'] else datetime.utcnow()
+        except ValueError as exception:
+            abort(400, 'Bad request: {message}'.format(message=str(exception)))
+
+        found = nearest_reading(READING_MODELS[metric], args['lat'], args['lon'], at)
+
+        if found is None:
+            abort(404, 'No station has a reading.')
+
+        reading, distance = found
+
+        return marshal(dict(reading._asdict(), distance_km=distance), nearest)
+
+
+@ns.route('/readings')
+class PublicCombined(Resource):
+    @api.response(200, 'Success', combined)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.response(400, 'Bad request: location, start or end is not valid, or the query matches too many records.')
+    @api.expect(combined_arguments)
+    def get(self):
+        """
+        Returns the public records of several locations and metrics within one date range.
+
+        The locations are found with one query and the records of every metric with one more, instead of
+        a request per location and metric. A series is returned per location and metric, by location then
+        metric in request order.
+        :return:
+        """
+        args = combined_arguments.parse_args()
+        metrics = list(dict.fromkeys(args['metric'] or READING_MODELS))
+
+        try:
+            locations = parse_locations(args['location'])
+            start, end = parse_date_range(args['start'], args['end'])
+        except (AggregateValueError, CombinedQueryError) as exception:
+            abort(400, 'Bad request: {message}'.format(message=str(exception)))
+
+        stations = find_locations(locations)
+
+        def series():
+            try:
+                items = combined_readings([READING_MODELS[metric] for metric in metrics], locations, stations,
+                                          start, end)
+            except CombinedQueryError as exception:
+                abort(400, 'Bad request: {message}'.format(message=str(exception)))
+
+            return marshal({'series': items}, combined)
+
+        versions = [(station.id, station.version, station.modified_date) for station in stations]
+        etag, last_modified = location_validators(versions, 'combined', metrics, locations, start, end)
+
+        return conditional_response(etag, last_modified, series)
+
+
+@ns.route('/joined')
+class PublicJoined(Resource):
+    @api.response(200, 'Success', joined)
+    @api.response(304, 'Not modified since the ETag or date held by the client.')
+    @api.response(400, 'Bad request: start, end, step, tolerance or derived is not valid.')
+    @api.expect(joined_arguments)
+    def get(self):
+        """
+        Returns the public humidity, pressure and temperature records of a location aligned onto one time grid.
+
+        Each point of the grid takes the nearest record, or with align=previous the last record at or before
+        it, within the tolerance. Dew point, heat index and humidex are computed from the aligned temperature
+        and humidity on request. The table is returned as one list per column.
+        :return:
+        """
+        args = joined_arguments.parse_args()
+
+        try:
+            start, end = parse_date_range(args['start'], args['end'])
+            derived = parse_derived(args['derived'])
+            time_grid(start, end, args['step'])
+            check_tolerance(args['step'], args['tolerance'])
+        except (AggregateValueError, JoinedValueError) as exception:
+            abort(400, 'Bad request: {message}'.format(message=str(exception)))
+
+        def table():
+            return marshal(joined_readings(start,
+                                           end,
+                                           city=args['city'],
+                                           province=args['province'],
+                                           country=args['country'],
+                                           step_seconds=args['step'],
+                                           alignment=args['align'],
+                                           tolerance_seconds=args['tolerance'],
+                                           derived=derived), joined, skip_none=True)
+
+        versions = location_versions(args['city'], args['province'], args['country'])
+        etag, last_modified = location_validators(versions, 'joined', start, end, args['step'], args['align'],
+                                                  args['tolerance'], derived)
+
+        return conditional_response(etag, last_modified, table)
@@ -0,0 +1,65 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from flask_restplus import reqparse
+
+from api.weather_data_flaskapi.business.joined import ALIGNMENTS, DERIVED
+
+joined_arguments = reqparse.RequestParser(bundle_errors=True)
+
+joined_arguments.add_argument('start',
+                              type=str,
+                              required=True,
+                              help='Start date, the first point of the grid (e.g. 2017-01-30)')
+
+joined_arguments.add_argument('end',
+                              type=str,
+                              required=True,
+                              help='End date, inclusive (e.g. 2017-01-30)')
+
+joined_arguments.add_argument('city',
+                              type=str,
+                              required=True,
+                              help='City')
+
+joined_arguments.add_argument('province',
+                              type=str,
+                              required=True,
+                              help='Province')
+
+joined_arguments.add_argument('country',
+                              type=str,
+                              required=True,
+                              help='Country')
+
+joined_arguments.add_argument('step',
+                              type=int,
+                              required=False,
+                              default=3600,
+                              help='Seconds between the points of the grid')
+
+joined_arguments.add_argument('align',
+                              type=str,
+                              required=False,
+                              choices=ALIGNMENTS,
+                              default='nearest',
+                              help='How a point takes a reading {error_msg}')
+
+joined_arguments.add_argument('tolerance',
+                              type=int,
+                              required=False,
+                              help='Most seconds between a point and its reading, at most the step (default: the step)')
+
+joined_arguments.add_argument('derived',
+                              type=str,
+                              required=False,
+                              help='Comma separated derived quantities ({quantities})'.format(
+                                  quantities=', '.join(DERIVED)))
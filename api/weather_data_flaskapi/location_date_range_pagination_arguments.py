@@ -0,0 +1,29 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from api.weather_data_flaskapi.date_range_pagination_arguments import date_range_pagination_arguments
+
+location_date_range_pagination_arguments = date_range_pagination_arguments.copy()
+
+location_date_range_pagination_arguments.add_argument('city',
+                                                      type=str,
+                                                      required=True,
+                                                      help='City')
+
+location_date_range_pagination_arguments.add_argument('province',
+                                                      type=str,
+                                                      required=True,
+                                                      help='Province')
+
+location_date_range_pagination_arguments.add_argument('country',
+                                                      type=str,
+                                                      required=True,
+                                                      help='Country')
@@ -0,0 +1,29 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from flask_restplus import reqparse
+
+nearest_arguments = reqparse.RequestParser(bundle_errors=True)
+
+nearest_arguments.add_argument('lat',
+                               type=float,
+                               required=True,
+                               help='Latitude of the point (-90 to 90)')
+
+nearest_arguments.add_argument('lon',
+                               type=float,
+                               required=True,
+                               help='Longitude of the point (-180 to 180)')
+
+nearest_arguments.add_argument('at',
+                               type=str,
+                               required=False,
+                               help='ISO 8601 date and time of the reading (default: now)')
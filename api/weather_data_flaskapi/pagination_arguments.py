@@ -9,25 +9,20 @@
 @deffield    updated: 2017-06-14
 """
 
-from flask_restplus import reqparse
+from flask_restplus import inputs, reqparse
 
-pagination_arguments = reqparse.RequestParser()
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
 
-pagination_arguments.add_argument('page',
-                                  type=int,
-                                  required=False,
-                                  default=1,
-                                  help='Page number')
+pagination_arguments = reqparse.RequestParser(bundle_errors=True)
 
-pagination_arguments.add_argument('bool',
-                                  type=bool,
+pagination_arguments.add_argument('cursor',
+                                  type=str,
                                   required=False,
-                                  default=1,
-                                  help='Page number')
+                                  help='Opaque cursor returned as "next" by the previous page')
 
-pagination_arguments.add_argument('per_page',
-                                  type=int,
+pagination_arguments.add_argument('limit',
+                                  type=inputs.int_range(1, MAX_LIMIT),
                                   required=False,
-                                  choices=[2, 10, 20, 30, 40, 50],
-                                  default=10,
-                                  help='Results per page {error_msg}')
+                                  default=DEFAULT_LIMIT,
+                                  help='Results per page (1 to {max_limit}) {{error_msg}}'.format(max_limit=MAX_LIMIT))
@@ -0,0 +1,203 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from functools import partial
+
+from flask_restplus import abort, marshal
+
+from api.weather_data_flaskapi.business.archive import tiered_area_bounds, tiered_area_rows, tiered_reading_bounds, \
+    tiered_reading_rows
+from api.weather_data_flaskapi.business.cache import ReadingScope
+from api.weather_data_flaskapi.business.decimation import decimate
+from api.weather_data_flaskapi.business.locations import location_versions, reading_version
+from api.weather_data_flaskapi.business.pagination import CursorValueError, cursor_position, keyset_page
+from api.weather_data_flaskapi.business.spatial import AreaValueError, parse_area
+from api.weather_data_flaskapi.collection_arguments import collection_arguments
+from api.weather_data_flaskapi.conditional_requests import conditional_response, location_validators
+from api.weather_data_flaskapi.encodings import negotiated_mimetype
+from api.weather_data_flaskapi.response_caching import cached_json
+from api.weather_data_flaskapi.streaming import STREAM_BATCH_SIZE, STREAM_FORMATS, negotiated_format, stream_records
+from database.models import utc_timestamp
+
+
+class _CollectionQuery(object):
+    """
+    The parsed arguments of a GET of a collection of readings, and the reads they make.
+    """
+
+    def __init__(self, model, args: dict, start, end, position: tuple, area):
+        self.model = model
+        self.args = args
+        self.start = start
+        self.end = end
+        self.position = position
+        self.area = area
+
+    def records(self, **kwargs):
+        if self.area is not None:
+            return tiered_area_rows(self.model, self.area, start=self.start, end=self.end, position=self.position,
+                                    **kwargs)
+
+        return tiered_reading_rows(self.model,
+                                   start=self.start,
+                                   end=self.end,
+                                   city=self.args['city'],
+                                   province=self.args['province'],
+                                   country=self.args['country'],
+                                   position=self.position,
+                                   **kwargs)
+
+    def bounds(self):
+        # The buckets of a decimated collection span the readings in range, not the requested range
+        lower = self.start if self.position is None else max(self.start, self.position[0])
+
+        if self.area is not None:
+            return tiered_area_bounds(self.model, self.area, lower, self.end)
+
+        return tiered_reading_bounds(self.model, lower, self.end, self.args['city'], self.args['province'],
+                                     self.args['country'])
+
+    def streamed_records(self):
+        if self.args['max_points'] is None:
+            return self.records(yield_per=STREAM_BATCH_SIZE)
+
+        first_last = self.bounds()
+
+        if first_last is None:
+            return []
+
+        return decimate(self.records(yield_per=STREAM_BATCH_SIZE), *first_last, self.args['max_points'],
+                        self.args['decimation'])
+
+
+def _collection_query(model) -> _CollectionQuery:
+    # Parse the arguments of a GET of a collection, aborting with a 400 on those that are not valid
+    args = collection_arguments.parse_args()
+    args['format'] = negotiated_format(args['format'])
+
+    try:
+        start = utc_timestamp(args['start'])
+        end = utc_timestamp(args['end'])
+    except ValueError:
+        abort(400, 'Bad request: start and end must be ISO 8601 dates')
+
+    try:
+        position = cursor_position(args['cursor'])
+    except CursorValueError:
+        abort(400, 'Bad request: cursor is not valid')
+
+    try:
+        area = parse_area(args['bbox'], args['near'], args['radius_km'])
+    except AreaValueError as exception:
+        abort(400, 'Bad request: {message}'.format(message=exception))
+
+    if area is None and not (args['city'] and args['province'] and args['country']):
+        abort(400, 'Bad request: city, province and country are required without bbox or near')
+
+    return _CollectionQuery(model, args, start, end, position, area)
+
+
+def _stream(query: _CollectionQuery, fields):
+    return stream_records(query.streamed_records(), fields, query.args['format'])
+
+
+def _page(query: _CollectionQuery, page_fields):
+    # A decimated collection is one page thinned from every record in the range
+    if query.args['max_points'] is not None:
+        return marshal({'items': list(query.streamed_records()), 'next': None, 'limit': query.args['max_points']},
+                       page_fields)
+
+    return marshal(keyset_page(query.records(limit=query.args['limit'] + 1), query.args['limit']), page_fields)
+
+
+def _cached_page(query: _CollectionQuery, page_fields, versions: list):
+    args = query.args
+    scope = ReadingScope(query.model.__tablename__, args['city'], args['province'], args['country'], query.start,
+                         query.end)
+    # The versions key the page to the readings it was read from, whichever process changed them
+    key_parts = ('page', page_fields.name) + scope.location + (query.start, query.end, args['cursor'], args['limit'],
+                                                               args['max_points'], args['decimation']) + \
+        tuple([location_id, version] for location_id, version, modified in versions)
+
+    return cached_json(scope, key_parts, lambda: _page(query, page_fields))
+
+
+def _collection_validators(query: _CollectionQuery, fields, versions: list) -> tuple:
+    args = query.args
+
+    return location_validators(versions,
+                               'collection',
+                               fields.name,
+                               query.start,
+                               query.end,
+                               args['cursor'],
+                               args['limit'],
+                               args['format'],
+                               args['max_points'],
+                               args['decimation'],
+                               negotiated_mimetype())
+
+
+def reading_collection(model, fields, page_fields, cached: bool = False):
+    """
+    Respond to a GET of a collection of readings, as a page or as a stream.
+
+    A client holding the current response, by ETag or Last-Modified date, gets a 304 Not Modified.
+
+    :param model: The ORM class of the readings (Humidity, Pressure or Temperature).
+    :param fields: The serializer model of a reading.
+    :param page_fields: The serializer model of a page of readings.
+    :param cached: Serve pages from the response cache.
+    :type cached: bool
+    :return: The marshalled page, or a streamed response.
+    """
+    query = _collection_query(model)
+    streamed = query.args['format'] in STREAM_FORMATS
+
+    # The stations of an area are only known once it is read, so its readings are neither cached nor validated
+    if query.area is not None:
+        return _stream(query, fields) if streamed else _page(query, page_fields)
+
+    versions = location_versions(query.args['city'], query.args['province'], query.args['country'])
+
+    if streamed:
+        respond = partial(_stream, query, fields)
+    elif cached:
+        respond = partial(_cached_page, query, page_fields, versions)
+    else:
+        respond = partial(_page, query, page_fields)
+
+    etag, last_modified = _collection_validators(query, fields, versions)
+
+    return conditional_response(etag, last_modified, respond)
+
+
+def reading_item(model, reading_id: int, fields):
+    """
+    Respond to a GET of a reading.
+
+    :param model: The ORM class of the reading (Humidity, Pressure or Temperature).
+    :param reading_id: The reading identifier.
+    :type reading_id: int
+    :param fields: The serializer model of a reading.
+    :return: The marshalled reading.
+    """
+    version = reading_version(model, reading_id)
+
+    if version is None:
+        # Let the query raise NoResultFound for the usual 404
+        return marshal(model.query.filter(model.id == reading_id).one(), fields)
+
+    etag, last_modified = location_validators([version], 'item', fields.name, reading_id, negotiated_mimetype())
+
+    return conditional_response(etag,
+                                last_modified,
+                                lambda: marshal(model.query.filter(model.id == reading_id).one(), fields))
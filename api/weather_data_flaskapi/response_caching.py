@@ -0,0 +1,46 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import json
+
+from flask import Response
+
+from api.weather_data_flaskapi.business.cache import ReadingScope, cache_key, response_cache
+from api.weather_data_flaskapi.encodings import negotiated_mimetype
+
+
+def cached_json(scope: ReadingScope, key_parts: tuple, produce):
+    """
+    Serve a JSON response from the response cache, producing and caching it on a miss.
+
+    The cached response is removed when readings in its scope are created, updated or deleted.
+
+    :param scope: The readings the response is computed from.
+    :type scope: ReadingScope
+    :param key_parts: The normalized request parameters that identify the response.
+    :type key_parts: tuple
+    :param produce: A function returning the marshalled response.
+    :return: The JSON response, or the marshalled response when caching is disabled.
+    """
+    cache = response_cache()
+
+    # Only the JSON representation is cached
+    if cache is None or negotiated_mimetype() != 'application/json':
+        return produce()
+
+    key = cache_key(*key_parts)
+    body = cache.get(key)
+
+    if body is None:
+        body = json.dumps(produce()).encode('utf-8')
+        cache.set(key, body, scope)
+
+    return Response(body, mimetype='application/json')
@@ -73,6 +73,9 @@ humidity = api.model(
             required=True,
             readOnly=True,
             description='The date and time the reading was recorded'),
+        'reading_key': fields.String(
+            max=64,
+            description='An optional client key of the reading; a reading sent again with the same key is stored once'),
     })
 
 public_humidity = api.model(
@@ -180,6 +183,9 @@ pressure = api.model(
             required=True,
             readOnly=True,
             description='The date and time the reading was recorded'),
+        'reading_key': fields.String(
+            max=64,
+            description='An optional client key of the reading; a reading sent again with the same key is stored once'),
     })
 
 public_pressure = api.model(
@@ -287,6 +293,9 @@ temperature = api.model(
             required=True,
             readOnly=True,
             description='The date and time the reading was recorded'),
+        'reading_key': fields.String(
+            max=64,
+            description='An optional client key of the reading; a reading sent again with the same key is stored once'),
     })
 
 public_temperature = api.model(
@@ -333,3 +342,265 @@ public_temperature = api.model(
             readOnly=True,
             description='The date and time the reading was recorded'),
     })
+
+humidity_page = api.model(
+    'HumidityPage',
+    {
+        'items': fields.List(
+            fields.Nested(humidity),
+            description='The humidity records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+public_humidity_page = api.model(
+    'PublicHumidityPage',
+    {
+        'items': fields.List(
+            fields.Nested(public_humidity),
+            description='The humidity records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+pressure_page = api.model(
+    'PressurePage',
+    {
+        'items': fields.List(
+            fields.Nested(pressure),
+            description='The pressure records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+public_pressure_page = api.model(
+    'PublicPressurePage',
+    {
+        'items': fields.List(
+            fields.Nested(public_pressure),
+            description='The pressure records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+temperature_page = api.model(
+    'TemperaturePage',
+    {
+        'items': fields.List(
+            fields.Nested(temperature),
+            description='The temperature records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+public_temperature_page = api.model(
+    'PublicTemperaturePage',
+    {
+        'items': fields.List(
+            fields.Nested(public_temperature),
+            description='The temperature records on this page'),
+        'next': fields.String(
+            description='The cursor for the next page, or null on the last page'),
+        'limit': fields.Integer(
+            description='The maximum number of records on a page'),
+    })
+
+batch_status = api.model(
+    'BatchStatus',
+    {
+        'index': fields.Integer(
+            readOnly=True,
+            description='The position of the reading in the request'),
+        'status': fields.Integer(
+            readOnly=True,
+            description='201 if the reading was created, 200 if a reading with its reading_key is already stored, '
+                        '202 if it was queued, 400 if it is not valid, 500 if the database rejected it'),
+        'message': fields.String(
+            readOnly=True,
+            description='The reason the reading was not created'),
+    })
+
+batch_result = api.model(
+    'BatchResult',
+    {
+        'created': fields.Integer(
+            readOnly=True,
+            description='The number of readings created'),
+        'accepted': fields.Integer(
+            readOnly=True,
+            default=0,
+            description='The number of readings queued for writing'),
+        'rejected': fields.Integer(
+            readOnly=True,
+            description='The number of readings not created'),
+        'results': fields.List(
+            fields.Nested(batch_status),
+            description='The status of each reading, in request order'),
+    })
+
+aggregate_bucket = api.model(
+    'AggregateBucket',
+    {
+        'bucket': fields.DateTime(
+            readOnly=True,
+            description='The date and time the bucket starts'),
+        'min': fields.Float(
+            readOnly=True,
+            description='The smallest reading in the bucket'),
+        'max': fields.Float(
+            readOnly=True,
+            description='The largest reading in the bucket'),
+        'avg': fields.Float(
+            readOnly=True,
+            description='The mean of the readings in the bucket'),
+        'count': fields.Integer(
+            readOnly=True,
+            description='The number of readings in the bucket'),
+        'stddev': fields.Float(
+            readOnly=True,
+            description='The population standard deviation of the readings in the bucket'),
+    })
+
+aggregate = api.model(
+    'Aggregate',
+    {
+        'bucket': fields.String(
+            readOnly=True,
+            description='The bucket size (1h, 1d or 1w)'),
+        'items': fields.List(
+            fields.Nested(aggregate_bucket, skip_none=True),
+            description='The buckets holding readings, ordered by start'),
+    })
+
+nearest = api.model(
+    'Nearest',
+    {
+        'id': fields.Integer(
+            readOnly=True,
+            description='The unique identifier of the record'),
+        'value': fields.Float(
+            readOnly=True,
+            description='The reading''s value'),
+        'value_units': fields.String(
+            readOnly=True,
+            max=16,
+            description='The unit for the value'),
+        'value_error_range': fields.Float(
+            readOnly=True,
+            description='The error range for the reading''s value'),
+        'latitude_public': fields.Float(
+            readOnly=True,
+            description='The public latitude of the reading'),
+        'longitude_public': fields.Float(
+            readOnly=True,
+            description='The public longitude of the reading'),
+        'city': fields.String(
+            readOnly=True,
+            description='The record''s city.'),
+        'province': fields.String(
+            readOnly=True,
+            description='The record''s province.'),
+        'country': fields.String(
+            readOnly=True,
+            description='The record''s country.'),
+        'timestamp': fields.DateTime(
+            readOnly=True,
+            description='The date and time the reading was recorded'),
+        'distance_km': fields.Float(
+            readOnly=True,
+            description='The distance from the point to the station, in kilometres'),
+    })
+
+combined_reading = api.model(
+    'CombinedReading',
+    {
+        'id': fields.Integer(
+            readOnly=True,
+            description='The unique identifier of the record'),
+        'value': fields.Float(
+            readOnly=True,
+            description='The reading''s value'),
+        'value_units': fields.String(
+            readOnly=True,
+            max=16,
+            description='The unit for the value'),
+        'value_error_range': fields.Float(
+            readOnly=True,
+            description='The error range for the reading''s value'),
+        'latitude_public': fields.Float(
+            readOnly=True,
+            description='The public latitude of the reading'),
+        'longitude_public': fields.Float(
+            readOnly=True,
+            description='The public longitude of the reading'),
+        'timestamp': fields.DateTime(
+            readOnly=True,
+            description='The date and time the reading was recorded'),
+    })
+
+combined_series = api.model(
+    'CombinedSeries',
+    {
+        'city': fields.String(
+            readOnly=True,
+            description='The series'' city.'),
+        'province': fields.String(
+            readOnly=True,
+            description='The series'' province.'),
+        'country': fields.String(
+            readOnly=True,
+            description='The series'' country.'),
+        'metric': fields.String(
+            readOnly=True,
+            description='The reading of the series: humidity, pressure or temperature'),
+        'items': fields.List(
+            fields.Nested(combined_reading),
+            description='The records of the location and metric, ordered by timestamp'),
+    })
+
+combined = api.model(
+    'Combined',
+    {
+        'series': fields.List(
+            fields.Nested(combined_series),
+            description='A series per location and metric, by location then metric in request order'),
+    })
+
+joined = api.model(
+    'Joined',
+    {
+        'timestamp': fields.List(
+            fields.DateTime,
+            description='The points of the grid'),
+        'humidity': fields.List(
+            fields.Float,
+            description='The humidity reading of each point, null where none is within the tolerance'),
+        'pressure': fields.List(
+            fields.Float,
+            description='The pressure reading of each point, null where none is within the tolerance'),
+        'temperature': fields.List(
+            fields.Float,
+            description='The temperature reading of each point, null where none is within the tolerance'),
+        'dew_point': fields.List(
+            fields.Float,
+            description='The dew point of each point in degrees Celsius, if requested'),
+        'heat_index': fields.List(
+            fields.Float,
+            description='The heat index of each point in degrees Celsius, if requested'),
+        'humidex': fields.List(
+            fields.Float,
+            description='The humidex of each point in degrees Celsius, if requested'),
+        'units': fields.Raw(
+            readOnly=True,
+            description='The units of each reading, null when the readings of the grid mix units'),
+    })
@@ -0,0 +1,103 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import csv
+import io
+import json
+
+from flask import Response, request, stream_with_context
+from flask_restplus import marshal
+
+from api.weather_data_flaskapi.columnar import COLUMNS_MIMETYPE, column_batches
+
+STREAM_FORMATS = ('ndjson', 'csv', 'columns')
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'columns': COLUMNS_MIMETYPE,
+}
+
+# Rows fetched from the server-side cursor, and written to the response, per batch
+STREAM_BATCH_SIZE = 1000
+
+
+def _ndjson_batches(records, fields):
+    lines = []
+
+    for record in records:
+        lines.append(json.dumps(marshal(record, fields)))
+
+        if len(lines) == STREAM_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _csv_batches(records, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(fields.keys()))
+    writer.writeheader()
+    count = 0
+
+    for record in records:
+        writer.writerow(marshal(record, fields))
+        count += 1
+
+        if count == STREAM_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+
+    yield buffer.getvalue()
+
+
+def negotiated_format(requested: str) -> str:
+    """
+    Choose the format of a collection response.
+
+    A client asking for the json default that accepts the column format over JSON gets the column format.
+
+    :param requested: The format argument of the request.
+    :type requested: str
+    :return: 'json' or one of STREAM_FORMATS.
+    """
+    if requested == 'json' and request.accept_mimetypes.best_match(['application/json', COLUMNS_MIMETYPE],
+                                                                   default='application/json') == COLUMNS_MIMETYPE:
+        return 'columns'
+
+    return requested
+
+
+def stream_records(records, fields, output_format: str) -> Response:
+    """
+    Stream every record of a result as newline delimited JSON, CSV or packed columns (see column_batches).
+
+    Records are read from a server-side cursor in batches and written out as they arrive, so the
+    memory used does not grow with the number of records and the first bytes are sent immediately.
+
+    :param records: The records, in the order they are streamed.
+    :param fields: The serializer model used for each record.
+    :param output_format: One of STREAM_FORMATS.
+    :type output_format: str
+    :return: A streamed response.
+    """
+    if output_format == 'csv':
+        batches = _csv_batches(records, fields)
+    elif output_format == 'columns':
+        batches = column_batches(records, fields)
+    else:
+        batches = _ndjson_batches(records, fields)
+
+    return Response(stream_with_context(batches), mimetype=STREAM_MIMETYPES[output_format])
@@ -35,11 +35,74 @@ def initialize_app(flask_app):
     api.add_namespace(public_namespace)
     flask_app.register_blueprint(blueprint)
 
+    from database.types import set_fixed_point_storage
+    set_fixed_point_storage(flask_app.config['FIXED_POINT_STORAGE'])
+
+    from api.weather_data_flaskapi.business.cache import create_cache, set_response_cache
+    set_response_cache(create_cache(flask_app.config['RESPONSE_CACHE_BACKEND'],
+                                    max_bytes=flask_app.config['RESPONSE_CACHE_MAX_BYTES'],
+                                    ttl_seconds=flask_app.config['RESPONSE_CACHE_TTL'],
+                                    path=flask_app.config['RESPONSE_CACHE_PATH']))
+
+    from api.weather_data_flaskapi.business.cache import TTLCache
+    from api.weather_data_flaskapi.business.security import set_identity_cache
+    if flask_app.config['IDENTITY_CACHE_SIZE'] > 0:
+        set_identity_cache(TTLCache(max_entries=flask_app.config['IDENTITY_CACHE_SIZE'],
+                                    ttl_seconds=flask_app.config['IDENTITY_CACHE_TTL']))
+    else:
+        set_identity_cache(None)
+
+    from api.weather_data_flaskapi.business.hashing import HashingPool, set_hashing_pool
+    if flask_app.config['PASSWORD_HASH_WORKERS'] > 0:
+        set_hashing_pool(HashingPool(workers=flask_app.config['PASSWORD_HASH_WORKERS'],
+                                     max_pending=flask_app.config['PASSWORD_HASH_MAX_PENDING'],
+                                     timeout_seconds=flask_app.config['PASSWORD_HASH_TIMEOUT']))
+    else:
+        set_hashing_pool(None)
+
+    from api.weather_data_flaskapi.business.throttling import TokenBucket, set_login_throttles
+    set_login_throttles(
+        username=TokenBucket(rate=flask_app.config['LOGIN_USERNAME_RATE'],
+                             burst=flask_app.config['LOGIN_USERNAME_BURST'],
+                             max_keys=flask_app.config['LOGIN_THROTTLE_KEYS'])
+        if flask_app.config['LOGIN_USERNAME_RATE'] > 0 else None,
+        address=TokenBucket(rate=flask_app.config['LOGIN_ADDRESS_RATE'],
+                            burst=flask_app.config['LOGIN_ADDRESS_BURST'],
+                            max_keys=flask_app.config['LOGIN_THROTTLE_KEYS'])
+        if flask_app.config['LOGIN_ADDRESS_RATE'] > 0 else None)
+
+    from api.weather_data_flaskapi.business.logins import LoginRecorder, set_login_recorder
+    if flask_app.config['LAST_LOGIN_FLUSH_SECONDS'] > 0:
+        set_login_recorder(LoginRecorder(flask_app, flush_seconds=flask_app.config['LAST_LOGIN_FLUSH_SECONDS']))
+    else:
+        set_login_recorder(None)
+
+    from api.weather_data_flaskapi.business.ingest import IngestQueue, set_ingest_queue
+    if flask_app.config['INGEST_QUEUE']:
+        set_ingest_queue(IngestQueue(flask_app,
+                                     max_readings=flask_app.config['INGEST_QUEUE_MAX_READINGS'],
+                                     group_size=flask_app.config['INGEST_GROUP_SIZE'],
+                                     flush_seconds=flask_app.config['INGEST_FLUSH_SECONDS'],
+                                     journal_directory=flask_app.config['INGEST_JOURNAL_DIRECTORY']))
+    else:
+        set_ingest_queue(None)
+
+    from api.weather_data_flaskapi.business.archive import ReadingArchive, set_reading_archive
+    if flask_app.config['ARCHIVE_DIRECTORY']:
+        set_reading_archive(ReadingArchive(flask_app.config['ARCHIVE_DIRECTORY']))
+    else:
+        set_reading_archive(None)
+
     db.init_app(flask_app)
 
     from database import create_database
     create_database(app=flask_app)
 
+    from api.weather_data_flaskapi.business.stations import set_station_indexes
+    from database.models import READING_MODELS
+    set_station_indexes(flask_app, READING_MODELS.values(),
+                        refresh_seconds=flask_app.config['STATION_INDEX_REFRESH_SECONDS'])
+
 
 log_file_path = path.join(path.dirname(path.abspath(__file__)), 'logging.conf')
 logging.config.fileConfig(log_file_path)
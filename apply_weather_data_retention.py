@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+"""
+apply_weather_data_retention -- delete the expired raw weather data readings
+
+apply_weather_data_retention is a command line utility to apply the retention policy of the readings.
+
+Run it daily from cron. The readings older than READING_RETENTION_DAYS of their metric and country are
+first summed into the daily rollups where those miss them, then deleted in small transactions. The
+rollups are kept forever.
+
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+
+from database.models import READING_MODELS
+
+__all__ = []
+__version__ = 1.0
+__date__ = '2017-06-14'
+__updated__ = '2017-06-14'
+__short_description__ = 'delete the expired raw weather data readings'
+__longer_description__ = 'a command line utility to apply the retention policy of the readings'
+__org_name__ = 'Englesh.org'
+__email__ = 'Fyzel@users.noreply.github.com'
+__license__ = 'https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE'
+
+DEBUG = False
+TEST_RUN = False
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, message):
+        super(CLIError).__init__(type(self))
+        self.message = 'E: {message}'.format(message=message)
+
+    def __str__(self):
+        return self.message
+
+    def __unicode__(self):
+        return self.message
+
+
+def main(argv=None):
+    """Command line options."""
+
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_shortdesc = __import__('__main__').__doc__.split("\n")[1]
+    program_license = '''{program_name}
+
+  Created by {user_name} on {created_date}.
+  Copyright 2017 {organization_name}. All rights reserved.
+
+  Licensed under {license}
+
+  Distributed on an "AS IS" basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+'''.format(program_name=program_shortdesc,
+           user_name=__email__,
+           created_date=str(__date__),
+           organization_name=__org_name__,
+           license=__license__)
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument('-m',
+                            '--metric',
+                            dest='metrics',
+                            action='append',
+                            choices=sorted(READING_MODELS),
+                            help='the readings to expire (default: all)')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        # The application configures the database connection and the policy
+        from app import app
+        from api.weather_data_flaskapi.business.retention import apply_retention, validate_policies
+
+        policies = app.config['READING_RETENTION_DAYS']
+        validate_policies(policies)
+
+        with app.app_context():
+            for metric in args.metrics or sorted(READING_MODELS):
+                result = apply_retention(policies,
+                                         READING_MODELS[metric],
+                                         chunk_size=app.config['RETENTION_CHUNK_SIZE'],
+                                         pause_seconds=app.config['RETENTION_CHUNK_PAUSE'])
+                print('{metric}: {downsampled} daily rollups filled, {deleted} readings deleted'.format(
+                    metric=metric, **result))
+
+        return 0
+    except KeyboardInterrupt:
+        # handle keyboard interrupt ###
+        return 0
+    except Exception as e:
+        if DEBUG or TEST_RUN:
+            raise e
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+
+if __name__ == "__main__":
+    if DEBUG:
+        pass
+    if TEST_RUN:
+        import doctest
+
+        doctest.testmod()
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+
+"""
+archive_weather_data -- export the closed months of weather data readings to the archive
+
+archive_weather_data is a command line utility to copy the readings of closed months to column files.
+
+Run it daily from cron, before apply_weather_data_retention.py. Each month that ended ARCHIVE_HOT_DAYS
+ago is written to ARCHIVE_DIRECTORY as one memory-mapped NumPy array per column, and the collection
+and aggregate endpoints then read it from there. A reading written or changed in an archived month
+is only seen once the month is exported again with --month.
+
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+from datetime import datetime
+
+from database.models import READING_MODELS
+
+__all__ = []
+__version__ = 1.0
+__date__ = '2017-06-14'
+__updated__ = '2017-06-14'
+__short_description__ = 'export the closed months of weather data readings to the archive'
+__longer_description__ = 'a command line utility to copy the readings of closed months to column files'
+__org_name__ = 'Englesh.org'
+__email__ = 'Fyzel@users.noreply.github.com'
+__license__ = 'https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE'
+
+DEBUG = False
+TEST_RUN = False
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, message):
+        super(CLIError).__init__(type(self))
+        self.message = 'E: {message}'.format(message=message)
+
+    def __str__(self):
+        return self.message
+
+    def __unicode__(self):
+        return self.message
+
+
+def main(argv=None):
+    """Command line options."""
+
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_shortdesc = __import__('__main__').__doc__.split("\n")[1]
+    program_license = '''{program_name}
+
+  Created by {user_name} on {created_date}.
+  Copyright 2017 {organization_name}. All rights reserved.
+
+  Licensed under {license}
+
+  Distributed on an "AS IS" basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+'''.format(program_name=program_shortdesc,
+           user_name=__email__,
+           created_date=str(__date__),
+           organization_name=__org_name__,
+           license=__license__)
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument('-m',
+                            '--metric',
+                            dest='metrics',
+                            action='append',
+                            choices=sorted(READING_MODELS),
+                            help='the readings to archive (default: all)')
+        parser.add_argument('--month',
+                            dest='months',
+                            action='append',
+                            type=lambda value: datetime.strptime(value, '%Y-%m').date(),
+                            help='export this archived month (YYYY-MM) again, e.g. after its readings changed')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        # The application configures the database connection and the archive directory
+        from app import app
+        from api.weather_data_flaskapi.business.archive import ReadingArchive, archive_closed_months
+
+        if not app.config['ARCHIVE_DIRECTORY']:
+            raise CLIError('ARCHIVE_DIRECTORY is not set')
+
+        archive = ReadingArchive(app.config['ARCHIVE_DIRECTORY'])
+
+        with app.app_context():
+            for metric in args.metrics or sorted(READING_MODELS):
+                model = READING_MODELS[metric]
+
+                if args.months:
+                    for month in args.months:
+                        print('{metric}: {count} readings of {month:%Y-%m} archived'.format(
+                            metric=metric, count=archive.export_month(model, month), month=month))
+                else:
+                    print('{metric}: {count} readings archived'.format(
+                        metric=metric, count=archive_closed_months(archive, model, app.config['ARCHIVE_HOT_DAYS'])))
+
+        return 0
+    except KeyboardInterrupt:
+        # handle keyboard interrupt ###
+        return 0
+    except Exception as e:
+        if DEBUG or TEST_RUN:
+            raise e
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+
+if __name__ == "__main__":
+    if DEBUG:
+        pass
+    if TEST_RUN:
+        import doctest
+
+        doctest.testmod()
+    sys.exit(main())
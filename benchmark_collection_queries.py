@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+
+"""
+benchmark_collection_queries -- compare the ORM and the compiled row queries of the reading collections
+
+benchmark_collection_queries is a command line utility to time a page of a reading collection read through the
+ORM and through the pre-bound row queries used by the collection endpoints.
+
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+
+from flask import Flask
+
+from database import db
+from database.models import READING_MODELS, utc_timestamp
+from database.types import set_fixed_point_storage
+
+__all__ = []
+__version__ = 1.0
+__date__ = '2017-06-14'
+__updated__ = '2017-06-14'
+__short_description__ = 'compare the ORM and the compiled row queries of the reading collections'
+__longer_description__ = 'a command line utility to time a page of a reading collection'
+__org_name__ = 'Englesh.org'
+__email__ = 'Fyzel@users.noreply.github.com'
+__license__ = 'https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE'
+
+DEBUG = False
+TEST_RUN = False
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, message):
+        super(CLIError).__init__(type(self))
+        self.message = 'E: {message}'.format(message=message)
+
+    def __str__(self):
+        return self.message
+
+    def __unicode__(self):
+        return self.message
+
+
+def orm_page(model, start, end, city, province, country, limit) -> list:
+    """
+    Read a page of readings as ORM objects, as the collection endpoints did before the row queries.
+
+    :return: The list of readings.
+    """
+    from api.weather_data_flaskapi.business.queries import query_readings
+
+    records = query_readings(model, start, end, city, province, country).order_by(
+        model.timestamp,
+        model.id).limit(limit + 1).all()
+
+    # Every request starts with an empty identity map
+    db.session.expunge_all()
+
+    return records
+
+
+def row_page(model, start, end, city, province, country, limit) -> list:
+    """
+    Read a page of readings as rows from the pre-bound statements.
+
+    :return: The list of rows.
+    """
+    from api.weather_data_flaskapi.business.queries import reading_rows
+
+    return reading_rows(model, start, end, city, province, country, limit=limit + 1)
+
+
+def main(argv=None):
+    """Command line options."""
+
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_shortdesc = __import__('__main__').__doc__.split("\n")[1]
+    program_license = '''{program_name}
+
+  Created by {user_name} on {created_date}.
+  Copyright 2017 {organization_name}. All rights reserved.
+
+  Licensed under {license}
+
+  Distributed on an "AS IS" basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+'''.format(program_name=program_shortdesc,
+           user_name=__email__,
+           created_date=str(__date__),
+           organization_name=__org_name__,
+           license=__license__)
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument('-m',
+                            '--metric',
+                            dest='metric',
+                            default='temperature',
+                            choices=sorted(READING_MODELS),
+                            help='the readings to query (default: temperature)')
+        parser.add_argument('--city', dest='city', type=str, required=True, help='the city of the readings')
+        parser.add_argument('--province', dest='province', type=str, required=True, help='the province of the readings')
+        parser.add_argument('--country', dest='country', type=str, required=True, help='the country of the readings')
+        parser.add_argument('-s',
+                            '--start',
+                            dest='start',
+                            type=utc_timestamp,
+                            required=True,
+                            help='the start of the date range (ISO 8601)')
+        parser.add_argument('-e',
+                            '--end',
+                            dest='end',
+                            type=utc_timestamp,
+                            required=True,
+                            help='the end of the date range (ISO 8601)')
+        parser.add_argument('-l',
+                            '--limit',
+                            dest='limit',
+                            type=int,
+                            default=100,
+                            help='the page size (default: 100)')
+        parser.add_argument('-n',
+                            '--number',
+                            dest='number',
+                            type=int,
+                            default=200,
+                            help='the pages read per timing (default: 200)')
+        parser.add_argument('-c',
+                            '--config',
+                            dest='config',
+                            default='config.DevelopmentConfig',
+                            help='the configuration object of the database (default: config.DevelopmentConfig)')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        if args.limit < 1 or args.number < 1:
+            raise CLIError('limit and number must be positive')
+
+        flask_app = Flask(__name__)
+        flask_app.config.from_object(args.config)
+        set_fixed_point_storage(flask_app.config['FIXED_POINT_STORAGE'])
+        db.init_app(flask_app)
+
+        model = READING_MODELS[args.metric]
+        query_args = (model, args.start, args.end, args.city, args.province, args.country, args.limit)
+
+        with flask_app.app_context():
+            print('{count} readings per page'.format(count=len(row_page(*query_args))))
+
+            for name, page in (('orm', orm_page), ('rows', row_page)):
+                # Warm up the connection pool and the compiled statement cache
+                page(*query_args)
+
+                best = min(timeit.repeat(lambda: page(*query_args), number=args.number, repeat=5))
+                print('{name}: {milliseconds:.3f} ms per page'.format(name=name,
+                                                                      milliseconds=best / args.number * 1000))
+
+        return 0
+    except KeyboardInterrupt:
+        # handle keyboard interrupt ###
+        return 0
+    except Exception as e:
+        if DEBUG or TEST_RUN:
+            raise e
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+
+if __name__ == "__main__":
+    if DEBUG:
+        pass
+    if TEST_RUN:
+        import doctest
+
+        doctest.testmod()
+    sys.exit(main())
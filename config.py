@@ -17,6 +17,67 @@ class Config(object):
     SECRET_KEY = 'Change me'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Store reading values and coordinates as scaled integers instead of DECIMAL.
+    # It must match the existing tables; changing it requires the reading tables to be recreated.
+    FIXED_POINT_STORAGE = False
+
+    # Cache of the public range queries: 'memory' (per process), 'sqlite' (a file shared by the workers
+    # of a host, at RESPONSE_CACHE_PATH) or None. A memory cache only sees the writes of its own process,
+    # so with several workers the others serve stale responses for up to RESPONSE_CACHE_TTL seconds.
+    RESPONSE_CACHE_BACKEND = 'memory'
+    RESPONSE_CACHE_PATH = None
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL = 300
+
+    # Cache of the users of recent tokens. Changes made by another process are seen after at most
+    # IDENTITY_CACHE_TTL seconds; IDENTITY_CACHE_SIZE = 0 looks the user up on every request.
+    IDENTITY_CACHE_SIZE = 1024
+    IDENTITY_CACHE_TTL = 60
+
+    # Worker processes hashing passwords (0 hashes on the request thread), the most logins waiting for
+    # them before /auth answers 503, and the seconds a login waits
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 16
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # Login attempts per second and burst allowed per username and per client address before /auth
+    # answers 429 (a rate of 0 disables the throttle), and the most usernames or addresses remembered
+    LOGIN_USERNAME_RATE = 0.2
+    LOGIN_USERNAME_BURST = 5
+    LOGIN_ADDRESS_RATE = 1.0
+    LOGIN_ADDRESS_BURST = 20
+    LOGIN_THROTTLE_KEYS = 10000
+
+    # Seconds between batched writes of the users' last login dates (0 writes the date at each login)
+    LAST_LOGIN_FLUSH_SECONDS = 30
+
+    # Answer the protected POST endpoints with 202 and write the readings from a queue, in groups of
+    # INGEST_GROUP_SIZE readings per commit at least every INGEST_FLUSH_SECONDS. Requests are refused
+    # with 503 beyond INGEST_QUEUE_MAX_READINGS queued readings. With INGEST_JOURNAL_DIRECTORY the
+    # queue is journaled there and replayed after a crash.
+    INGEST_QUEUE = False
+    INGEST_QUEUE_MAX_READINGS = 100000
+    INGEST_GROUP_SIZE = 5000
+    INGEST_FLUSH_SECONDS = 1.0
+    INGEST_JOURNAL_DIRECTORY = None
+
+    # Days raw readings are kept by apply_weather_data_retention.py, as {metric: {country: days}}; '*'
+    # matches any metric or country and None keeps them forever. The daily rollups are kept forever.
+    # Expired readings are deleted RETENTION_CHUNK_SIZE at a time, RETENTION_CHUNK_PAUSE seconds apart.
+    READING_RETENTION_DAYS = {'*': {'*': 90}}
+    RETENTION_CHUNK_SIZE = 5000
+    RETENTION_CHUNK_PAUSE = 0.1
+
+    # Directory of the archive written by archive_weather_data.py, or None to read every reading from the
+    # database. Months that ended ARCHIVE_HOT_DAYS ago are archived; keep it well under the retention
+    # days, so a month is archived before its first readings expire.
+    ARCHIVE_DIRECTORY = None
+    ARCHIVE_HOT_DAYS = 30
+
+    # Most seconds the in-memory index of the nearest station lookups goes without reading the positions
+    # of the readings written by other processes
+    STATION_INDEX_REFRESH_SECONDS = 60
+
     # RESTplus settings
     RESTPLUS_SWAGGER_UI_DOC_EXPANSION = 'list'
     RESTPLUS_VALIDATE = True
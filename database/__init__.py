@@ -21,38 +21,26 @@ def create_humidity_indexes(app):
 
         # Create humidity table indices
         try:
-            sql = text(
-                'CREATE UNIQUE INDEX humidity_city_subdivision_country_index ON humidity (city, subdivision, country);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX humidity_city_index ON humidity (city);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX humidity_subdivision_index ON humidity (subdivision);')
+            sql = text('CREATE INDEX humidity_latitude_longitude_index ON humidity (latitude, longitude);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX humidity_country_index ON humidity (country);')
+            sql = text('CREATE INDEX humidity_timestamp_index ON humidity (timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX humidity_latitude_longitude_index ON humidity (latitude, longitude);')
+            sql = text(
+                'CREATE INDEX humidity_location_timestamp_id_index ON humidity (location_id, timestamp, id);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX humidity_timestamp_index ON humidity (timestamp);')
+            sql = text('CREATE INDEX humidity_geohash_timestamp_index ON humidity (geohash, timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
@@ -65,38 +53,26 @@ def create_pressure_indexes(app):
 
         # Create pressure table indices
         try:
-            sql = text(
-                'CREATE UNIQUE INDEX pressure_city_subdivision_country_index ON pressure (city, subdivision, country);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX pressure_city_index ON pressure (city);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX pressure_subdivision_index ON pressure (subdivision);')
+            sql = text('CREATE INDEX pressure_latitude_longitude_index ON pressure (latitude, longitude);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX pressure_country_index ON pressure (country);')
+            sql = text('CREATE INDEX pressure_timestamp_index ON pressure (timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX pressure_latitude_longitude_index ON pressure (latitude, longitude);')
+            sql = text(
+                'CREATE INDEX pressure_location_timestamp_id_index ON pressure (location_id, timestamp, id);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX pressure_timestamp_index ON pressure (timestamp);')
+            sql = text('CREATE INDEX pressure_geohash_timestamp_index ON pressure (geohash, timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
@@ -109,38 +85,26 @@ def create_temperature_indexes(app):
 
         # Create temperature table indices
         try:
-            sql = text(
-                'CREATE UNIQUE INDEX temperature_city_subdivision_country_index ON temperature (city, subdivision, country);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX temperature_city_index ON temperature (city);')
-            db.engine.execute(sql)
-        except OperationalError as oe:
-            pass
-
-        try:
-            sql = text('CREATE INDEX temperature_subdivision_index ON temperature (subdivision);')
+            sql = text('CREATE INDEX temperature_latitude_longitude_index ON temperature (latitude, longitude);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX temperature_country_index ON temperature (country);')
+            sql = text('CREATE INDEX temperature_timestamp_index ON temperature (timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX temperature_latitude_longitude_index ON temperature (latitude, longitude);')
+            sql = text(
+                'CREATE INDEX temperature_location_timestamp_id_index ON temperature (location_id, timestamp, id);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
 
         try:
-            sql = text('CREATE INDEX temperature_timestamp_index ON temperature (timestamp);')
+            sql = text('CREATE INDEX temperature_geohash_timestamp_index ON temperature (geohash, timestamp);')
             db.engine.execute(sql)
         except OperationalError as oe:
             pass
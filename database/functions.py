@@ -0,0 +1,39 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class epoch_seconds(FunctionElement):
+    """
+    The whole seconds from 1970-01-01 00:00:00 to a naive UTC date and time column.
+    """
+    type = BigInteger()
+    name = 'epoch_seconds'
+    inherit_cache = True
+
+
+@compiles(epoch_seconds)
+def _default_epoch_seconds(element, compiler, **kw):
+    # TIMESTAMPDIFF does not depend on the session time zone, unlike UNIX_TIMESTAMP
+    return "TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(epoch_seconds, 'sqlite')
+def _sqlite_epoch_seconds(element, compiler, **kw):
+    return "CAST(strftime('%%s', %s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(epoch_seconds, 'postgresql')
+def _postgresql_epoch_seconds(element, compiler, **kw):
+    return 'CAST(EXTRACT(EPOCH FROM %s) AS BIGINT)' % compiler.process(element.clauses, **kw)
@@ -0,0 +1,100 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+# The digits of a geohash, in the order of the cells they name
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# The characters stored per reading; 9 characters name a cell of about 5 by 5 metres
+GEOHASH_PRECISION = 9
+
+# Sorts after every geohash digit, so [prefix, prefix + RANGE_END) holds every geohash of a cell
+RANGE_END = '~'
+
+
+def _bits(precision: int) -> tuple:
+    # A geohash alternates longitude and latitude bits, starting with longitude
+    bits = 5 * precision
+    return bits - bits // 2, bits // 2
+
+
+def _index(coordinate: float, lower: float, span: float, bits: int) -> int:
+    cells = 1 << bits
+    return min(max(int((coordinate - lower) / span * cells), 0), cells - 1)
+
+
+def cell_number(longitude_index: int, latitude_index: int, precision: int) -> int:
+    """
+    Interleave the column and row of a cell into its number, the value of its geohash.
+
+    :param longitude_index: The column of the cell, from the west.
+    :type longitude_index: int
+    :param latitude_index: The row of the cell, from the south.
+    :type latitude_index: int
+    :param precision: The number of geohash characters.
+    :type precision: int
+    :return: int
+    """
+    longitude_bits, latitude_bits = _bits(precision)
+    number = 0
+
+    for position in range(5 * precision):
+        if position % 2 == 0:
+            longitude_bits -= 1
+            bit = (longitude_index >> longitude_bits) & 1
+        else:
+            latitude_bits -= 1
+            bit = (latitude_index >> latitude_bits) & 1
+
+        number = (number << 1) | bit
+
+    return number
+
+
+def cell_geohash(number: int, precision: int) -> str:
+    """
+    Spell the number of a cell as a geohash.
+
+    :param number: The number of the cell.
+    :type number: int
+    :param precision: The number of geohash characters.
+    :type precision: int
+    :return: str
+    """
+    return ''.join(BASE32[(number >> (5 * (precision - 1 - position))) & 31] for position in range(precision))
+
+
+def cell_indexes(latitude: float, longitude: float, precision: int) -> tuple:
+    """
+    Find the column and row of the cell holding a point.
+
+    :param latitude: The latitude of the point.
+    :type latitude: float
+    :param longitude: The longitude of the point.
+    :type longitude: float
+    :param precision: The number of geohash characters.
+    :type precision: int
+    :return: A (longitude index, latitude index) tuple.
+    """
+    longitude_bits, latitude_bits = _bits(precision)
+    return _index(longitude, -180.0, 360.0, longitude_bits), _index(latitude, -90.0, 180.0, latitude_bits)
+
+
+def encode(latitude, longitude, precision: int = GEOHASH_PRECISION) -> str:
+    """
+    Compute the geohash of a point.
+
+    :param latitude: The latitude of the point.
+    :param longitude: The longitude of the point.
+    :param precision: The number of geohash characters.
+    :type precision: int
+    :return: str
+    """
+    return cell_geohash(cell_number(*cell_indexes(float(latitude), float(longitude), precision), precision), precision)
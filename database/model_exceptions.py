@@ -16,3 +16,7 @@ class LatitudeValueError(ValueError):
 
 class LongitudeValueError(ValueError):
     pass
+
+
+class ReadingValueError(ValueError):
+    pass
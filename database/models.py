@@ -10,31 +10,181 @@
 """
 
 import decimal
-from datetime import datetime
+from datetime import datetime, timezone
+
+from dateutil.parser import isoparse
+
+from sqlalchemy.orm import declared_attr
 
 from database import db
+from database.geohash import GEOHASH_PRECISION, encode as encode_geohash
 from database.model_exceptions import LatitudeValueError, LongitudeValueError
+from database.types import FixedPoint
 
 
-class Humidity(db.Model):
+def validate_coordinates(latitude, longitude):
     """
-    A class that represents the ORM for a humidity reading.
+    Check that a latitude and longitude are in range.
+
+    latitude -90 to 90. longitude -180 to 180.
+
+    :param latitude: The latitude of the reading.
+    :param longitude: The longitude of the reading.
+    :return: None
     """
-    __tablename__ = 'humidity'
-    id = db.Column(db.BIGINT(), primary_key=True, autoincrement=True)
-    value = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
-    value_units = db.Column(db.NVARCHAR(16), nullable=False)
-    value_error_range = db.Column(db.DECIMAL(precision=7, scale=6), nullable=False, default=0.0)
-    latitude = db.Column(db.DECIMAL(precision=8, scale=6), nullable=False)
-    latitude_public = db.Column(db.DECIMAL(precision=8, scale=6), nullable=False)
-    longitude = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    longitude_public = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
+    if latitude < -90.0 or latitude > 90.0:
+        raise LatitudeValueError('latitude out of range (-90 to 90)')
+
+    if longitude < -180.0 or longitude > 180.0:
+        raise LongitudeValueError('longitude out of range (-180 to 180)')
+
+
+def public_coordinate(coordinate) -> float:
+    """
+    Truncate a latitude or longitude to the precision published to the public.
+
+    :param coordinate: The precise latitude or longitude.
+    :return: The coordinate truncated to three decimal places.
+    """
+    return float(int(coordinate * 1000)) / 1000
+
+
+def utc_timestamp(value) -> datetime:
+    """
+    Convert the date and time of a reading to the naive UTC datetime stored in the reading tables.
+
+    :param value: A datetime, or an ISO 8601 date and time string.
+    :return: datetime
+    """
+    if not isinstance(value, datetime):
+        value = isoparse(str(value))
+
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return value
+
+
+class Location(db.Model):
+    """
+    A class that represents the ORM for the location of a station, shared by its readings.
+    """
+    __tablename__ = 'location'
+    __table_args__ = (db.UniqueConstraint('city', 'province', 'country', 'elevation', 'elevation_units',
+                                          name='location_city_province_country_elevation_index'),)
+    id = db.Column(db.Integer(), primary_key=True, autoincrement=True)
     city = db.Column(db.NVARCHAR(64), nullable=False)
     province = db.Column(db.NVARCHAR(2), nullable=False)
     country = db.Column(db.NVARCHAR(2), nullable=False)
-    elevation = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
+    elevation = db.Column(FixedPoint(precision=8, scale=4), nullable=False)
     elevation_units = db.Column(db.NVARCHAR(16), nullable=False)
+    # Bumped by every write to the readings of the location, to validate cached responses
+    version = db.Column(db.BIGINT(), nullable=False, default=0)
+    modified_date = db.Column(db.DATETIME, nullable=True)
+
+    def __init__(self,
+                 city: str,
+                 province: str,
+                 country: str,
+                 elevation: decimal,
+                 elevation_units: str,
+                 id=None):
+        """
+        Location constructor.
+
+        :rtype: Location
+        :type city: str
+        :type province: str
+        :type country: str
+        :type elevation: decimal
+        :type elevation_units: str
+        """
+        super().__init__()
+
+        if id is not None:
+            self.id = id
+
+        self.city = city
+        self.province = province
+        self.country = country
+        self.elevation = elevation
+        self.elevation_units = elevation_units
+
+    def __repr__(self) -> str:
+        """
+        Return a string representation of the Location object.
+
+        :return: A string representation of the Location object.
+        """
+        return '<Location: id: {id} {city}, {province} {country} elevation: {elevation} {elevation_units}>'.format(
+            id=str(self.id),
+            city=self.city,
+            province=self.province,
+            country=self.country,
+            elevation=self.elevation,
+            elevation_units=self.elevation_units)
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class LocatedReading(object):
+    """
+    The location columns of a reading, kept once in the location table and referenced by its identifier.
+
+    The location fields are read only; a reading is moved by assigning another Location.
+    """
+
+    @declared_attr
+    def __table_args__(cls):
+        # A reading key is stored once; partitions.py widens the index to (reading_key, timestamp)
+        return (db.Index('{table}_reading_key_index'.format(table=cls.__tablename__), 'reading_key', unique=True),)
+
+    @declared_attr
+    def location_id(cls):
+        return db.Column(db.Integer(), db.ForeignKey('location.id'), nullable=False)
+
+    @declared_attr
+    def location(cls):
+        return db.relationship(Location, lazy='joined', innerjoin=True)
+
+    @property
+    def city(self) -> str:
+        return self.location.city
+
+    @property
+    def province(self) -> str:
+        return self.location.province
+
+    @property
+    def country(self) -> str:
+        return self.location.country
+
+    @property
+    def elevation(self) -> decimal:
+        return self.location.elevation
+
+    @property
+    def elevation_units(self) -> str:
+        return self.location.elevation_units
+
+
+class Humidity(LocatedReading, db.Model):
+    """
+    A class that represents the ORM for a humidity reading.
+    """
+    __tablename__ = 'humidity'
+    id = db.Column(db.BIGINT(), primary_key=True, autoincrement=True)
+    value = db.Column(FixedPoint(precision=8, scale=4), nullable=False)
+    value_units = db.Column(db.NVARCHAR(16), nullable=False)
+    value_error_range = db.Column(FixedPoint(precision=7, scale=6), nullable=False, default=0.0)
+    latitude = db.Column(FixedPoint(precision=8, scale=6), nullable=False)
+    latitude_public = db.Column(FixedPoint(precision=8, scale=6), nullable=False)
+    longitude = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
+    longitude_public = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
+    reading_key = db.Column(db.NVARCHAR(64), nullable=True)
+    geohash = db.Column(db.NVARCHAR(GEOHASH_PRECISION), nullable=True)
 
     def __init__(self,
                  value: decimal,
@@ -42,12 +192,9 @@ class Humidity(db.Model):
                  value_error_range: decimal,
                  latitude: decimal,
                  longitude: decimal,
-                 city: str,
-                 province: str,
-                 country: str,
-                 elevation: decimal,
-                 elevation_units: str,
+                 location: Location,
                  timestamp: datetime,
+                 reading_key: str = None,
                  id=None):
         """
         Humidity constructor.
@@ -60,21 +207,14 @@ class Humidity(db.Model):
         :type value_error_range: decimal
         :type latitude: decimal
         :type longitude: decimal
-        :type city: str
-        :type province: str
-        :type country: str
-        :type elevation: decimal
-        :type elevation_units: str
+        :type location: Location
         :type timestamp: datetime
+        :param reading_key: An optional client key; a reading sent again with the same key is stored once.
+        :type reading_key: str
         """
         super().__init__()
 
-        # Test case for latitude and longitude value assertions
-        if latitude < -90.0 or latitude > 90.0:
-            raise LatitudeValueError('latitude out of range (-90 to 90)')
-
-        if longitude < -180.0 or longitude > 180.0:
-            raise LongitudeValueError('longitude out of range (-90 to 90)')
+        validate_coordinates(latitude, longitude)
 
         if id is not None:
             self.id = id
@@ -83,15 +223,13 @@ class Humidity(db.Model):
         self.value_units = value_units
         self.value_error_range = value_error_range
         self.latitude = latitude
-        self.latitude_public = float(int(latitude * 1000)) / 1000
+        self.latitude_public = public_coordinate(latitude)
         self.longitude = longitude
-        self.longitude_public = float(int(longitude * 1000)) / 1000
-        self.city = city
-        self.province = province
-        self.country = country
-        self.elevation = elevation
-        self.elevation_units = elevation_units
+        self.longitude_public = public_coordinate(longitude)
+        self.geohash = encode_geohash(self.latitude_public, self.longitude_public)
+        self.location = location
         self.timestamp = timestamp
+        self.reading_key = reading_key
 
     def __repr__(self):
         """
@@ -152,25 +290,22 @@ class Humidity(db.Model):
         return self.__repr__()
 
 
-class Pressure(db.Model):
+class Pressure(LocatedReading, db.Model):
     """
     A class that represents the ORM for a pressure reading.
     """
     __tablename__ = 'pressure'
     id = db.Column(db.BIGINT(), primary_key=True, autoincrement=True)
-    value = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
+    value = db.Column(FixedPoint(precision=8, scale=4), nullable=False)
     value_units = db.Column(db.NVARCHAR(16), nullable=False)
-    value_error_range = db.Column(db.DECIMAL(precision=7, scale=6), nullable=False, default=0.0)
-    latitude = db.Column(db.DECIMAL(precision=8, scale=6), nullable=False)
-    latitude_public = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    longitude = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    longitude_public = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    city = db.Column(db.NVARCHAR(64), nullable=False)
-    province = db.Column(db.NVARCHAR(2), nullable=False)
-    country = db.Column(db.NVARCHAR(2), nullable=False)
-    elevation = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
-    elevation_units = db.Column(db.NVARCHAR(16), nullable=False)
+    value_error_range = db.Column(FixedPoint(precision=7, scale=6), nullable=False, default=0.0)
+    latitude = db.Column(FixedPoint(precision=8, scale=6), nullable=False)
+    latitude_public = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
+    longitude = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
+    longitude_public = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
+    reading_key = db.Column(db.NVARCHAR(64), nullable=True)
+    geohash = db.Column(db.NVARCHAR(GEOHASH_PRECISION), nullable=True)
 
     def __init__(self,
                  value: decimal,
@@ -178,12 +313,9 @@ class Pressure(db.Model):
                  value_error_range: decimal,
                  latitude: decimal,
                  longitude: decimal,
-                 city: str,
-                 province: str,
-                 country: str,
-                 elevation: decimal,
-                 elevation_units: str,
+                 location: Location,
                  timestamp: datetime,
+                 reading_key: str = None,
                  id=None):
         """
         Pressure constructor.
@@ -196,21 +328,14 @@ class Pressure(db.Model):
         :type value_error_range: decimal
         :type latitude: decimal
         :type longitude: decimal
-        :type city: str
-        :type province: str
-        :type country: str
-        :type elevation: decimal
-        :type elevation_units: str
+        :type location: Location
         :type timestamp: datetime
+        :param reading_key: An optional client key; a reading sent again with the same key is stored once.
+        :type reading_key: str
         """
         super().__init__()
 
-        # Test case for latitude and longitude value assertions
-        if latitude < -90.0 or latitude > 90.0:
-            raise LatitudeValueError('latitude out of range (-90 to 90)')
-
-        if longitude < -180.0 or longitude > 180.0:
-            raise LongitudeValueError('longitude out of range (-90 to 90)')
+        validate_coordinates(latitude, longitude)
 
         if id is not None:
             self.id = id
@@ -219,15 +344,13 @@ class Pressure(db.Model):
         self.value_units = value_units
         self.value_error_range = value_error_range
         self.latitude = latitude
-        self.latitude_public = float(int(latitude * 1000)) / 1000
+        self.latitude_public = public_coordinate(latitude)
         self.longitude = longitude
-        self.longitude_public = float(int(longitude * 1000)) / 1000
-        self.city = city
-        self.province = province
-        self.country = country
-        self.elevation = elevation
-        self.elevation_units = elevation_units
+        self.longitude_public = public_coordinate(longitude)
+        self.geohash = encode_geohash(self.latitude_public, self.longitude_public)
+        self.location = location
         self.timestamp = timestamp
+        self.reading_key = reading_key
 
     def __repr__(self):
         """
@@ -288,25 +411,22 @@ class Pressure(db.Model):
         return self.__repr__()
 
 
-class Temperature(db.Model):
+class Temperature(LocatedReading, db.Model):
     """
     A class that represents the ORM for a temperature reading.
     """
     __tablename__ = 'temperature'
     id = db.Column(db.BIGINT(), primary_key=True, autoincrement=True)
-    value = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
+    value = db.Column(FixedPoint(precision=8, scale=4), nullable=False)
     value_units = db.Column(db.NVARCHAR(16), nullable=False)
-    value_error_range = db.Column(db.DECIMAL(precision=7, scale=6), nullable=False, default=0.0)
-    latitude = db.Column(db.DECIMAL(precision=8, scale=6), nullable=False)
-    latitude_public = db.Column(db.DECIMAL(precision=8, scale=6), nullable=False)
-    longitude = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    longitude_public = db.Column(db.DECIMAL(precision=9, scale=6), nullable=False)
-    city = db.Column(db.NVARCHAR(64), nullable=False)
-    province = db.Column(db.NVARCHAR(2), nullable=False)
-    country = db.Column(db.NVARCHAR(2), nullable=False)
-    elevation = db.Column(db.DECIMAL(precision=8, scale=4), nullable=False)
-    elevation_units = db.Column(db.NVARCHAR(16), nullable=False)
+    value_error_range = db.Column(FixedPoint(precision=7, scale=6), nullable=False, default=0.0)
+    latitude = db.Column(FixedPoint(precision=8, scale=6), nullable=False)
+    latitude_public = db.Column(FixedPoint(precision=8, scale=6), nullable=False)
+    longitude = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
+    longitude_public = db.Column(FixedPoint(precision=9, scale=6), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False)
+    reading_key = db.Column(db.NVARCHAR(64), nullable=True)
+    geohash = db.Column(db.NVARCHAR(GEOHASH_PRECISION), nullable=True)
 
     def __init__(self,
                  value: decimal,
@@ -314,12 +434,9 @@ class Temperature(db.Model):
                  value_error_range: decimal,
                  latitude: decimal,
                  longitude: decimal,
-                 city: str,
-                 province: str,
-                 country: str,
-                 elevation: decimal,
-                 elevation_units: str,
+                 location: Location,
                  timestamp: datetime,
+                 reading_key: str = None,
                  id=None):
         """
         Temperature constructor.
@@ -333,21 +450,14 @@ class Temperature(db.Model):
         :type value_error_range: decimal
         :type latitude: decimal
         :type longitude: decimal
-        :type city: str
-        :type province: str
-        :type country: str
-        :type elevation: decimal
-        :type elevation_units: str
+        :type location: Location
         :type timestamp: datetime
+        :param reading_key: An optional client key; a reading sent again with the same key is stored once.
+        :type reading_key: str
         """
         super().__init__()
 
-        # Test case for latitude and longitude value assertions
-        if latitude < -90.0 or latitude > 90.0:
-            raise LatitudeValueError('latitude out of range (-90 to 90)')
-
-        if longitude < -180.0 or longitude > 180.0:
-            raise LongitudeValueError('longitude out of range (-90 to 90)')
+        validate_coordinates(latitude, longitude)
 
         if id is not None:
             self.id = id
@@ -356,15 +466,13 @@ class Temperature(db.Model):
         self.value_units = value_units
         self.value_error_range = value_error_range
         self.latitude = latitude
-        self.latitude_public = float(int(latitude * 1000)) / 1000
+        self.latitude_public = public_coordinate(latitude)
         self.longitude = longitude
-        self.longitude_public = float(int(longitude * 1000)) / 1000
-        self.city = city
-        self.province = province
-        self.country = country
-        self.elevation = elevation
-        self.elevation_units = elevation_units
+        self.longitude_public = public_coordinate(longitude)
+        self.geohash = encode_geohash(self.latitude_public, self.longitude_public)
+        self.location = location
         self.timestamp = timestamp
+        self.reading_key = reading_key
 
     def __repr__(self) -> str:
         """
@@ -425,6 +533,95 @@ class Temperature(db.Model):
         return self.__repr__()
 
 
+class Rollup(object):
+    """
+    The columns of a rollup: the count, sum, sum of squares, minimum and maximum of the
+    readings of a location within one bucket of time.
+    """
+    id = db.Column(db.BIGINT(), primary_key=True, autoincrement=True)
+    bucket = db.Column(db.DateTime, nullable=False)
+    count = db.Column(db.BIGINT(), nullable=False)
+    total = db.Column(db.Float(precision=53), nullable=False)
+    total_of_squares = db.Column(db.Float(precision=53), nullable=False)
+    minimum = db.Column(db.Float(precision=53), nullable=False)
+    maximum = db.Column(db.Float(precision=53), nullable=False)
+
+    # The width of the buckets in seconds
+    period_seconds = None
+
+    @declared_attr
+    def location_id(cls):
+        return db.Column(db.Integer(), db.ForeignKey('location.id'), nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (db.UniqueConstraint('location_id', 'bucket',
+                                    name='{table}_location_bucket_index'.format(table=cls.__tablename__)),)
+
+    def __repr__(self) -> str:
+        """
+        Return a string representation of the Rollup object.
+
+        :return: A string representation of the Rollup object.
+        """
+        return '<{name}: location: {location_id} {bucket:%Y-%m-%d %H:%M:%S} count: {count}>'.format(
+            name=type(self).__name__,
+            location_id=self.location_id,
+            bucket=self.bucket,
+            count=self.count)
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class HumidityHourlyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the hourly rollup of humidity readings.
+    """
+    __tablename__ = 'humidity_hourly'
+    period_seconds = 3600
+
+
+class HumidityDailyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the daily rollup of humidity readings.
+    """
+    __tablename__ = 'humidity_daily'
+    period_seconds = 86400
+
+
+class PressureHourlyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the hourly rollup of pressure readings.
+    """
+    __tablename__ = 'pressure_hourly'
+    period_seconds = 3600
+
+
+class PressureDailyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the daily rollup of pressure readings.
+    """
+    __tablename__ = 'pressure_daily'
+    period_seconds = 86400
+
+
+class TemperatureHourlyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the hourly rollup of temperature readings.
+    """
+    __tablename__ = 'temperature_hourly'
+    period_seconds = 3600
+
+
+class TemperatureDailyRollup(Rollup, db.Model):
+    """
+    A class that represents the ORM for the daily rollup of temperature readings.
+    """
+    __tablename__ = 'temperature_daily'
+    period_seconds = 86400
+
+
 class User(db.Model):
     """
     A class that represents the ORM for a user account.
@@ -490,3 +687,17 @@ class User(db.Model):
     def __str__(self):
         result = self.__repr__()
         return result
+
+
+READING_MODELS = {
+    'humidity': Humidity,
+    'pressure': Pressure,
+    'temperature': Temperature,
+}
+
+# The rollups of each kind of reading, finest first
+ROLLUP_MODELS = {
+    Humidity: (HumidityHourlyRollup, HumidityDailyRollup),
+    Pressure: (PressureHourlyRollup, PressureDailyRollup),
+    Temperature: (TemperatureHourlyRollup, TemperatureDailyRollup),
+}
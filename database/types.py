@@ -0,0 +1,123 @@
+"""
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import BigInteger, Float, Integer, Numeric, literal, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+# Whether FixedPoint columns are stored as scaled integers; see set_fixed_point_storage
+_storage = {'scaled': False}
+
+_UNIT = Decimal(1)
+
+
+def set_fixed_point_storage(scaled: bool):
+    """
+    Choose how FixedPoint columns are stored.
+
+    The choice must be made before the first statement is compiled and must match the tables in the
+    database; switching it requires the reading tables to be recreated.
+
+    :param scaled: True to store scaled integers, False to store DECIMAL.
+    :type scaled: bool
+    :return: None
+    """
+    _storage['scaled'] = bool(scaled)
+
+
+def fixed_point_storage() -> bool:
+    """
+    Tell whether FixedPoint columns are stored as scaled integers.
+
+    :return: bool
+    """
+    return _storage['scaled']
+
+
+def scaled_value(value, scale: int) -> int:
+    """
+    Convert a number to an integer count of 10^-scale units.
+
+    The number is rounded half away from zero from its decimal digits, as a DECIMAL column rounds it.
+
+    :param value: The number.
+    :param scale: The number of digits after the decimal point.
+    :type scale: int
+    :return: int
+    """
+    return int(Decimal(repr(float(value))).scaleb(scale).quantize(_UNIT, rounding=ROUND_HALF_UP))
+
+
+class FixedPoint(TypeDecorator):
+    """
+    A fixed-point number read and written as a float.
+
+    It is stored either as DECIMAL(precision, scale) or, in fixed point storage, as an integer
+    count of 10^-scale units (e.g. micro-degrees for a scale of 6), which is narrower and decodes
+    without building a decimal.Decimal per value.
+    """
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, precision: int, scale: int):
+        """
+        FixedPoint constructor.
+
+        :param precision: The number of significant digits.
+        :type precision: int
+        :param scale: The number of digits after the decimal point.
+        :type scale: int
+        """
+        super().__init__(precision=precision, scale=scale, asdecimal=False)
+        self.precision = precision
+        self.scale = scale
+        self.multiplier = 10 ** scale
+
+    def load_dialect_impl(self, dialect):
+        if not fixed_point_storage():
+            return dialect.type_descriptor(Numeric(precision=self.precision, scale=self.scale, asdecimal=False))
+
+        # A signed 32 bit integer holds every 9 digit value
+        if self.precision <= 9:
+            return dialect.type_descriptor(Integer())
+
+        return dialect.type_descriptor(BigInteger())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not fixed_point_storage():
+            return value
+
+        return scaled_value(value, self.scale)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+
+        if not fixed_point_storage():
+            return float(value)
+
+        return value / self.multiplier
+
+
+def decoded(column):
+    """
+    Build a float SQL expression for the value of a FixedPoint column, for use inside SUM and other
+    arithmetic the column type does not decode.
+
+    :param column: A FixedPoint column.
+    :return: The SQL expression.
+    """
+    if not fixed_point_storage():
+        return column
+
+    # A bare float would be bound as a FixedPoint and scaled as well
+    return type_coerce(column / literal(float(column.type.multiplier), Float), Float)
@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+
+"""
+maintain_weather_data_partitions -- create and drop the monthly partitions of the weather data readings
+
+maintain_weather_data_partitions is a command line utility to keep monthly partitions ahead of the readings.
+
+Run it from cron at least once a month. On MySQL it partitions the reading tables by month when asked to
+(--partition), creates the partitions of the coming months and drops the months before --drop-before
+whole. Other databases cannot partition the tables, so --drop-before deletes the old readings in chunks.
+The hourly and daily rollups are kept.
+
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+
+from dateutil.parser import isoparse
+
+from database.models import READING_MODELS, utc_timestamp
+
+__all__ = []
+__version__ = 1.0
+__date__ = '2017-06-14'
+__updated__ = '2017-06-14'
+__short_description__ = 'create and drop the monthly partitions of the weather data readings'
+__longer_description__ = 'a command line utility to keep monthly partitions ahead of the readings'
+__org_name__ = 'Englesh.org'
+__email__ = 'Fyzel@users.noreply.github.com'
+__license__ = 'https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE'
+
+DEBUG = False
+TEST_RUN = False
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, message):
+        super(CLIError).__init__(type(self))
+        self.message = 'E: {message}'.format(message=message)
+
+    def __str__(self):
+        return self.message
+
+    def __unicode__(self):
+        return self.message
+
+
+def maintain_partitions(metric: str, months_ahead: int, partition: bool, drop_before):
+    """
+    Create the coming partitions of a reading table and drop or delete its readings before a date.
+
+    :param metric: The reading table (humidity, pressure or temperature).
+    :type metric: str
+    :param months_ahead: The partitions to create after the current month.
+    :type months_ahead: int
+    :param partition: Partition the table if it is not partitioned yet.
+    :type partition: bool
+    :param drop_before: Drop the readings before this date and time, or None to keep them.
+    :type drop_before: datetime
+    :return: None
+    """
+    from api.weather_data_flaskapi.business.partitions import add_partitions, delete_readings_before, \
+        drop_partitions_before, partition_months, partition_table, supports_partitions
+
+    model = READING_MODELS[metric]
+
+    if supports_partitions() and not partition_months(model) and partition:
+        created = partition_table(model, months_ahead)
+        print('{metric}: partitioned into {created} months'.format(metric=metric, created=created))
+    elif supports_partitions() and partition_months(model):
+        created = add_partitions(model, months_ahead)
+        print('{metric}: {created} partitions created'.format(metric=metric, created=created))
+    else:
+        print('{metric}: not partitioned'.format(metric=metric))
+
+    if drop_before is None:
+        return
+
+    if partition_months(model):
+        # Whole months only; the readings of a partly expired month stay until it has expired
+        dropped = drop_partitions_before(model, drop_before.date())
+        print('{metric}: {dropped} partitions dropped'.format(metric=metric, dropped=dropped))
+    else:
+        deleted = delete_readings_before(model, drop_before)
+        print('{metric}: {deleted} readings deleted'.format(metric=metric, deleted=deleted))
+
+
+def main(argv=None):
+    """Command line options."""
+
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_shortdesc = __import__('__main__').__doc__.split("\n")[1]
+    program_license = '''{program_name}
+
+  Created by {user_name} on {created_date}.
+  Copyright 2017 {organization_name}. All rights reserved.
+
+  Licensed under {license}
+
+  Distributed on an "AS IS" basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+'''.format(program_name=program_shortdesc,
+           user_name=__email__,
+           created_date=str(__date__),
+           organization_name=__org_name__,
+           license=__license__)
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument('-m',
+                            '--metric',
+                            dest='metrics',
+                            action='append',
+                            choices=sorted(READING_MODELS),
+                            help='the readings to maintain (default: all)')
+        parser.add_argument('-a',
+                            '--months-ahead',
+                            dest='months_ahead',
+                            type=int,
+                            default=3,
+                            help='create the partitions of this many months after the current one (default: 3)')
+        parser.add_argument('-p',
+                            '--partition',
+                            dest='partition',
+                            action='store_true',
+                            help='partition the tables that are not partitioned yet; this rewrites them')
+        parser.add_argument('-d',
+                            '--drop-before',
+                            dest='drop_before',
+                            type=isoparse,
+                            required=False,
+                            help='drop the readings before this ISO 8601 date')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        if args.months_ahead < 0:
+            raise CLIError('months ahead must not be negative')
+
+        drop_before = utc_timestamp(args.drop_before) if args.drop_before is not None else None
+
+        # The application configures the database connection
+        from app import app
+
+        with app.app_context():
+            for metric in args.metrics or sorted(READING_MODELS):
+                maintain_partitions(metric, args.months_ahead, args.partition, drop_before)
+
+        return 0
+    except KeyboardInterrupt:
+        # handle keyboard interrupt ###
+        return 0
+    except Exception as e:
+        if DEBUG or TEST_RUN:
+            raise e
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+
+if __name__ == "__main__":
+    if DEBUG:
+        pass
+    if TEST_RUN:
+        import doctest
+
+        doctest.testmod()
+    sys.exit(main())
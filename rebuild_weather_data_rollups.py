@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+
+"""
+rebuild_weather_data_rollups -- rebuild the hourly and daily rollups of the weather data readings
+
+rebuild_weather_data_rollups is a command line utility to rebuild the rollup tables from the readings.
+
+The rollups are maintained as readings are written; a rebuild is only needed after the readings were
+changed outside of the application or to fill the rollups of readings loaded before they existed.
+
+@author:     Fyzel@users.noreply.github.com
+
+@copyright:  2017 Englesh.org. All rights reserved.
+
+@license:    https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE
+
+@contact:    Fyzel@users.noreply.github.com
+@deffield    updated: 2017-06-14
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+
+from dateutil.parser import isoparse
+
+from database.models import READING_MODELS, utc_timestamp
+
+__all__ = []
+__version__ = 1.0
+__date__ = '2017-06-14'
+__updated__ = '2017-06-14'
+__short_description__ = 'rebuild the hourly and daily rollups of the weather data readings'
+__longer_description__ = 'a command line utility to rebuild the rollup tables from the readings'
+__org_name__ = 'Englesh.org'
+__email__ = 'Fyzel@users.noreply.github.com'
+__license__ = 'https://github.com/Fyzel/weather-data-flaskapi/blob/master/LICENSE'
+
+DEBUG = False
+TEST_RUN = False
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, message):
+        super(CLIError).__init__(type(self))
+        self.message = 'E: {message}'.format(message=message)
+
+    def __str__(self):
+        return self.message
+
+    def __unicode__(self):
+        return self.message
+
+
+def main(argv=None):
+    """Command line options."""
+
+    if argv is None:
+        argv = sys.argv
+    else:
+        sys.argv.extend(argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_shortdesc = __import__('__main__').__doc__.split("\n")[1]
+    program_license = '''{program_name}
+
+  Created by {user_name} on {created_date}.
+  Copyright 2017 {organization_name}. All rights reserved.
+
+  Licensed under {license}
+
+  Distributed on an "AS IS" basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+'''.format(program_name=program_shortdesc,
+           user_name=__email__,
+           created_date=str(__date__),
+           organization_name=__org_name__,
+           license=__license__)
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license, formatter_class=RawDescriptionHelpFormatter)
+        parser.add_argument('-m',
+                            '--metric',
+                            dest='metrics',
+                            action='append',
+                            choices=sorted(READING_MODELS),
+                            help='the readings to rebuild (default: all)')
+        parser.add_argument('-s',
+                            '--start',
+                            dest='start',
+                            type=isoparse,
+                            required=False,
+                            help='rebuild from this ISO 8601 date and time (default: the first reading)')
+        parser.add_argument('-e',
+                            '--end',
+                            dest='end',
+                            type=isoparse,
+                            required=False,
+                            help='rebuild up to this ISO 8601 date and time (default: the last reading)')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        start = utc_timestamp(args.start) if args.start is not None else None
+        end = utc_timestamp(args.end) if args.end is not None else None
+
+        if start is not None and end is not None and start > end:
+            raise CLIError('start must not be after end')
+
+        # The application configures the database connection
+        from app import app
+        from api.weather_data_flaskapi.business.rollups import rebuild_rollups
+
+        with app.app_context():
+            for metric in args.metrics or sorted(READING_MODELS):
+                written = rebuild_rollups(READING_MODELS[metric], start=start, end=end)
+                print('{metric}: {written} rollup rows written'.format(metric=metric, written=written))
+
+        return 0
+    except KeyboardInterrupt:
+        # handle keyboard interrupt ###
+        return 0
+    except Exception as e:
+        if DEBUG or TEST_RUN:
+            raise e
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+
+if __name__ == "__main__":
+    if DEBUG:
+        pass
+    if TEST_RUN:
+        import doctest
+
+        doctest.testmod()
+    sys.exit(main())